@@ -5,8 +5,6 @@ from sklearn.naive_bayes import GaussianNB
 
 import gamelib
 import random
-from sys import maxsize
-import json
 
 """
 Most of the algo code you write will be in this file unless you create new
@@ -14,7 +12,9 @@ modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - Breaches, damage and spawns of the last action phase are tallied for you in
+  game_state.last_action_phase. For anything else you can analyze action frames
+  by modifying on_action_frame function
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
@@ -25,7 +25,8 @@ Advanced strategy tips:
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
-        seed = random.randrange(maxsize)
+        # AlgoCore picks the seed: ALGO_SEED when a match sets it, a fresh one otherwise
+        seed = self.seed
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
 
@@ -74,6 +75,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         game_state = gamelib.GameState(self.config, turn_state, self.turret_locations, self.wall_locations,
                                        self.support_locations)
+        self.record_breaches(game_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  # Comment or remove this line to enable warnings.
 
@@ -98,7 +100,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         If there are no stationary units to attack in the front, we will send Scouts to try and score quickly.
         """
         attack_in_progress = False
-        if self.ready_attack and game_state.get_resource(MP, 0) > 9:
+        if self.ready_attack and game_state.get_resource(MP, 0) > self.params.get("attack_mp", 9):
             # left is in our view
             enemy_has_most_defense_on_left = self.get_side_enemy_defense(game_state)
             # want to build attack on same side as their defense since it will go opposite side
@@ -114,10 +116,10 @@ class AlgoStrategy(gamelib.AlgoCore):
                 self.refund_structures(TURRET, game_state, False)
                 self.ready_attack = False
         else:
-            walls = 6
+            walls = self.params.get("offensive_walls", 6)
             supports = 10 - walls  # 10 represents number of support units needed to build attack
 
-            if self.is_ready_to_build_offensive(supports, walls, game_state):
+            if self.is_ready_to_build_offensive(supports, walls, game_state, self.params.get("offensive_scouts", 8)):
                 self.refund_structures(TURRET, game_state, False)
                 self.refund_structures(WALL, game_state, False)
                 self.ready_attack = True
@@ -198,8 +200,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         game_state.update_loc(unit_type)
 
-        gamelib.debug_write(locations)
-        gamelib.debug_write(game_state.turret_locations)
+        gamelib.log.debug("Refunding {} from {}", unit_type, tuple(locations))
 
         for loc in locations:
             for unit in game_state.game_map[loc[0], loc[1]]:
@@ -489,8 +490,7 @@ class AlgoStrategy(gamelib.AlgoCore):
     def build_reactive_defense(self, game_state):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
-        We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        We track where the opponent scored in the record_breaches function
         """
         for location in self.scored_on_locations:
             # Build turret one space above so that it doesn't block our own edge spawn locations
@@ -628,27 +628,20 @@ class AlgoStrategy(gamelib.AlgoCore):
 
 
 
-    def on_action_frame(self, turn_string):
+    def record_breaches(self, game_state):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
-        Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
+        Remembers where the enemy scored on us during the last action phase.
+        gamelib tallies the breaches of every action frame in game_state.last_action_phase,
+        so we only keep each location once.
         """
-        # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
+        summary = game_state.last_action_phase
+        for location in summary.locations(summary.breaches):
+            gamelib.log.info("Got scored on at: {}", location)
+            if location not in self.scored_on_locations:
                 self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
-            else:
+        gamelib.log.debug("All locations: {}", tuple(self.scored_on_locations))
+        for location in summary.locations(summary.scored):
+            if location not in self.score_locations:
                 self.score_locations.append(location)
 
 
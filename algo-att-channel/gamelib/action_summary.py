@@ -0,0 +1,146 @@
+"""
+Per turn tallies of the action phase.
+
+Most algos parse every action frame by hand to find out where they were scored
+on or which structures took damage. AlgoCore already parses every frame, so it
+feeds the events into an ActionPhaseSummary as they arrive. When the next turn
+starts, the finished summary is available as ``game_state.last_action_phase``:
+
+    summary = game_state.last_action_phase
+    for location in summary.locations(summary.breaches):
+        game_state.attempt_spawn(TURRET, [location[0], location[1] + 1])
+
+Every tally is a fixed ARENA_SIZE x ARENA_SIZE grid indexed as grid[x][y], so
+memory use does not grow with the length of the game. As in the rest of gamelib,
+player index 0 is you and 1 is your opponent.
+"""
+
+ARENA_SIZE = 28
+
+# Frames number the players 1 (you) and 2 (your opponent)
+_FRAME_SELF = 1
+_FRAME_ENEMY = 2
+
+# The first entries of unitInformation are WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER and INTERCEPTOR
+_UNIT_TYPES = 6
+_STRUCTURE_TYPES = (0, 1, 2)
+
+
+def _grid(value=0):
+    return [[value] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+
+
+class ActionPhaseSummary:
+    """What happened during one action phase, built up frame by frame
+
+    Attributes :
+        * turn_number (int): The turn whose action phase this summarizes
+        * frames (int): The number of action frames seen
+        * breaches (list): breaches[x][y] is the number of enemy units that scored on you at [x, y]
+        * scored (list): scored[x][y] is the number of your units that scored on the enemy at [x, y]
+        * damage_taken (list): damage_taken[x][y] is the total damage your structures took at [x, y]
+        * damage_hits (list): damage_hits[x][y] is the number of times your structures were damaged at [x, y]
+        * structures_lost (list): structures_lost[x][y] is the number of your structures destroyed at [x, y]
+        * enemy_spawns (dict): Maps a unit type to a grid of how many of them the enemy spawned at each location
+        * mp_spent (list): MP spent on mobile units, [yours, your opponent's]
+
+    """
+    def __init__(self, config, turn_number=-1):
+        """Sets up empty tallies
+
+        Args:
+            config: The game config, used to name unit types and look up their MP costs
+            turn_number: The turn this action phase belongs to
+
+        """
+        self.turn_number = turn_number
+        self.frames = 0
+        self.breaches = _grid()
+        self.scored = _grid()
+        self.damage_taken = _grid(0.0)
+        self.damage_hits = _grid()
+        self.structures_lost = _grid()
+        unit_information = config["unitInformation"][:_UNIT_TYPES] if config else []
+        self._unit_types = [info.get("shorthand") for info in unit_information]
+        self._mp_costs = [info.get("cost2", 0) for info in unit_information]
+        self.enemy_spawns = {unit_type: _grid() for unit_type in self._unit_types}
+        self.mp_spent = [0, 0]
+
+    def update(self, state):
+        """Adds the events of one parsed action frame to the tallies
+
+        Args:
+            state: An action frame, already parsed from JSON
+
+        """
+        self.frames += 1
+        events = state.get("events")
+        if not events:
+            return
+
+        for breach in events.get("breach", ()):
+            x, y = breach[0]
+            if breach[4] == _FRAME_ENEMY:
+                self.breaches[x][y] += 1
+            else:
+                self.scored[x][y] += 1
+
+        for damage in events.get("damage", ()):
+            if damage[4] == _FRAME_SELF and damage[2] in _STRUCTURE_TYPES:
+                x, y = damage[0]
+                self.damage_taken[x][y] += damage[1]
+                self.damage_hits[x][y] += 1
+
+        for death in events.get("death", ()):
+            if death[3] == _FRAME_SELF and death[1] in _STRUCTURE_TYPES and not death[4]:
+                x, y = death[0]
+                self.structures_lost[x][y] += 1
+
+        for spawn in events.get("spawn", ()):
+            unit_index = spawn[1]
+            if unit_index >= len(self._unit_types):
+                continue
+            player = spawn[3]
+            self.mp_spent[player - 1] += self._mp_costs[unit_index]
+            if player == _FRAME_ENEMY:
+                x, y = spawn[0]
+                self.enemy_spawns[self._unit_types[unit_index]][x][y] += 1
+
+    @staticmethod
+    def locations(grid):
+        """Gets the locations with a non zero tally in one of the grids
+
+        Args:
+            grid: One of the grids of this summary, for example breaches
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        return [[x, y] for x in range(ARENA_SIZE) for y in range(ARENA_SIZE) if grid[x][y]]
+
+    @staticmethod
+    def total(grid):
+        """Sums one of the grids of this summary
+
+        """
+        return sum(sum(column) for column in grid)
+
+
+# The summary of the most recent finished action phase, see last_summary
+_last_summary = None
+
+
+def last_summary():
+    """Gets the summary of the most recently finished action phase, or None before AlgoCore has produced one
+
+    """
+    return _last_summary
+
+
+def set_last_summary(summary):
+    """Makes summary the one new GameStates are given. Called by AlgoCore when a turn starts
+
+    """
+    global _last_summary
+    _last_summary = summary
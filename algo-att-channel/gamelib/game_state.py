@@ -3,9 +3,10 @@ import json
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_commands, debug_write, loads
 from .unit import GameUnit
 from .game_map import GameMap
+from .action_summary import last_summary
 
 def is_stationary(unit_type):
     """
@@ -44,6 +45,7 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * last_action_phase (:obj: ActionPhaseSummary): Breaches, damage, losses and spawns of the previous action phase, see action_summary.py
 
     """
 
@@ -58,6 +60,7 @@ class GameState:
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
+        self.last_action_phase = last_summary()
 
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
         UNIT_TYPE_TO_INDEX = {}
@@ -103,7 +106,7 @@ class GameState:
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
         state_line is the game state as a json string.
         """
-        state = json.loads(state_line)
+        state = loads(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -177,8 +180,7 @@ class GameState:
         """
         build_string = json.dumps(self._build_stack)
         deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
-        send_command(deploy_string)
+        send_commands(build_string, deploy_string)
 
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
@@ -1,7 +1,5 @@
 import gamelib
 import random
-from sys import maxsize
-import json
 
 """
 Most of the algo code you write will be in this file unless you create new
@@ -9,7 +7,9 @@ modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - Breaches, damage and spawns of the last action phase are tallied for you in
+  game_state.last_action_phase. For anything else you can analyze action frames
+  by modifying on_action_frame function
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
@@ -20,7 +20,8 @@ Advanced strategy tips:
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
-        seed = random.randrange(maxsize)
+        # AlgoCore picks the seed: ALGO_SEED when a match sets it, a fresh one otherwise
+        seed = self.seed
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
 
@@ -55,6 +56,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         game engine.
         """
         game_state = gamelib.GameState(self.config, turn_state)
+        self.record_breaches(game_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  # Comment or remove this line to enable warnings.
 
@@ -242,8 +244,7 @@ class AlgoStrategy(gamelib.AlgoCore):
     def build_reactive_defense(self, game_state):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
-        We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        We track where the opponent scored in the record_breaches function
         """
         for location in self.scored_on_locations:
             # We want to avoid trapping our scouts that spawn at [13,0]
@@ -341,27 +342,18 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
+    def record_breaches(self, game_state):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
-        Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
+        Remembers where the enemy scored on us during the last action phase.
+        gamelib tallies the breaches of every action frame in game_state.last_action_phase,
+        so we only keep each location once.
         """
-        # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
+        summary = game_state.last_action_phase
+        for location in summary.locations(summary.breaches):
+            gamelib.log.info("Got scored on at: {}", location)
+            if location not in self.scored_on_locations:
                 self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
-
+        gamelib.log.debug("All locations: {}", tuple(self.scored_on_locations))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+Buffered, leveled debug logging.
+
+debug_write() formats, writes and flushes stderr every time it is called, which
+adds up quickly when it is called inside loops. The functions in this module
+buffer messages instead and AlgoCore writes them out once per turn, right after
+on_turn returns. Messages are only formatted if they are actually written, so
+verbose logging can stay in your algo:
+
+    gamelib.log.debug("Spawned {} turrets at {}", spawned, locations)
+
+Arguments are formatted when the buffer is flushed, so pass a copy of any list
+you change later in the turn.
+
+Messages below the level set by GAMELIB_LOG_LEVEL (DEBUG, INFO, WARNING or ERROR,
+default DEBUG) are dropped without being formatted. Each message template is
+written at most GAMELIB_LOG_RATE_LIMIT times per turn (default 20, 0 for no limit),
+the rest are counted and summarized at the next flush. Set GAMELIB_LOG_JSONL to a
+file path to also get every record as a line of JSON.
+"""
+import os
+import sys
+import json
+import atexit
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+LEVEL_ENV = "GAMELIB_LOG_LEVEL"
+RATE_LIMIT_ENV = "GAMELIB_LOG_RATE_LIMIT"
+JSONL_ENV = "GAMELIB_LOG_JSONL"
+DEFAULT_RATE_LIMIT = 20
+
+
+def parse_level(level):
+    """Converts a level name or number to a level number
+
+    """
+    if isinstance(level, int):
+        return level
+    level = str(level).strip().upper()
+    if level.isdigit():
+        return int(level)
+    for number, name in LEVEL_NAMES.items():
+        if name == level:
+            return number
+    raise ValueError("Unknown log level '{}'. Use one of {}".format(level, ", ".join(LEVEL_NAMES.values())))
+
+
+class DebugLog:
+    """Collects log records for the current turn and writes them out in one go
+
+    Attributes :
+        * level (int): Records below this level are dropped
+        * rate_limit (int): Maximum number of records per message template per turn, 0 for no limit
+        * jsonl_path (str): If set, every record written is also appended to this file as JSON
+        * turn (int): The turn records are tagged with
+        * stream (file): Where formatted records are written, stderr by default
+
+    """
+    def __init__(self, level=DEBUG, rate_limit=DEFAULT_RATE_LIMIT, jsonl_path=None, stream=None):
+        self.level = parse_level(level)
+        self.rate_limit = rate_limit
+        self.jsonl_path = jsonl_path
+        self.turn = -1
+        self.stream = stream
+        self._records = []
+        self._counts = {}
+        self._suppressed = {}
+
+    def enabled_for(self, level):
+        """Returns True if records of this level would be kept. Use it to guard expensive log arguments
+
+        """
+        return level >= self.level
+
+    def log(self, level, msg, *args):
+        """Buffers a record. msg is formatted with args using str.format when the buffer is flushed
+
+        Args:
+            level: DEBUG, INFO, WARNING or ERROR
+            msg: A format string, or any object to log as is
+            args: Values for the format string
+
+        """
+        if level < self.level:
+            return
+        if self.rate_limit:
+            # Other objects may be unhashable, so they are rate limited by their type
+            key = msg if isinstance(msg, str) else type(msg).__name__
+            count = self._counts.get(key, 0) + 1
+            self._counts[key] = count
+            if count > self.rate_limit:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+        self._records.append((level, self.turn, msg, args))
+
+    def debug(self, msg, *args):
+        self.log(DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self.log(WARNING, msg, *args)
+
+    def error(self, msg, *args):
+        self.log(ERROR, msg, *args)
+
+    def set_turn(self, turn):
+        """Tags the following records with turn and resets the rate limits
+
+        """
+        self.turn = turn
+        self._counts = {}
+
+    def flush(self):
+        """Formats every buffered record and writes them with a single write and flush
+
+        """
+        if not self._records and not self._suppressed:
+            return
+        lines = []
+        json_lines = []
+        for level, turn, msg, args in self._records:
+            text = _format(msg, args)
+            lines.append(text)
+            if self.jsonl_path:
+                json_lines.append(json.dumps({"turn": turn, "level": LEVEL_NAMES.get(level, level), "msg": text}))
+        for msg, count in self._suppressed.items():
+            lines.append("(rate limited {} more '{}' messages)".format(count, msg))
+        self._records = []
+        self._suppressed = {}
+
+        stream = self.stream or sys.stderr
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+        if json_lines:
+            with open(self.jsonl_path, "a") as jsonl_file:
+                jsonl_file.write("\n".join(json_lines) + "\n")
+
+
+def _format(msg, args):
+    if not args:
+        return str(msg).strip()
+    if isinstance(msg, str):
+        return msg.format(*args).strip()
+    return ", ".join(map(str, (msg,) + args)).strip()
+
+
+def _from_env():
+    rate_limit = os.environ.get(RATE_LIMIT_ENV)
+    return DebugLog(level=os.environ.get(LEVEL_ENV, DEBUG),
+                    rate_limit=int(rate_limit) if rate_limit else DEFAULT_RATE_LIMIT,
+                    jsonl_path=os.environ.get(JSONL_ENV) or None)
+
+
+# The log used by the module level functions below and flushed by AlgoCore
+default_log = _from_env()
+atexit.register(default_log.flush)
+
+
+def configure_from_env():
+    """Applies the GAMELIB_LOG_* environment variables to the default log again
+
+    They are read when gamelib is imported. forkserver.py imports gamelib once and
+    starts every game from that import, each game with its own environment.
+
+    """
+    configured = _from_env()
+    default_log.level = configured.level
+    default_log.rate_limit = configured.rate_limit
+    default_log.jsonl_path = configured.jsonl_path
+
+
+log = default_log.log
+debug = default_log.debug
+info = default_log.info
+warning = default_log.warning
+error = default_log.error
+enabled_for = default_log.enabled_for
+set_turn = default_log.set_turn
+flush = default_log.flush
@@ -0,0 +1,245 @@
+"""
+Optional fork server for starting local games from an already imported algo.
+
+Every game normally starts a new python that imports gamelib, the strategy and
+everything the strategy imports before it can answer the first turn. When many
+local games are played, for example with run_arena.py, that startup is paid
+again for every game. A fork server imports the strategy once and forks a copy
+of itself for every game instead:
+
+    python3 gamelib/forkserver.py serve
+
+keeps running and listens on a Unix socket named .forkserver.sock in the algo
+folder. While the socket exists, run.sh starts this file as a small client
+instead of algo_strategy.py. The client sends its stdin, stdout and stderr, its
+environment and its working directory over the socket, the server forks, and the
+child plays the game on those streams as if run.sh had started it directly. The
+client waits for the game to end and exits with the child's exit code. The child
+exits as soon as the client's connection closes, so killing the client, for
+example when a match times out, also ends a game that is stuck in a turn.
+
+If the server is not running, the client starts algo_strategy.py the normal
+way, so run.sh keeps working everywhere. Fork servers need Unix sockets that can
+pass file descriptors (Linux and macOS, python 3.9 or newer); elsewhere no socket
+is created and run.sh starts the algo as before. Restart the server after
+changing the algo, forked games run the code imported when the server started.
+
+This file is run directly, not imported from gamelib, so that the client does
+not have to import anything but the standard library.
+"""
+import os
+import sys
+import json
+import random
+import signal
+import socket
+import struct
+import threading
+import importlib
+import traceback
+
+SOCKET_NAME = ".forkserver.sock"
+
+# A request is the length of its JSON body followed by the body
+_LENGTH = struct.Struct("!I")
+# The exit code of a finished game
+_EXIT_CODE = struct.Struct("!i")
+
+
+def socket_path(algo_dir):
+    """Gets the path of the socket the fork server of an algo listens on
+
+    """
+    return os.path.join(os.path.abspath(algo_dir), SOCKET_NAME)
+
+
+def supported():
+    """Returns True if this platform can pass file descriptors over Unix sockets
+
+    """
+    return hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds") and hasattr(os, "fork")
+
+
+def _recv_exactly(conn, size, data=b""):
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed after {} of {} bytes".format(len(data), size))
+        data += chunk
+    return data
+
+
+def _server_running(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def connect(algo_dir):
+    """Plays a game through the fork server of an algo, or starts the algo normally if there is none
+
+    Never returns, the process exits with the exit code of the game.
+
+    Args:
+        algo_dir: The algo folder, the one containing algo_strategy.py
+
+    """
+    client = None
+    if supported():
+        body = json.dumps({"env": dict(os.environ), "cwd": os.getcwd()}).encode()
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(socket_path(algo_dir))
+            socket.send_fds(client, [_LENGTH.pack(len(body)) + body], [0, 1, 2])
+        except OSError:
+            client.close()
+            client = None
+    if client is None:
+        # No server, a stale socket or an unsupported platform: start the algo the way run.sh normally does
+        os.execv(sys.executable, [sys.executable, "-u", os.path.join(algo_dir, "algo_strategy.py")])
+
+    try:
+        code, = _EXIT_CODE.unpack(_recv_exactly(client, _EXIT_CODE.size))
+    except (OSError, ConnectionError):
+        code = 1
+    sys.exit(code)
+
+
+def _watch_client(conn):
+    """Runs on a thread of the forked child: ends the game as soon as the client's connection closes
+
+    The client never sends anything after its request, so recv only returns once the client is gone.
+    Without this a game stuck in a turn would never read its closed stdin and keep running.
+
+    """
+    try:
+        conn.recv(1)
+    except OSError:
+        pass
+    os._exit(1)
+
+
+def _play(strategy, conn, fds, request):
+    """Runs in the forked child: takes over the client's streams and plays one game
+
+    """
+    for handled in (signal.SIGCHLD, signal.SIGINT, signal.SIGTERM):
+        signal.signal(handled, signal.SIG_DFL)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # Fresh file objects so nothing buffered by the server leaks into the game, stdout behaves like python -u
+    sys.stdin = os.fdopen(0, "r", closefd=False)
+    sys.stdout = os.fdopen(1, "w", buffering=1, closefd=False)
+    sys.stderr = os.fdopen(2, "w", buffering=1, closefd=False)
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    sys.argv = [strategy.__file__]
+    # Every fork starts with the server's random state, so each game needs its own
+    random.seed()
+    if "gamelib.log" in sys.modules:
+        sys.modules["gamelib.log"].configure_from_env()
+    threading.Thread(target=_watch_client, args=(conn,), daemon=True).start()
+
+    code = 0
+    try:
+        strategy.AlgoStrategy().start()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        if "gamelib.log" in sys.modules:
+            sys.modules["gamelib.log"].flush()
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        try:
+            conn.sendall(_EXIT_CODE.pack(code))
+        except OSError:
+            pass
+        # Skips the server's cleanup, which belongs to the parent
+        os._exit(code)
+
+
+def serve(algo_dir, path=None):
+    """Imports the strategy of an algo and forks a copy of it for every game a client asks for
+
+    Runs until it is interrupted or terminated, then removes its socket.
+
+    Args:
+        algo_dir: The algo folder, the one containing algo_strategy.py
+        path: The socket to listen on, .forkserver.sock in the algo folder by default
+
+    """
+    if not supported():
+        raise RuntimeError("Fork servers need Unix sockets that can pass file descriptors (python 3.9+ on Linux or macOS)")
+    algo_dir = os.path.abspath(algo_dir)
+    path = path or socket_path(algo_dir)
+    if os.path.exists(path):
+        if _server_running(path):
+            raise RuntimeError("A fork server is already listening on {}".format(path))
+        os.unlink(path)
+
+    # Import the strategy the way run.sh would: from the algo folder, without this folder shadowing modules
+    gamelib_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [algo_dir] + [entry for entry in sys.path if os.path.abspath(entry or ".") != gamelib_dir]
+    strategy = importlib.import_module("algo_strategy")
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(64)
+    # Finished games are reaped automatically, and terminating the server cleans up like Ctrl+C
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    sys.stderr.write("Fork server for {} listening on {}\n".format(algo_dir, path))
+    try:
+        while True:
+            conn, _ = server.accept()
+            fds = []
+            try:
+                data, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+                data = _recv_exactly(conn, _LENGTH.size, data)
+                length, = _LENGTH.unpack(data[:_LENGTH.size])
+                request = json.loads(_recv_exactly(conn, _LENGTH.size + length, data)[_LENGTH.size:])
+                if len(fds) != 3:
+                    raise ValueError("Expected stdin, stdout and stderr, got {} file descriptors".format(len(fds)))
+            except (OSError, ConnectionError, ValueError) as e:
+                sys.stderr.write("Fork server dropped a client: {}\n".format(e))
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+                continue
+
+            if os.fork() == 0:
+                server.close()
+                _play(strategy, conn, fds, request)
+            conn.close()
+            for fd in fds:
+                os.close(fd)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("serve", "connect"):
+        sys.stderr.write("Usage: forkserver.py serve|connect [ALGO_FOLDER]\n")
+        sys.exit(2)
+    folder = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    if sys.argv[1] == "serve":
+        serve(folder)
+    else:
+        connect(folder)
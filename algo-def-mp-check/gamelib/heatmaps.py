@@ -0,0 +1,147 @@
+"""
+Heatmaps of past games, for use at startup.
+
+game_state.last_action_phase only covers the last turn. scripts/contributions/heatmaps.py
+adds the same tallies up over a folder of replays of one algo and writes them to a
+JSON file, which the algo can ship with and load once, usually in on_game_start:
+
+    self.heatmaps = gamelib.heatmaps.load(os.path.join(os.path.dirname(__file__), "heatmaps.json"))
+    ...
+    if self.heatmaps:
+        breaches = self.heatmaps.grid("breaches", game_state.turn_number)
+        for location in self.heatmaps.locations(breaches, 3):
+            game_state.attempt_spawn(TURRET, location)
+
+Grids are ARENA_SIZE x ARENA_SIZE and indexed as grid[x][y] like the ones of
+ActionPhaseSummary, and always seen from your side of the board. They hold the
+average per game, so maps made from a different number of games compare directly.
+"""
+
+import json
+
+from .util import debug_write
+
+ARENA_SIZE = 28
+
+# The maps the script writes besides enemy_spawns, which has one map per unit type
+MAP_NAMES = ("breaches", "damage_taken", "structures_lost")
+ALL_OPPONENTS = "*"
+
+
+def _grid(value=0.0):
+    return [[value] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+
+
+class Heatmaps:
+    """Tallies of past games by opponent and turn range, as written by scripts/contributions/heatmaps.py
+
+    Attributes :
+        * algo (str): The algo the replays were tallied for
+        * turn_ranges (list): [first, last] turn of each range the maps are split into, last is None for the final one
+        * opponents (dict): Maps an opponent name, or "*" for all of them, to its games and maps
+
+    """
+    def __init__(self, data):
+        """Wraps the parsed contents of a heatmap file
+
+        Args:
+            data: The parsed JSON the script wrote
+
+        """
+        self.algo = data.get("algo")
+        self.turn_ranges = [list(turn_range) for turn_range in data["turn_ranges"]]
+        self.opponents = data["opponents"]
+
+    def _opponent(self, opponent):
+        return self.opponents.get(opponent) or self.opponents.get(ALL_OPPONENTS) or {"games": 0, "maps": []}
+
+    def games(self, opponent=ALL_OPPONENTS):
+        """Gets the number of games the maps of an opponent come from
+
+        Args:
+            opponent: An opponent name, unknown ones fall back to all opponents
+
+        Returns:
+            The number of games
+
+        """
+        return self._opponent(opponent)["games"]
+
+    def range_index(self, turn):
+        """Gets the index of the turn range a turn falls in, or None if it falls in none
+
+        """
+        for i, (first, last) in enumerate(self.turn_ranges):
+            if turn >= first and (last is None or turn <= last):
+                return i
+        return None
+
+    def grid(self, name, turn=None, opponent=ALL_OPPONENTS, unit_type=None):
+        """Builds the grid of one map, averaged per game
+
+        Args:
+            name: breaches, damage_taken, structures_lost or enemy_spawns
+            turn: Only use the turn range this turn falls in, or None to add up every range
+            opponent: An opponent name, unknown ones fall back to all opponents
+            unit_type: The unit shorthand for enemy_spawns, for example "PI", or None to add up every type
+
+        Returns:
+            A grid indexed as grid[x][y], all 0 if there is no data
+
+        """
+        grid = _grid()
+        data = self._opponent(opponent)
+        if not data["games"]:
+            return grid
+        if turn is None:
+            maps = data["maps"]
+        else:
+            i = self.range_index(turn)
+            maps = [] if i is None or i >= len(data["maps"]) else [data["maps"][i]]
+
+        for turn_range in maps:
+            if name == "enemy_spawns":
+                spawns = turn_range.get(name, {})
+                cell_lists = list(spawns.values()) if unit_type is None else [spawns.get(unit_type, [])]
+            else:
+                cell_lists = [turn_range.get(name, [])]
+            for cells in cell_lists:
+                for x, y, value in cells:
+                    grid[x][y] += value
+
+        games = data["games"]
+        return [[value / games for value in column] for column in grid]
+
+    @staticmethod
+    def locations(grid, count=None):
+        """Gets the locations with a non zero value in a grid, highest first
+
+        Args:
+            grid: A grid returned by grid()
+            count: The number of locations to return, or None for all of them
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        cells = [(grid[x][y], x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE) if grid[x][y]]
+        cells.sort(key=lambda cell: -cell[0])
+        return [[x, y] for _, x, y in cells[:count]]
+
+
+def load(path):
+    """Loads a heatmap file
+
+    Args:
+        path: The JSON file scripts/contributions/heatmaps.py wrote
+
+    Returns:
+        A Heatmaps, or None if the file is missing or unreadable, so an algo still runs without one
+
+    """
+    try:
+        with open(path) as f:
+            return Heatmaps(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        debug_write("Could not load heatmaps from {}: {}".format(path, e))
+        return None
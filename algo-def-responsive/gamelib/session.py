@@ -0,0 +1,261 @@
+"""
+Records what an algo hears and says during a game, and replays it offline.
+
+Set the GAMELIB_RECORD_DIR environment variable to a directory before a match
+(local engine, run_arena.py or selfplay.py) and every algo started in it writes
+a session file there: every line the engine sends, every command line the algo
+answers with, and the random seed and ALGO_PARAMS the algo was started with.
+
+A session can then be played to the same or a changed algo without an engine:
+
+    python3 gamelib/session.py replay SESSION_FILE [ALGO_FOLDER]
+
+feeds the recorded frames to algo_strategy.py in ALGO_FOLDER (the folder of this
+gamelib by default) as fast as it can answer, times every on_turn, and compares
+the build and deploy commands of every turn with the recorded ones. It exits with
+1 if any turn differs, so a performance refactor of gamelib can be checked to
+change nothing in seconds, and profiled without the engine in the way.
+
+A replay only matches when the algo does the same with the same frames: the
+recorded seed is passed in ALGO_SEED so AlgoCore seeds random the same way, but
+an algo that reads the clock or other outside state can still answer differently.
+
+This file is run directly for replays and only needs the standard library, so it
+can replay a session to an algo with a different copy of gamelib.
+"""
+import os
+import io
+import sys
+import json
+import time
+import importlib
+import traceback
+
+RECORD_DIR_ENV = "GAMELIB_RECORD_DIR"
+PARAMS_ENV = "ALGO_PARAMS"
+SEED_ENV = "ALGO_SEED"
+
+# Every line of a session starts with one of these tags and a tab
+HEADER = b"#"
+RECEIVED = b"<"
+SENT = b">"
+
+
+def record_dir_from_env():
+    """Returns the directory requested through GAMELIB_RECORD_DIR, or None if recording is off
+
+    """
+    return os.environ.get(RECORD_DIR_ENV) or None
+
+
+class SessionRecorder:
+    """Writes the lines an algo receives and sends to a session file
+
+    AlgoCore creates one when recording is on and hands it to util, which reports
+    every line read from the engine and every command line written to it.
+
+    Attributes :
+        * path (str): The session file
+
+    """
+    def __init__(self, directory, seed=None):
+        os.makedirs(directory, exist_ok=True)
+        algo = os.path.basename(os.path.dirname(os.path.abspath(sys.argv[0]))) or "algo"
+        self.path = os.path.join(directory, "{}-{}-{}.session".format(algo, time.strftime("%Y%m%d-%H%M%S"), os.getpid()))
+        self._file = open(self.path, "wb")
+        header = {"algo": algo, "seed": seed, "params": os.environ.get(PARAMS_ENV), "time": time.time()}
+        self._file.write(HEADER + b"\t" + json.dumps(header).encode() + b"\n")
+
+    def received(self, line):
+        """Records a line from the engine, as the bytes that were read
+
+        """
+        self._file.write(RECEIVED + b"\t" + line if line.endswith(b"\n") else RECEIVED + b"\t" + line + b"\n")
+
+    def sent(self, data):
+        """Records the command lines the algo wrote, as the bytes that were written
+
+        """
+        for line in data.splitlines():
+            self._file.write(SENT + b"\t" + line + b"\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def load_session(path):
+    """Reads a session file
+
+    Returns:
+        The header dict and a list of (tag, line) tuples, lines without their newline
+
+    """
+    header = {}
+    records = []
+    with open(path, "rb") as f:
+        for line in f:
+            tag, _, data = line.rstrip(b"\n").partition(b"\t")
+            if tag == HEADER:
+                header = json.loads(data)
+            else:
+                records.append((tag, data))
+    return header, records
+
+
+def recorded_turns(records):
+    """Groups the records of a session by turn
+
+    Returns:
+        A list of dicts with the turn number, the commands sent for it (parsed JSON)
+        and the time the engine reported for it in ms, or None if it did not say
+
+    """
+    turns = []
+    waiting = None
+    for tag, data in records:
+        if tag == SENT:
+            if turns:
+                turns[-1]["commands"].append(_parse_command(data))
+            continue
+        if b"turnInfo" not in data:
+            continue
+        frame = json.loads(data)
+        # The engine reports the time of a turn in the first frame after its deploy frame
+        if waiting is not None:
+            waiting["recorded_ms"] = frame.get("p1Stats", [None] * 4)[3]
+            waiting = None
+        if frame["turnInfo"][0] == 0:
+            waiting = {"turn": frame["turnInfo"][1], "commands": [], "recorded_ms": None}
+            turns.append(waiting)
+    return turns
+
+
+def _parse_command(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return line.decode(errors="replace")
+
+
+def replay(path, algo_dir, quiet=True):
+    """Plays a recorded session to the algo in algo_dir and compares its answers
+
+    Args:
+        path: The session file
+        algo_dir: The algo folder, the one containing algo_strategy.py
+        quiet: If True, what the algo writes to stderr is discarded
+
+    Returns:
+        A list with one dict per turn: the turn number, replayed_ms, recorded_ms,
+        the recorded and replayed commands, whether they match and the traceback
+        if the algo raised an error in that turn
+
+    """
+    header, records = load_session(path)
+    expected = recorded_turns(records)
+
+    # Import the strategy the way run.sh would: from the algo folder, without this folder shadowing modules
+    algo_dir = os.path.abspath(algo_dir)
+    gamelib_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [algo_dir] + [entry for entry in sys.path if os.path.abspath(entry or ".") != gamelib_dir]
+    sys.argv = [os.path.join(algo_dir, "algo_strategy.py")]
+    os.environ.pop(RECORD_DIR_ENV, None)
+    if header.get("params") is not None:
+        os.environ[PARAMS_ENV] = header["params"]
+    else:
+        os.environ.pop(PARAMS_ENV, None)
+    if header.get("seed") is not None:
+        os.environ[SEED_ENV] = str(header["seed"])
+    strategy = importlib.import_module("algo_strategy")
+
+    received = b"".join(data + b"\n" for tag, data in records if tag == RECEIVED)
+    output = io.BytesIO()
+    stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = io.TextIOWrapper(io.BytesIO(received))
+    sys.stdout = io.TextIOWrapper(output, write_through=True)
+    if quiet:
+        sys.stderr = io.StringIO()
+    replayed = []
+    try:
+        algo = strategy.AlgoStrategy()
+        on_turn = algo.on_turn
+
+        def timed_on_turn(turn_state):
+            mark = output.tell()
+            start = time.perf_counter()
+            error = None
+            try:
+                on_turn(turn_state)
+            except Exception:
+                error = traceback.format_exc()
+                raise
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                lines = output.getvalue()[mark:].splitlines()
+                replayed.append({"replayed_ms": elapsed, "commands": [_parse_command(line) for line in lines], "error": error})
+
+        # AlgoCore.start looks on_turn up on the instance, so the timed version is the one called
+        algo.on_turn = timed_on_turn
+        try:
+            algo.start()
+        except SystemExit:
+            pass        # a session that was cut off ends like a game whose engine died
+        except Exception:
+            pass        # the error is in the report of the turn it happened in
+    finally:
+        # Log records still buffered by a turn that raised belong to the algo's stderr too
+        if "gamelib.log" in sys.modules:
+            sys.modules["gamelib.log"].flush()
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+
+    report = []
+    for i, turn in enumerate(expected):
+        result = replayed[i] if i < len(replayed) else {"replayed_ms": None, "commands": None, "error": None}
+        report.append({
+            "turn": turn["turn"],
+            "replayed_ms": result["replayed_ms"],
+            "recorded_ms": turn["recorded_ms"],
+            "recorded": turn["commands"],
+            "replayed": result["commands"],
+            "match": turn["commands"] == result["commands"],
+            "error": result["error"],
+        })
+    return report
+
+
+def print_report(report, out=sys.stdout):
+    """Prints the timing of every turn, the turns whose commands differ and a summary
+
+    """
+    out.write("{:>6}{:>14}{:>14}  {}\n".format("Turn", "Replayed ms", "Recorded ms", "Commands"))
+    for turn in report:
+        out.write("{:>6}{:>14}{:>14}  {}\n".format(
+            turn["turn"],
+            "-" if turn["replayed_ms"] is None else "{:.1f}".format(turn["replayed_ms"]),
+            "-" if turn["recorded_ms"] is None else turn["recorded_ms"],
+            "same" if turn["match"] else "DIFFERENT"))
+    for turn in report:
+        if not turn["match"]:
+            out.write("\nTurn {} recorded:\n  {}\nTurn {} replayed:\n  {}\n".format(
+                turn["turn"], turn["recorded"], turn["turn"], turn["replayed"]))
+        if turn["error"]:
+            out.write("\nTurn {} raised:\n{}".format(turn["turn"], turn["error"]))
+    times = sorted(turn["replayed_ms"] for turn in report if turn["replayed_ms"] is not None)
+    differing = sum(1 for turn in report if not turn["match"])
+    if times:
+        out.write("\n{} turns in {:.1f} ms, median {:.1f} ms, max {:.1f} ms\n".format(
+            len(times), sum(times), times[len(times) // 2], times[-1]))
+    out.write("{} of {} turns have different commands\n".format(differing, len(report)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "replay":
+        sys.stderr.write("Usage: session.py replay SESSION_FILE [ALGO_FOLDER]\n")
+        sys.exit(2)
+    folder = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+    result = replay(sys.argv[2], folder)
+    print_report(result)
+    sys.exit(0 if all(turn["match"] for turn in result) else 1)
@@ -1,4 +1,8 @@
 #!/bin/bash
 
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+# While a fork server is running for this algo the game is started from it, see gamelib/forkserver.py
+if [ -S "$DIR/.forkserver.sock" ]; then
+    exec ${PYTHON_CMD:-python3} -S "$DIR/gamelib/forkserver.py" connect "$DIR"
+fi
 ${PYTHON_CMD:-python3} -u "$DIR/algo_strategy.py"
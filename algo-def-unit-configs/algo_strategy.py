@@ -2,8 +2,6 @@ import math
 
 import gamelib
 import random
-from sys import maxsize
-import json
 
 """
 Most of the algo code you write will be in this file unless you create new
@@ -11,7 +9,9 @@ modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - Breaches, damage and spawns of the last action phase are tallied for you in
+  game_state.last_action_phase. For anything else you can analyze action frames
+  by modifying on_action_frame function
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
@@ -22,7 +22,8 @@ Advanced strategy tips:
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
-        seed = random.randrange(maxsize)
+        # AlgoCore picks the seed: ALGO_SEED when a match sets it, a fresh one otherwise
+        seed = self.seed
         random.seed(seed)
         gamelib.debug_write('Random seed: {}'.format(seed))
         # Locations passed by reference to GameState. Should only be updated in GameState
@@ -47,8 +48,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
 
-        self.scored_on_locations = []
-        self.damaged_locations = []
+        # location tuple -> number of times we were scored on / damaged there
+        self.scored_on_counts = {}
+        self.damaged_counts = {}
         self.add_supports = False
         self.ready_attack = False
         self.attacked_in_last_round_and_removed_all = False
@@ -79,6 +81,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         game_state = gamelib.GameState(self.config, turn_state, self.turret_locations, self.wall_locations,
                                        self.support_locations)
+        self.record_action_phase(game_state)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  # Comment or remove this line to enable warnings.
 
@@ -119,13 +122,13 @@ class AlgoStrategy(gamelib.AlgoCore):
         avg_damage, avg_breached = self.predict_enemy_attack_magnitude(game_state)
 
         attack_in_progress = False
-        if self.ready_attack and game_state.get_resource(MP, 0) > 9:
+        if self.ready_attack and game_state.get_resource(MP, 0) > self.params.get("attack_mp", 9):
             # left is in our view
             enemy_has_most_defense_on_left = self.get_side_enemy_defense(game_state)
             # want to build attack on same side as their defense since it will go opposite side
             max_turrets = 1000
             if game_state.get_resource(SP, 0) < game_state.type_cost(SUPPORT)[SP] * 10 + game_state.type_cost(TURRET)[SP] * 5:
-                max_turrets = 5
+                max_turrets = self.params.get("max_turrets", 5)
             self.build_attack(game_state, left=enemy_has_most_defense_on_left, max_turrets=max_turrets)
             attack_in_progress = True
             # remove offensive structure if not enough MP for next turn.
@@ -138,7 +141,7 @@ class AlgoStrategy(gamelib.AlgoCore):
                 self.refund_structures(TURRET, game_state, False)
                 self.attacked_in_last_round_and_removed_all = True
                 self.ready_attack = False
-        elif (self.is_ready_to_build_offensive(4, 6, game_state) or game_state.get_resource(MP, 0) > 20) and not self.attacked_in_last_round_and_removed_all:
+        elif (self.is_ready_to_build_offensive(4, 6, game_state, self.params.get("offensive_scouts", 8)) or game_state.get_resource(MP, 0) > 20) and not self.attacked_in_last_round_and_removed_all:
             if not self.need_to_send_demolisher(game_state):
                 self.refund_structures(TURRET, game_state, False)
                 self.refund_structures(WALL, game_state, False)
@@ -211,12 +214,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         gamelib.debug_write("Finished refunding")
 
-        # clear placeholders for next turn stats
-        self.num_scored_on = 0
-        self.last_turn_damaged = 0
-        self.mobile_units_enemy_last_turn[SCOUT] = 0
-        self.mobile_units_enemy_last_turn[DEMOLISHER] = 0
-        self.mobile_units_enemy_last_turn[INTERCEPTOR] = 0
+        # remember the enemy's MP for next turn's stats, the rest are filled in by record_action_phase
         self.last_turn_enemy_MP = game_state.get_resource(MP, 1)
         self.potential_hole = []
 
@@ -466,8 +464,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         game_state.update_loc(unit_type)
 
-        gamelib.debug_write(locations)
-        gamelib.debug_write(game_state.turret_locations)
+        gamelib.log.debug("Refunding {} from {}", unit_type, tuple(locations))
 
         for loc in locations:
             for unit in game_state.game_map[loc[0], loc[1]]:
@@ -760,8 +757,7 @@ class AlgoStrategy(gamelib.AlgoCore):
     def build_reactive_defense(self, game_state, attack_soon: bool):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
-        We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        We track where the opponent scored in the record_action_phase function
         """
         # should fortify most attacked locations, but make sure not to block offense since it will be upgraded units
         # since we are avoiding the edges, for the very front, if y + 2 doesn't work, try x +/- 2
@@ -771,8 +767,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         if attack_soon:
             locations_do_not_build = [[4, 11], [5, 11], [4, 12], [24, 12], [24, 11], [22, 11]]
 
-        sorted_hits = self.get_sorted_hits(self.scored_on_locations, game_state)
-        sorted_damages = self.get_sorted_hits(self.damaged_locations, game_state)
+        sorted_hits = self.get_sorted_hits(self.scored_on_counts, game_state)
+        sorted_damages = self.get_sorted_hits(self.damaged_counts, game_state)
 
         if [1, 13] in sorted_damages:
             game_state.attempt_spawn(TURRET, [1, 13])
@@ -798,15 +794,10 @@ class AlgoStrategy(gamelib.AlgoCore):
                 game_state.attempt_spawn(TURRET, build_location)
                 game_state.attempt_spawn(WALL, build_location)  # at least a wall if the other doesn't work
 
-    def get_sorted_hits(self, locations, game_state):
+    def get_sorted_hits(self, counts, game_state):
         """
         Returns a list of locations by most hit to least hit
         """
-        counts = dict()
-        for i in locations:
-            loc = tuple(i)
-            counts[loc] = counts.get(loc, 0) + 1
-
         # sorted by largest frequency
         return sorted(counts.keys(), key=lambda item: counts[item], reverse=True)
 
@@ -893,58 +884,24 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
-        """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
-        Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
-        """
-
-        gamelib.debug_write("Starting on_action_frame analysis")
-
-        # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        damages = events["damage"]
-
-        stationary_units = [0, 1, 2]
-
-        turn_info = state["turnInfo"]
-        phase = turn_info[0]
-        turn_number = turn_info[1]
-        action_phase = 1
-
-        if phase == action_phase and turn_number == 0:
-            # record enemy mobile units deployed
-            p2_units = state["p2Units"]
-            self.mobile_units_enemy_last_turn[SCOUT] = len(p2_units[3])
-            self.mobile_units_enemy_last_turn[DEMOLISHER] = len(p2_units[4])
-            self.mobile_units_enemy_last_turn[INTERCEPTOR] = len(p2_units[5])
-
-        for damage in damages:
-            location = damage[0]
-            damage_taken = damage[1]
-            unit_type = damage[2]
-            player = damage[4]
-            if player == 1 and unit_type in stationary_units:
-                gamelib.debug_write("Got damage at: {}".format(location))
-                self.damaged_locations.append(location)
-                self.last_turn_damaged += damage_taken
-
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
-                self.num_scored_on += 1
-                self.scored_on_locations.append(location)
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
-
-        gamelib.debug_write("Finished on_action_frame analysis")
+    def record_action_phase(self, game_state):
+        """
+        Collects the statistics of the last action phase.
+        gamelib tallies the events of every action frame in game_state.last_action_phase,
+        we only keep running counts per location so nothing grows with the length of the game.
+        """
+        summary = game_state.last_action_phase
+        self.num_scored_on = summary.total(summary.breaches)
+        self.last_turn_damaged = summary.total(summary.damage_taken)
+        for unit_type in self.mobile_units_enemy_last_turn:
+            self.mobile_units_enemy_last_turn[unit_type] = summary.total(summary.enemy_spawns[unit_type])
+
+        for x, y in summary.locations(summary.breaches):
+            gamelib.log.info("Got scored on at: {}", [x, y])
+            self.scored_on_counts[(x, y)] = self.scored_on_counts.get((x, y), 0) + summary.breaches[x][y]
+        for x, y in summary.locations(summary.damage_taken):
+            gamelib.log.debug("Got damage at: {}", [x, y])
+            self.damaged_counts[(x, y)] = self.damaged_counts.get((x, y), 0) + summary.damage_hits[x][y]
 
 
 if __name__ == "__main__":
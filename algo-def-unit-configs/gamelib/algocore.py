@@ -1,7 +1,12 @@
-import json
-
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+import sys
+import random
+from .util import read_command, debug_write, BANNER_TEXT, send_commands, loads, algo_params, algo_seed, set_recorder
+from .profiling import Profiler, profiling_enabled
+from .sampler import SamplingProfiler, sample_dir_from_env
+from .action_summary import ActionPhaseSummary, set_last_summary
+from .session import SessionRecorder, record_dir_from_env
+from . import log
 
 class AlgoCore(object):
     """
@@ -10,10 +15,24 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * profile (bool): If true, gamelib hot paths are timed and reported, see profiling.py
+        * sample_dir (str): If set, stack samples of each turn are written to this directory, see sampler.py
+        * params (dict): Strategy parameters from the ALGO_PARAMS environment variable, see util.algo_params
+        * seed (int): The seed random is seeded with: ALGO_SEED if the match sets it, a fresh one otherwise
+        * record_dir (str): If set, the game is recorded to a session file in this directory, see session.py
 
     """
     def __init__(self):
         self.config = None
+        self.profile = profiling_enabled()
+        self.sample_dir = sample_dir_from_env()
+        self.params = algo_params()
+        self.record_dir = record_dir_from_env()
+        # The same seed and the same frames give the same game, which arena caches and replays rely on
+        self.seed = algo_seed()
+        if self.seed is None:
+            self.seed = random.SystemRandom().randrange(sys.maxsize)
+        random.seed(self.seed)
 
     def on_game_start(self, config):
         """
@@ -31,8 +50,7 @@ class AlgoCore(object):
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
         """
-        send_command("[]")
-        send_command("[]")
+        send_commands("[]", "[]")
     
     def on_action_frame(self, action_frame_game_state):
         """
@@ -53,35 +71,84 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        profiler = None
+        parse, on_turn, on_action_frame = loads, self.on_turn, self.on_action_frame
+        if self.profile:
+            profiler = Profiler()
+            profiler.install()
+            parse = profiler.wrap(loads, "AlgoCore.parse")
+            on_turn = profiler.wrap(self.on_turn, "AlgoCore.on_turn")
+            on_action_frame = profiler.wrap(self.on_action_frame, "AlgoCore.on_action_frame")
+        sampler = None
+        if self.sample_dir:
+            sampler = SamplingProfiler(self.sample_dir)
+            on_turn = sampler.wrap(on_turn, "on_turn")
+            on_action_frame = sampler.wrap(on_action_frame, "on_action_frame")
+            sampler.start()
+        recorder = None
+        if self.record_dir:
+            recorder = SessionRecorder(self.record_dir, self.seed)
+            set_recorder(recorder)
+        turn_number = -1
+        action_phase = None
+
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
+            # Frames are read as bytes and only decoded to str for the strategy callbacks
+            game_state_bytes = read_command()
+            if b"replaySave" in game_state_bytes:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
+                parsed_config = loads(game_state_bytes)
                 self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
+            elif b"turnInfo" in game_state_bytes:
+                state = parse(game_state_bytes)
+                game_state_string = game_state_bytes.decode()
                 stateType = int(state.get("turnInfo")[0])
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    if profiler is not None and turn_number >= 0:
+                        profiler.end_turn(turn_number)
+                    turn_number = int(state.get("turnInfo")[1])
+                    # The action phase that just ended is handed to the GameState of this turn
+                    set_last_summary(action_phase or ActionPhaseSummary(self.config, turn_number - 1))
+                    action_phase = ActionPhaseSummary(self.config, turn_number)
+                    if sampler is not None:
+                        sampler.turn = turn_number
+                    log.set_turn(turn_number)
+                    on_turn(game_state_string)
+                    # Buffered log records of the last action phase and this turn are written together
+                    log.flush()
+                    if recorder is not None:
+                        recorder.flush()
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    if action_phase is not None:
+                        action_phase.update(state)
+                    on_action_frame(game_state_string)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
+                    log.flush()
                     debug_write("Got end state, game over. Stopping algo.")
+                    if profiler is not None:
+                        profiler.end_turn(turn_number)
+                        profiler.write_report()
+                        profiler.uninstall()
+                    if sampler is not None:
+                        sampler.stop()
+                        sampler.write()
+                    if recorder is not None:
+                        set_recorder(None)
+                        recorder.close()
                     break
                 else:
                     """
@@ -92,4 +159,4 @@ class AlgoCore(object):
                 """
                 Something is wrong? Received an incorrect or improperly formatted string.
                 """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                debug_write("Got unexpected string : {}".format(game_state_bytes.decode(errors="replace")))
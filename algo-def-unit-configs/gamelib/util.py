@@ -1,8 +1,28 @@
+import os
 import sys
 
+# Frames are decoded with the fastest JSON library that is installed
+try:
+    import orjson as _json
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import ujson as _json
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        import json as _json
+        JSON_BACKEND = "json"
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+# Strategy knobs can be set from outside the algo, for example by scripts/contributions/selfplay.py
+PARAMS_ENV = "ALGO_PARAMS"
+# The seed of a match, set by run_arena.py, selfplay.py and engine.py --seed
+SEED_ENV = "ALGO_SEED"
+
+# While a game is recorded every line read and written is also handed to this, see session.py
+_recorder = None
+
 
 def get_command():
     """Gets input from stdin
@@ -19,8 +39,31 @@ def get_command():
         # Don't change or starter-algo process won't exit even though the game has closed
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
+    if _recorder is not None:
+        _recorder.received(ret.encode())
+    return ret
+
+def read_command():
+    """Gets the next line from stdin as raw bytes, skipping the text decoding layer
+
+    Do not mix it with get_command, the two do not share a buffer.
+
+    """
+    ret = sys.stdin.buffer.readline()
+    if not ret:
+        # Parent game process died or closed the pipe, exit for cleanup
+        debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+        exit()
+    if _recorder is not None:
+        _recorder.received(ret)
     return ret
 
+def loads(data):
+    """Parses a JSON frame (str or bytes) with the fastest available backend, see JSON_BACKEND
+
+    """
+    return _json.loads(data)
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
@@ -28,6 +71,19 @@ def send_command(cmd):
     """
     sys.stdout.write(cmd.strip() + "\n")
     sys.stdout.flush()
+    if _recorder is not None:
+        _recorder.sent((cmd.strip() + "\n").encode())
+
+def send_commands(*cmds):
+    """Sends several command lines to standard output with a single write and flush.
+    Used by 'GameState.submit_turn()' to send the build and deploy lines together
+
+    """
+    data = "".join(cmd.strip() + "\n" for cmd in cmds).encode()
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+    if _recorder is not None:
+        _recorder.sent(data)
 
 def debug_write(*msg):
     """Prints a message to the games debug output
@@ -39,3 +95,52 @@ def debug_write(*msg):
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
+
+def algo_params():
+    """Reads the strategy parameters passed in the ALGO_PARAMS environment variable
+
+    ALGO_PARAMS holds a JSON object such as {"offensive_walls": 4}. Strategies read their knobs
+    with self.params.get(name, default), so without the variable every knob keeps its default.
+
+    Returns:
+        A dict of parameter names to values, empty if the variable is not set or invalid
+
+    """
+    text = os.environ.get(PARAMS_ENV, "")
+    if not text:
+        return {}
+    try:
+        params = loads(text)
+    except ValueError:
+        debug_write("Ignoring {}, it is not valid JSON: {}".format(PARAMS_ENV, text))
+        return {}
+    if not isinstance(params, dict):
+        debug_write("Ignoring {}, it is not a JSON object: {}".format(PARAMS_ENV, text))
+        return {}
+    return params
+
+def algo_seed():
+    """Reads the seed of the match from the ALGO_SEED environment variable
+
+    Returns:
+        The seed as an int, or None if the variable is not set or not a number
+
+    """
+    text = os.environ.get(SEED_ENV, "")
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        debug_write("Ignoring {}, it is not a number: {}".format(SEED_ENV, text))
+        return None
+
+def set_recorder(recorder):
+    """Hands every line read from and written to the engine to recorder, or stops recording if it is None
+
+    Args:
+        recorder: An object with received(bytes) and sent(bytes) methods, like session.SessionRecorder
+
+    """
+    global _recorder
+    _recorder = recorder
@@ -16,14 +16,28 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The ActionPhaseSummary class in action_summary.py tallies breaches, damage, lost structures and enemy spawns of each action phase. 
+The last one is available as game_state.last_action_phase, so most algos no longer need to parse action frames themselves. \n
+
+heatmaps.py loads the breach, damage, loss and enemy spawn maps scripts/contributions/heatmaps.py adds up over past replays.
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+
+log.py contains buffered, leveled debug logging that is written once per turn. Prefer gamelib.log.debug() over debug_write() inside loops.
+
+profiling.py contains opt-in counters and timers for the methods above. Set GAMELIB_PROFILE=1 to find out where a slow turn spends its time.
+sampler.py contains a sampling profiler that writes flamegraph stacks of on_turn and on_action_frame. Set GAMELIB_SAMPLE_DIR to use it.
+session.py records the frames and commands of a game with GAMELIB_RECORD_DIR and replays them offline to check and time a changed algo.
+forkserver.py keeps an algo imported and forks it for every local game. Run it directly with "serve" to start local games faster.
 """
 
 from .algocore import AlgoCore
 from .util import debug_write
+from . import log
+from . import heatmaps
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["action_summary", "algocore", "forkserver", "game_state", "game_map", "heatmaps", "log", "navigation", "profiling", "sampler", "session", "unit", "util"]
  
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Opt-in instrumentation for the hot paths of gamelib.
+
+When enabled, the public methods of GameState, GameMap and ShortestPathFinder are
+wrapped with call counters and timers. AlgoCore prints a one line summary after
+every turn and an end of game JSON report. When disabled nothing is wrapped, so
+it costs nothing.
+
+Enable it by setting the GAMELIB_PROFILE environment variable to 1, or by setting
+``self.profile = True`` in your AlgoStrategy before ``start()`` is called.
+Set GAMELIB_PROFILE_REPORT to a file path to write the JSON report there instead
+of to the debug output.
+"""
+import os
+import json
+import time
+import functools
+
+from .util import debug_write
+
+PROFILE_ENV = "GAMELIB_PROFILE"
+REPORT_ENV = "GAMELIB_PROFILE_REPORT"
+
+# Dunder methods that are hot enough to be worth measuring
+_TRACKED_SPECIAL_METHODS = ("__init__", "__getitem__")
+
+
+def profiling_enabled():
+    """Returns True if profiling was requested through the GAMELIB_PROFILE environment variable
+
+    """
+    return os.environ.get(PROFILE_ENV, "").lower() not in ("", "0", "false", "no")
+
+
+def default_targets():
+    """The classes whose methods are instrumented by default
+
+    """
+    from .game_state import GameState
+    from .game_map import GameMap
+    from .navigation import ShortestPathFinder
+    return [GameState, GameMap, ShortestPathFinder]
+
+
+class Profiler:
+    """Collects call counts and timings for wrapped functions
+
+    Every tracked name maps to a [calls, total seconds, max seconds] entry for the
+    current turn. At the end of a turn the entries are folded into the game totals
+    and reset in place, so the wrappers never have to look anything up.
+
+    Attributes :
+        * turn_stats (dict): Name to [calls, total, max] for the turn in progress
+        * game_stats (dict): Name to [calls, total, max] for the whole game
+        * turns (list): Per turn summaries, in the same format as the report
+
+    """
+    def __init__(self, summary_size=5):
+        self.summary_size = summary_size
+        self.turn_stats = {}
+        self.game_stats = {}
+        self.turns = []
+        self._patched = []
+
+    def _entry(self, name):
+        entry = self.turn_stats.get(name)
+        if entry is None:
+            entry = self.turn_stats[name] = [0, 0.0, 0.0]
+        return entry
+
+    def wrap(self, func, name):
+        """Returns a wrapper around func that records its calls under name
+
+        """
+        entry = self._entry(name)
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+        return timed
+
+    def install(self, targets=None):
+        """Wraps the public methods of every class in targets
+
+        Args:
+            targets: A list of classes, defaults to GameState, GameMap and ShortestPathFinder
+
+        """
+        for cls in targets if targets is not None else default_targets():
+            for attr, value in list(vars(cls).items()):
+                if not callable(value) or isinstance(value, type):
+                    continue
+                if attr.startswith("_") and attr not in _TRACKED_SPECIAL_METHODS:
+                    continue
+                self._patched.append((cls, attr, value))
+                setattr(cls, attr, self.wrap(value, "{}.{}".format(cls.__name__, attr)))
+
+    def uninstall(self):
+        """Restores every method wrapped by install
+
+        """
+        for cls, attr, value in reversed(self._patched):
+            setattr(cls, attr, value)
+        self._patched = []
+
+    def end_turn(self, turn_number):
+        """Folds the current turn into the game totals and prints a summary line
+
+        Args:
+            turn_number: The turn the collected samples belong to
+
+        """
+        calls = {}
+        for name, entry in self.turn_stats.items():
+            if entry[0] == 0:
+                continue
+            calls[name] = list(entry)
+            total = self.game_stats.get(name)
+            if total is None:
+                self.game_stats[name] = list(entry)
+            else:
+                total[0] += entry[0]
+                total[1] += entry[1]
+                total[2] = max(total[2], entry[2])
+            entry[0], entry[1], entry[2] = 0, 0.0, 0.0
+
+        if not calls:
+            return
+        self.turns.append({"turn": turn_number, "calls": _format_stats(calls)})
+        top = sorted(calls.items(), key=lambda item: -item[1][1])[:self.summary_size]
+        debug_write("Profile turn {}: {}".format(turn_number, " | ".join(
+            "{} {}x {:.1f}ms".format(name, entry[0], entry[1] * 1000) for name, entry in top)))
+
+    def report(self):
+        """Builds the end of game report
+
+        Returns:
+            A dict with the per function totals for the game and the per turn breakdown
+
+        """
+        return {"totals": _format_stats(self.game_stats), "turns": self.turns}
+
+    def write_report(self, path=None):
+        """Writes the end of game report as JSON to path, or to the debug output if no path is given
+
+        """
+        path = path or os.environ.get(REPORT_ENV)
+        report = json.dumps(self.report(), sort_keys=True)
+        if path:
+            with open(path, "w") as report_file:
+                report_file.write(report + "\n")
+        else:
+            debug_write("Profile report: " + report)
+
+
+def _format_stats(stats):
+    return {name: {"calls": calls, "total_ms": round(total * 1000, 3), "max_ms": round(longest * 1000, 3)}
+            for name, (calls, total, longest) in stats.items()}
@@ -1,7 +1,24 @@
 import unittest
+import io
 import json
+import os
+import sys
+import time
+import signal
+import shutil
+import tempfile
+import subprocess
 from .game_state import GameState
 from .unit import GameUnit
+from .game_map import GameMap
+from .profiling import Profiler
+from .sampler import SamplingProfiler
+from .log import DebugLog, DEBUG, WARNING
+from . import util
+from .action_summary import ActionPhaseSummary
+from . import heatmaps
+from . import forkserver
+from . import session
 
 class BasicTests(unittest.TestCase):
 
@@ -275,3 +292,277 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_profiler(self):
+        profiler = Profiler()
+        profiler.install([GameState, GameMap])
+        try:
+            game = self.make_turn_0_map()
+            game.game_map.get_locations_in_range([13, 13], 3.5)
+            game.get_attackers([13, 13], 0)
+        finally:
+            profiler.uninstall()
+        self.assertEqual(1, profiler.turn_stats["GameState.__init__"][0], "GameState should have been built once")
+        self.assertEqual(1, profiler.turn_stats["GameState.get_attackers"][0], "get_attackers call was not counted")
+        self.assertEqual(2, profiler.turn_stats["GameMap.get_locations_in_range"][0], "Nested calls should be counted too")
+
+        profiler.end_turn(0)
+        self.assertEqual(0, profiler.turn_stats["GameState.get_attackers"][0], "Turn stats should reset after end_turn")
+        self.assertEqual(1, profiler.game_stats["GameState.get_attackers"][0], "Game stats should keep the turn's calls")
+        self.assertIn("GameState.get_attackers", profiler.report()["turns"][0]["calls"], "Turn summary is missing")
+        self.assertFalse(hasattr(GameState.get_attackers, "__wrapped__"), "uninstall should restore the original methods")
+
+    def test_sampler(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            sampler = SamplingProfiler(output_dir, interval=1)
+            sampler.turn = 4
+            sampler._record(sys._getframe())
+            self.assertEqual({}, sampler.samples, "Samples outside of a phase should be dropped")
+
+            sampler.wrap(lambda: sampler._record(sys._getframe()), "on_turn")()
+            self.assertEqual([(4, 1)], sampler.slowest_turns("on_turn"), "The sample should be counted for turn 4")
+            written = sampler.write("game")
+            self.assertEqual([os.path.join(output_dir, "game.on_turn.folded")], written, "Expected one stack file for on_turn")
+            with open(written[0]) as stack_file:
+                line = stack_file.read()
+        self.assertTrue(line.startswith("turn 4;"), "Stacks should be rooted at their turn")
+        self.assertNotIn("sampled", line, "Wrapper frames should not be in the stack")
+
+    def test_debug_log(self):
+        stream = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            jsonl_path = os.path.join(directory, "log.jsonl")
+            debug_log = DebugLog(level=DEBUG, rate_limit=2, jsonl_path=jsonl_path, stream=stream)
+            debug_log.set_turn(3)
+            for location in range(4):
+                debug_log.debug("Spawned at {}", location)
+            debug_log.warning("Low health")
+            self.assertEqual("", stream.getvalue(), "Nothing should be written before a flush")
+
+            debug_log.flush()
+            lines = stream.getvalue().splitlines()
+            self.assertEqual(["Spawned at 0", "Spawned at 1", "Low health", "(rate limited 2 more 'Spawned at {}' messages)"], lines, "Unexpected flushed lines")
+            with open(jsonl_path) as jsonl_file:
+                records = [json.loads(line) for line in jsonl_file]
+        self.assertEqual({"turn": 3, "level": "WARNING", "msg": "Low health"}, records[-1], "JSONL record is wrong")
+
+        class Unprintable:
+            def __str__(self):
+                raise AssertionError("Filtered messages should never be formatted")
+        quiet_log = DebugLog(level=WARNING, stream=stream)
+        quiet_log.debug("{}", Unprintable())
+        quiet_log.flush()
+
+        object_stream = io.StringIO()
+        object_log = DebugLog(level=DEBUG, rate_limit=1, stream=object_stream)
+        object_log.debug([1, 2])
+        object_log.debug({"x": 3})
+        object_log.debug([3, 4])
+        object_log.flush()
+        self.assertEqual(["[1, 2]", "{'x': 3}", "(rate limited 1 more 'list' messages)"], object_stream.getvalue().splitlines(),
+                         "Unhashable objects should be logged as is and rate limited by type")
+
+    def test_transport(self):
+        frame = json.dumps({"turnInfo": [1, 4, 2], "p1Stats": [30, 1.5, 2.0, 120]})
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin = io.TextIOWrapper(io.BytesIO((frame + "\n").encode()))
+        sys.stdout = io.TextIOWrapper(io.BytesIO())
+        try:
+            line = util.read_command()
+            util.send_commands('[["FF", 3, 13]]  ', "[]")
+            written = sys.stdout.buffer.getvalue()
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        self.assertEqual(json.loads(frame), util.loads(line), "Frame read from stdin.buffer was not decoded correctly")
+        self.assertEqual(b'[["FF", 3, 13]]\n[]\n', written, "Both command lines should be written stripped and newline terminated")
+
+    def test_algo_params(self):
+        saved, stderr = os.environ.pop(util.PARAMS_ENV, None), sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            self.assertEqual({}, util.algo_params(), "No ALGO_PARAMS should mean no parameters")
+            os.environ[util.PARAMS_ENV] = '{"offensive_walls": 4, "name": "wide"}'
+            self.assertEqual({"offensive_walls": 4, "name": "wide"}, util.algo_params())
+            for invalid in ('{"offensive_walls": ', '[4]'):
+                os.environ[util.PARAMS_ENV] = invalid
+                self.assertEqual({}, util.algo_params(), "Invalid ALGO_PARAMS should be ignored")
+        finally:
+            sys.stderr = stderr
+            os.environ.pop(util.PARAMS_ENV, None)
+            if saved is not None:
+                os.environ[util.PARAMS_ENV] = saved
+
+    def test_algo_seed(self):
+        from .algocore import AlgoCore
+        import random
+        saved = os.environ.pop(util.SEED_ENV, None)
+        try:
+            os.environ[util.SEED_ENV] = "42"
+            first = AlgoCore()
+            draws = [random.random() for _ in range(3)]
+            AlgoCore()
+            self.assertEqual(42, first.seed)
+            self.assertEqual(draws, [random.random() for _ in range(3)], "The same ALGO_SEED should give the same random numbers")
+            del os.environ[util.SEED_ENV]
+            self.assertIsNone(util.algo_seed())
+            self.assertNotEqual(AlgoCore().seed, AlgoCore().seed, "Without ALGO_SEED every algo should draw its own seed")
+        finally:
+            os.environ.pop(util.SEED_ENV, None)
+            if saved is not None:
+                os.environ[util.SEED_ENV] = saved
+
+    def test_action_summary(self):
+        config = self.make_turn_0_map().config
+        summary = ActionPhaseSummary(config, 3)
+        summary.update({"turnInfo": [1, 3, 0], "events": {
+            "breach": [[[2, 11], 1, 3, "10", 2], [[2, 11], 1, 3, "11", 2], [[25, 16], 1, 3, "12", 1]],
+            "damage": [[[3, 12], 5.0, 2, "20", 1], [[3, 12], 2.5, 2, "20", 1], [[4, 9], 9.0, 3, "21", 1]],
+            "death": [[[3, 12], 2, "20", 1, False], [[5, 10], 0, "22", 1, True]],
+            "spawn": [[[13, 27], 3, "10", 2], [[13, 27], 3, "11", 2], [[14, 0], 4, "23", 1]]}})
+        summary.update({"turnInfo": [1, 3, 1], "events": {}})
+
+        self.assertEqual(2, summary.frames, "Every frame should be counted")
+        self.assertEqual([[2, 11]], summary.locations(summary.breaches), "Only enemy breaches count against us")
+        self.assertEqual(2, summary.breaches[2][11], "Breaches at one location should add up")
+        self.assertEqual([[25, 16]], summary.locations(summary.scored), "Our own breaches were not recorded")
+        self.assertEqual(7.5, summary.total(summary.damage_taken), "Damage to mobile units should not count")
+        self.assertEqual(2, summary.damage_hits[3][12], "Every damage event should be counted as a hit")
+        self.assertEqual([[3, 12]], summary.locations(summary.structures_lost), "Structures we removed ourselves are not lost")
+        self.assertEqual(2, summary.enemy_spawns["PI"][13][27], "Enemy spawns should be tallied by type and location")
+        self.assertEqual([3, 2], summary.mp_spent, "MP spent should use the mobile unit costs from the config")
+
+    def test_heatmaps(self):
+        data = {"algo": "me", "turn_ranges": [[0, 9], [10, None]], "opponents": {
+            "*": {"games": 2, "maps": [
+                {"breaches": [[2, 11, 4], [25, 11, 2]], "enemy_spawns": {"PI": [[13, 27, 6]], "SI": [[14, 27, 2]]}},
+                {"breaches": [[2, 11, 2]], "enemy_spawns": {}}]},
+            "them": {"games": 1, "maps": [{"breaches": [[25, 11, 2]], "enemy_spawns": {}}, {"enemy_spawns": {}}]}}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "heatmaps.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            maps = heatmaps.load(path)
+            self.assertIsNone(heatmaps.load(os.path.join(directory, "missing.json")), "A missing file should not stop the algo")
+
+        self.assertEqual(2, maps.games(), "Games should be read from the file")
+        self.assertEqual(3, maps.grid("breaches")[2][11], "Without a turn every range should be added up, per game")
+        self.assertEqual(2, maps.grid("breaches", 5)[2][11], "A turn should only use its own range")
+        self.assertEqual(1, maps.grid("breaches", 30)[2][11], "The last range should have no end")
+        self.assertEqual(2, maps.grid("breaches", 5, "them")[25][11], "Maps of one opponent should use its own games")
+        self.assertEqual(2, maps.grid("breaches", 5, "unknown")[2][11], "Unknown opponents should fall back to all of them")
+        self.assertEqual(4, maps.grid("enemy_spawns")[13][27] + maps.grid("enemy_spawns")[14][27], "Spawns should add up every unit type")
+        self.assertEqual(0, maps.grid("enemy_spawns", unit_type="SI")[13][27], "Spawns of one type should leave out the others")
+        self.assertEqual([[2, 11], [25, 11]], maps.locations(maps.grid("breaches")), "Locations should be hottest first")
+        self.assertEqual([[2, 11]], maps.locations(maps.grid("breaches"), 1), "Locations should stop at count")
+
+    @unittest.skipUnless(forkserver.supported(), "fork servers need Unix sockets that can pass file descriptors")
+    def test_forkserver(self):
+        strategy = "\n".join([
+            "import os, sys",
+            "class AlgoStrategy:",
+            "    def start(self):",
+            "        sys.stdout.write(sys.stdin.readline().upper() + os.environ['FORK_TEST'] + '\\n')",
+            "        sys.exit(3)",
+            ""])
+        with tempfile.TemporaryDirectory() as algo_dir:
+            with open(os.path.join(algo_dir, "algo_strategy.py"), "w") as f:
+                f.write(strategy)
+            server = subprocess.Popen([sys.executable, forkserver.__file__, "serve", algo_dir], stderr=subprocess.DEVNULL)
+            try:
+                deadline = time.time() + 10
+                while not os.path.exists(forkserver.socket_path(algo_dir)) and time.time() < deadline:
+                    time.sleep(0.05)
+                games = [subprocess.run([sys.executable, forkserver.__file__, "connect", algo_dir], input=b"game\n",
+                                        stdout=subprocess.PIPE, env=dict(os.environ, FORK_TEST=str(i)), timeout=10) for i in range(2)]
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+        self.assertEqual([b"GAME\n0\n", b"GAME\n1\n"], [game.stdout for game in games], "Forked games should use the client's streams and environment")
+        self.assertEqual([3, 3], [game.returncode for game in games], "The client should exit with the game's exit code")
+        self.assertFalse(os.path.exists(forkserver.socket_path(algo_dir)), "A terminated server should remove its socket")
+
+    @unittest.skipUnless(forkserver.supported(), "fork servers need Unix sockets that can pass file descriptors")
+    def test_forkserver_killed_client(self):
+        strategy = "\n".join([
+            "import os",
+            "class AlgoStrategy:",
+            "    def start(self):",
+            "        with open(os.environ['FORK_PID_FILE'], 'w') as f:",
+            "            f.write(str(os.getpid()))",
+            "        while True:",
+            "            pass",
+            ""])
+        with tempfile.TemporaryDirectory() as algo_dir:
+            with open(os.path.join(algo_dir, "algo_strategy.py"), "w") as f:
+                f.write(strategy)
+            pid_file = os.path.join(algo_dir, "game.pid")
+            server = subprocess.Popen([sys.executable, forkserver.__file__, "serve", algo_dir], stderr=subprocess.DEVNULL)
+            try:
+                deadline = time.time() + 10
+                while not os.path.exists(forkserver.socket_path(algo_dir)) and time.time() < deadline:
+                    time.sleep(0.05)
+                client = subprocess.Popen([sys.executable, forkserver.__file__, "connect", algo_dir], stdin=subprocess.PIPE,
+                                          env=dict(os.environ, FORK_PID_FILE=pid_file))
+                deadline = time.time() + 10
+                while not os.path.exists(pid_file) and time.time() < deadline:
+                    time.sleep(0.05)
+                with open(pid_file) as f:
+                    game_pid = int(f.read())
+                client.kill()
+                client.wait(timeout=10)
+                deadline = time.time() + 10
+                running = True
+                while running and time.time() < deadline:
+                    try:
+                        os.kill(game_pid, 0)
+                        time.sleep(0.05)
+                    except ProcessLookupError:
+                        running = False
+                if running:
+                    os.kill(game_pid, signal.SIGKILL)
+                client.stdin.close()
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+        self.assertFalse(running, "A forked game should end when its client is killed")
+
+    def test_session(self):
+        strategy = "\n".join([
+            "import random, gamelib",
+            "class AlgoStrategy(gamelib.AlgoCore):",
+            "    def __init__(self):",
+            "        super().__init__()",
+            "        random.seed(random.randrange(1 << 30))",
+            "    def on_turn(self, turn_state):",
+            "        gamelib.util.send_commands(str([random.randrange(100)]), str([BUILD]))",
+            "if __name__ == '__main__':",
+            "    AlgoStrategy().start()",
+            ""])
+        frames = [{"replaySave": 1, "unitInformation": []}]
+        for turn in range(3):
+            frames += [{"turnInfo": [0, turn, -1], "p1Stats": [30, 40, 5, 0]}, {"turnInfo": [1, turn, 0], "p1Stats": [30, 40, 5, 7]}]
+        frames.append({"turnInfo": [2, 3, 0], "p1Stats": [30, 40, 5, 0]})
+        game = "".join(json.dumps(frame) + "\n" for frame in frames).encode()
+        with tempfile.TemporaryDirectory() as algo_dir:
+            shutil.copytree(os.path.dirname(os.path.abspath(__file__)), os.path.join(algo_dir, "gamelib"),
+                            ignore=shutil.ignore_patterns("__pycache__"))
+            with open(os.path.join(algo_dir, "algo_strategy.py"), "w") as f:
+                f.write(strategy.replace("BUILD", "1"))
+            record_dir = os.path.join(algo_dir, "sessions")
+            subprocess.run([sys.executable, os.path.join(algo_dir, "algo_strategy.py")], input=game, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, env=dict(os.environ, GAMELIB_RECORD_DIR=record_dir), timeout=30)
+            path = os.path.join(record_dir, os.listdir(record_dir)[0])
+            header, records = session.load_session(path)
+            turns = session.recorded_turns(records)
+            self.assertIsNotNone(header["seed"], "A recorded game should know its seed")
+            self.assertEqual([0, 1, 2], [turn["turn"] for turn in turns])
+            self.assertEqual([7, 7, 7], [turn["recorded_ms"] for turn in turns], "The time of a turn is in the frame after its deploy frame")
+            self.assertEqual([[1]] * 3, [turn["commands"][1] for turn in turns])
+
+            replay = [sys.executable, session.__file__, "replay", path, algo_dir]
+            same = subprocess.run(replay, stdout=subprocess.PIPE, timeout=30)
+            self.assertEqual(0, same.returncode, "Replaying to the same algo with the recorded seed should give the same commands")
+            with open(os.path.join(algo_dir, "algo_strategy.py"), "w") as f:
+                f.write(strategy.replace("BUILD", "2"))
+            changed = subprocess.run(replay, stdout=subprocess.PIPE, timeout=30)
+            self.assertEqual(1, changed.returncode, "A changed algo should be reported")
+            self.assertIn(b"3 of 3 turns have different commands", changed.stdout)
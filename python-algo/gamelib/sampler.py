@@ -0,0 +1,170 @@
+"""
+Optional in-process sampling profiler.
+
+The counters in profiling.py tell you which gamelib functions are slow, but not
+where the time goes inside a long strategy method. The SamplingProfiler
+interrupts the algo at a fixed interval while on_turn or on_action_frame is
+running and records the current Python stack. At the end of the game it writes
+one collapsed stack file per phase, which any flamegraph tool can render
+(for example flamegraph.pl or speedscope). The turn number is the root frame of
+every stack, so the slowest turns are easy to pick out.
+
+Enable it by setting the GAMELIB_SAMPLE_DIR environment variable to the directory
+the stack files should be written to, or by setting ``self.sample_dir`` in your
+AlgoStrategy before ``start()`` is called.
+"""
+import os
+import sys
+import time
+import signal
+import threading
+import functools
+
+from .util import debug_write
+
+SAMPLE_DIR_ENV = "GAMELIB_SAMPLE_DIR"
+SAMPLE_INTERVAL_ENV = "GAMELIB_SAMPLE_INTERVAL_MS"
+DEFAULT_INTERVAL_MS = 5
+
+# Frames of the gamelib wrappers add nothing to a flamegraph, so they are left out
+_WRAPPER_FILES = (os.path.join(os.path.dirname(os.path.abspath(__file__)), "sampler.py"),
+                  os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiling.py"))
+
+
+def sample_dir_from_env():
+    """Returns the directory requested through GAMELIB_SAMPLE_DIR, or None if sampling is off
+
+    """
+    return os.environ.get(SAMPLE_DIR_ENV) or None
+
+
+class SamplingProfiler:
+    """Collects stack samples while an algo phase is running
+
+    On platforms with SIGPROF a CPU time interval timer delivers the samples, so
+    time spent blocked on stdin is never sampled. Elsewhere a daemon timer thread
+    samples the main thread's stack instead.
+
+    Attributes :
+        * output_dir (str): Where the collapsed stack files are written
+        * interval (float): Seconds between samples
+        * turn (int): The turn the next samples belong to, kept up to date by AlgoCore
+        * samples (dict): Maps (phase, turn, stack) to the number of times it was seen
+
+    """
+    def __init__(self, output_dir, interval=None):
+        self.output_dir = output_dir
+        if interval is None:
+            interval = float(os.environ.get(SAMPLE_INTERVAL_ENV, DEFAULT_INTERVAL_MS)) / 1000
+        self.interval = interval
+        self.turn = -1
+        self.samples = {}
+        self._phase = None
+        self._thread = None
+        self._running = False
+        self._previous_handler = None
+        self._main_thread_id = threading.main_thread().ident
+
+    def start(self):
+        """Starts the sampling timer. Samples are only kept while a wrapped phase is running
+
+        """
+        self._running = True
+        if hasattr(signal, "SIGPROF") and threading.current_thread() is threading.main_thread():
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the sampling timer
+
+        """
+        self._running = False
+        if self._previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+            self._previous_handler = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wrap(self, func, phase):
+        """Returns a wrapper around func that marks the time spent inside it as phase
+
+        """
+        @functools.wraps(func)
+        def sampled(*args, **kwargs):
+            self._phase = phase
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._phase = None
+        return sampled
+
+    def _on_signal(self, signum, frame):
+        self._record(frame)
+
+    def _sample_loop(self):
+        while self._running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self._main_thread_id)
+            if frame is not None:
+                self._record(frame)
+
+    def _record(self, frame):
+        phase = self._phase
+        if phase is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename in _WRAPPER_FILES:
+                frame = frame.f_back
+                continue
+            stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        key = (phase, self.turn, ";".join(stack))
+        self.samples[key] = self.samples.get(key, 0) + 1
+
+    def slowest_turns(self, phase, count=3):
+        """Gets the turns with the most samples in a phase
+
+        Returns:
+            A list of (turn, samples) pairs, most samples first
+
+        """
+        per_turn = {}
+        for (sample_phase, turn, _), hits in self.samples.items():
+            if sample_phase == phase:
+                per_turn[turn] = per_turn.get(turn, 0) + hits
+        return sorted(per_turn.items(), key=lambda item: -item[1])[:count]
+
+    def write(self, prefix=None):
+        """Writes one collapsed stack file per phase to output_dir
+
+        Args:
+            prefix: File name prefix, defaults to a timestamp and the process id so games do not overwrite each other
+
+        Returns:
+            The list of files written
+
+        """
+        if prefix is None:
+            prefix = "{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid())
+        os.makedirs(self.output_dir, exist_ok=True)
+        lines = {}
+        for (phase, turn, stack), hits in sorted(self.samples.items()):
+            lines.setdefault(phase, []).append("turn {};{} {}\n".format(turn, stack, hits))
+
+        written = []
+        for phase, phase_lines in lines.items():
+            path = os.path.join(self.output_dir, "{}.{}.folded".format(prefix, phase))
+            with open(path, "w") as stack_file:
+                stack_file.writelines(phase_lines)
+            written.append(path)
+            debug_write("Sampled {}: slowest turns (turn, samples) {}, stacks in {}".format(
+                phase, self.slowest_turns(phase), path))
+        return written
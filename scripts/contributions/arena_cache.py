@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Caches arena match outcomes by the contents of the algos that played them. Used by run_arena.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Every algo folder is hashed (algo_strategy.py, gamelib, configs... every file except caches
+and hidden files), and so is the engine (game-configs.json and engine.jar, or engine.py
+when the python engine plays). A match outcome is stored under the key
+
+	hash of algo 1 : hash of algo 2 : engine hash : seed
+
+in arena_cache.json in the root of the starter kit. When run_arena.py is run again, pairings
+whose key is already in the cache are not played again and their stored outcome is used, so
+only pairings involving algos that changed are scheduled.
+
+An outcome is read from the replay the engine wrote for the match and looks like this:
+	{"winner": 1, "p1_health": 12.0, "p2_health": 0.0, "turns": 43, "replay": "replays/p1-...replay"}
+where winner is 1 or 2 for the player that won and 0 for a tie.
+
+Delete arena_cache.json (or run with --no-cache) to play everything again.
+'''
+
+import os
+import json
+import glob
+import hashlib
+
+CACHE_FILE = 'arena_cache.json'
+ENGINE_FILES = ('game-configs.json', 'engine.jar')
+PYTHON_ENGINE_FILES = ('game-configs.json', 'scripts/contributions/engine.py')
+IGNORED_DIRS = ('__pycache__',)
+IGNORED_SUFFIXES = ('.pyc', '.pyo')
+
+
+# returns a hash of every file in an algo folder, so any change to the algo changes its hash
+def hash_directory(path):
+	h = hashlib.sha256()
+	for root, dirs, files in os.walk(path):
+		dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS and not d.startswith('.'))
+		for f_name in sorted(files):
+			if f_name.startswith('.') or f_name.endswith(IGNORED_SUFFIXES):
+				continue
+			f_path = os.path.join(root, f_name)
+			h.update(os.path.relpath(f_path, path).replace('\\', '/').encode())
+			h.update(b'\0')
+			with open(f_path, 'rb') as f:
+				for chunk in iter(lambda: f.read(1 << 16), b''):
+					h.update(chunk)
+			h.update(b'\0')
+	return h.hexdigest()
+
+# returns a hash of the engine and its config, files that do not exist are skipped
+def hash_engine(parent_dir, files=ENGINE_FILES):
+	h = hashlib.sha256()
+	for f_name in files:
+		f_path = os.path.join(parent_dir, f_name)
+		if os.path.isfile(f_path):
+			h.update(f_name.encode())
+			with open(f_path, 'rb') as f:
+				for chunk in iter(lambda: f.read(1 << 16), b''):
+					h.update(chunk)
+	return h.hexdigest()
+
+# returns the last non empty line of a file without reading all of it
+def last_line(f_name):
+	with open(f_name, 'rb') as f:
+		f.seek(0, os.SEEK_END)
+		pos = f.tell()
+		block = b''
+		while pos > 0:
+			step = min(1 << 16, pos)
+			pos -= step
+			f.seek(pos)
+			block = f.read(step) + block
+			lines = block.strip().split(b'\n')
+			if len(lines) > 1 or pos == 0:
+				return lines[-1].decode()
+	return ''
+
+# reads the outcome of a match from the end state of its replay
+def read_outcome(f_name):
+	end = json.loads(last_line(f_name))
+	p1_health = end['p1Stats'][0]
+	p2_health = end['p2Stats'][0]
+	winner = end.get('endStats', {}).get('winner')
+	if winner not in (1, 2):
+		winner = 1 if p1_health > p2_health else 2 if p2_health > p1_health else 0
+	return {
+		'winner':		winner,
+		'p1_health':	p1_health,
+		'p2_health':	p2_health,
+		'turns':		end['turnInfo'][1],
+		'replay':		f_name,
+		}
+
+# finds the replay of a match between algo1 and algo2 that was written after start_time
+# only tells games apart by their players, so give every game that runs at the same time its own replay_dir
+def find_replay(replay_dir, algo1, algo2, start_time):
+	files = [f for f in glob.glob(os.path.join(replay_dir, '*.replay')) if os.path.getmtime(f) >= start_time]
+	for f_name in sorted(files, key=os.path.getmtime, reverse=True):
+		try:
+			end_stats = json.loads(last_line(f_name))['endStats']
+		except (ValueError, KeyError):
+			continue
+		if end_stats['player1']['name'] == algo1 and end_stats['player2']['name'] == algo2:
+			return f_name
+	return None
+
+
+class ArenaCache:
+	def __init__(self, f_name):
+		self.fname = f_name
+		self.results = {}
+		if os.path.isfile(f_name):
+			with open(f_name) as f:
+				self.results = json.load(f)
+
+	@staticmethod
+	def key(hash1, hash2, engine_hash, seed=None):
+		return '{}:{}:{}:{}'.format(hash1, hash2, engine_hash, seed)
+
+	def get(self, key):
+		return self.results.get(key)
+
+	def put(self, key, outcome):
+		self.results[key] = outcome
+
+	# writes the cache to a temporary file first so an interrupted run never leaves it half written
+	def save(self):
+		tmp = self.fname + '.tmp'
+		with open(tmp, 'w') as f:
+			json.dump(self.results, f, indent=1, sort_keys=True)
+		os.replace(tmp, self.fname)
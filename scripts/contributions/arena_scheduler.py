@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+A bounded worker pool for running many Terminal matches at once. Used by run_arena.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Every match runs the engine and two algos, so starting all of them at once quickly runs a
+machine out of cores and memory. The ArenaScheduler keeps a queue of pending matches and
+only runs as many at a time as there are workers. By default that is the number of CPU
+cores, lowered if there is not enough free memory for that many matches (MATCH_MEMORY_MB
+per match).
+
+Matches that run longer than the timeout are killed together with every process they
+started, and are reported as timed out. Results are handed back as soon as each match
+finishes, both to an optional callback and from ArenaScheduler.run:
+
+	scheduler = ArenaScheduler(workers=4, timeout=600)
+	for result in scheduler.run(jobs):
+		print(result['name'], result['elapsed'])
+
+where jobs is a list of (name, command, working_directory) tuples, optionally followed by a
+dict of extra environment variables for the match and a log file. With a log file the output
+and errors of the match are written to it as they come instead of being kept in memory, and
+the error of a match that fails is the end of its log. A sampler, like the
+one in telemetry.py, is started with the pid of every match and stopped when it ends; what its
+stop() returns is added to the result as 'usage'. Matches with a log file are waited for with
+os.wait4 where it exists, which adds the CPU time and peak memory of the whole match at the
+moment it ends to the result as 'exit_usage'.
+
+start_fork_servers starts the fork server of every python algo (see gamelib/forkserver.py in
+the algo) so the matches start their algos from an already imported copy instead of a new
+python each time. stop_fork_servers stops them again.
+'''
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Rough peak memory of one match: the java engine and two python algos
+MATCH_MEMORY_MB = 1200
+
+FORK_SERVER_FILE = os.path.join('gamelib', 'forkserver.py')
+FORK_SERVER_SOCKET = '.forkserver.sock'
+
+# bytes from the end of the log of a failed match that are kept as its error
+LOG_TAIL_BYTES = 4096
+
+is_windows = sys.platform.startswith('win')
+
+
+# returns the free memory in MB, or None if it can not be found on this platform
+def available_memory_mb():
+	try:
+		with open('/proc/meminfo') as f:
+			for line in f:
+				if line.startswith('MemAvailable:'):
+					return int(line.split()[1]) // 1024
+	except (OSError, ValueError, IndexError):
+		pass
+	return None
+
+# returns how many matches this machine can run at once without oversubscribing it
+def default_workers(match_memory_mb=MATCH_MEMORY_MB):
+	workers = os.cpu_count() or 1
+	memory = available_memory_mb()
+	if memory is not None:
+		workers = min(workers, memory // match_memory_mb)
+	return max(1, workers)
+
+# kills a shell started by run_command together with everything it started
+def kill_tree(p):
+	try:
+		if is_windows:
+			subprocess.run('taskkill /F /T /PID {}'.format(p.pid), shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		else:
+			os.killpg(p.pid, signal.SIGKILL)
+	except (OSError, subprocess.SubprocessError):
+		pass
+
+# starts the fork servers of the algos that have one and waits until they are listening
+def start_fork_servers(algo_dirs, timeout=60):
+	servers = []
+	if is_windows:
+		return servers
+	for algo_dir in algo_dirs:
+		server_file = os.path.join(algo_dir, FORK_SERVER_FILE)
+		if not os.path.isfile(server_file):
+			continue
+		p = subprocess.Popen([sys.executable, server_file, 'serve', algo_dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		servers.append((algo_dir, p))
+	deadline = time.time() + timeout
+	for algo_dir, p in servers:
+		# a server that fails to start leaves no socket, so its algo is simply started the normal way
+		while not os.path.exists(os.path.join(algo_dir, FORK_SERVER_SOCKET)) and p.poll() is None and time.time() < deadline:
+			time.sleep(0.05)
+	return servers
+
+# returns the end of a log file, where the engine writes why a match failed
+def log_tail(f_name, size=LOG_TAIL_BYTES):
+	with open(f_name, 'rb') as f:
+		f.seek(max(0, os.path.getsize(f_name) - size))
+		return f.read()
+
+# stops fork servers started by start_fork_servers, they remove their sockets themselves
+def stop_fork_servers(servers):
+	for _, p in servers:
+		p.terminate()
+	for _, p in servers:
+		try:
+			p.wait(timeout=10)
+		except subprocess.TimeoutExpired:
+			p.kill()
+
+
+class ArenaScheduler:
+	def __init__(self, workers=None, timeout=None, callback=None, sampler=None):
+		self.workers = workers if workers else default_workers()
+		self.timeout = timeout			# seconds a single match may take, None for no limit
+		self.callback = callback		# called with every result as soon as its match finishes
+		self.sampler = sampler			# called with the pid of every match, returns an object with stop() or None
+		self.__running = set()
+		self.__lock = threading.Lock()
+
+	# runs one match command and returns its result, called on a worker thread
+	def run_command(self, name, command, cwd=None, env=None, log_file=None):
+		start = time.time()
+		log = open(log_file, 'wb') if log_file else None
+		p = subprocess.Popen(
+			command,
+			shell=True,
+			cwd=cwd,
+			env=dict(os.environ, **env) if env else None,
+			stdout=log if log else subprocess.PIPE,
+			stderr=subprocess.STDOUT if log else subprocess.PIPE,
+			# own process group so a timed out match can be killed with the engine and algos it started
+			start_new_session=not is_windows
+			)
+		with self.__lock:
+			self.__running.add(p)
+		sampler = self.sampler(p.pid) if self.sampler else None
+		timed_out = False
+		output, error, exit_usage = None, None, None
+		try:
+			if log and hasattr(os, 'wait4'):
+				timed_out, exit_usage = self.wait_usage(p)
+			else:
+				output, error = p.communicate(timeout=self.timeout)
+		except subprocess.TimeoutExpired:
+			timed_out = True
+			kill_tree(p)
+			output, error = p.communicate()
+		finally:
+			with self.__lock:
+				self.__running.discard(p)
+			usage = sampler.stop() if sampler else None
+			if log:
+				log.close()
+		if log and (timed_out or p.returncode != 0):
+			error = log_tail(log_file)
+
+		return {
+			'name':			name,
+			'start':		start,
+			'cwd':			cwd,
+			'returncode':	p.returncode,
+			'timed_out':	timed_out,
+			'elapsed':		time.time() - start,
+			'output':		output.decode(errors='replace') if output else '',
+			'error':		error.decode(errors='replace') if error else '',
+			'log':			log_file,
+			'usage':		usage,
+			'exit_usage':	exit_usage,
+			}
+
+	# waits for a match that has no pipes to read with os.wait4 instead of Popen, returns if it timed out and its usage
+	# the usage counts every process of the match that was waited for, so it holds what the algos used up to their exit
+	def wait_usage(self, p):
+		expired = threading.Event()
+		def expire():
+			expired.set()
+			kill_tree(p)
+		timer = threading.Timer(self.timeout, expire) if self.timeout else None
+		if timer is not None:
+			timer.daemon = True
+			timer.start()
+		try:
+			_, status, rusage = os.wait4(p.pid, 0)
+		finally:
+			if timer is not None:
+				timer.cancel()
+		p.returncode = os.waitstatus_to_exitcode(status)
+		# ru_maxrss is in KB on Linux and in bytes on macOS
+		rss_mb = rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+		return expired.is_set(), {'peak_rss_mb': round(rss_mb, 1), 'cpu_s': round(rusage.ru_utime + rusage.ru_stime, 2)}
+
+	# runs every (name, command, cwd[, env[, log_file]]) job and yields the results in the order the matches finish
+	def run(self, jobs):
+		executor = ThreadPoolExecutor(max_workers=self.workers)
+		try:
+			futures = [executor.submit(self.run_command, *job) for job in jobs]
+			if self.callback is not None:
+				for future in futures:
+					future.add_done_callback(lambda f: self.callback(f.result()) if not f.cancelled() else None)
+			for future in as_completed(futures):
+				yield future.result()
+		finally:
+			# Ctrl+C or an early exit: drop the queued matches and kill the running ones
+			executor.shutdown(wait=False, cancel_futures=True)
+			self.stop()
+
+	# kills every match that is still running
+	def stop(self):
+		with self.__lock:
+			running = list(self.__running)
+		for p in running:
+			kill_tree(p)
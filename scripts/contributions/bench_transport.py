@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Benchmarks the gamelib stdin/stdout transport on recorded games.
+Compares the text mode functions (get_command, json.loads, send_command) against the
+binary transport (read_command, loads, send_commands) in gamelib/util.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+A replay file holds the same JSON lines the engine writes to an algo's stdin, so it can be
+fed to both transports as a recorded frame stream. Every line is read and parsed, and for
+every deploy phase frame two command lines are written (to the null device), exactly as an
+algo would.
+
+By default the most recent replay in the /replays/ directory is used:
+>py scripts/contributions/bench_transport.py
+
+-f: Use specific replay files
+>py scripts/contributions/bench_transport.py -f [REPLAY_FILE].replay [REPLAY_FILE].replay
+
+-g: The algo folder whose gamelib is benchmarked (default python-algo)
+-r: How many times each stream is replayed (default 20), the best run is reported
+
+The output looks something like this:
+Stream: 2 replays, 1046 frames, 14.2 MB, JSON backend: orjson
+text   (get_command + json.loads)     :  310.5 ms   45.7 MB/s   3368 frames/s
+binary (read_command + loads)         :   92.1 ms  154.2 MB/s  11357 frames/s
+Speedup: 3.37x
+'''
+
+import sys
+try:
+	import os
+	import io
+	import glob
+	import json
+	import time
+	import argparse
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-f", "--file",
+		nargs='*',
+		default=[],
+		help="replay files to use as the recorded frame stream\n\n")
+	ap.add_argument(
+		"-g", "--gamelib",
+		default='python-algo',
+		help="folder of the algo whose gamelib is benchmarked\n\n")
+	ap.add_argument(
+		"-r", "--repeat",
+		type=int,
+		default=20,
+		help="number of times each stream is replayed\n\n")
+	return vars(ap.parse_args())
+
+# returns the path to the most recent replay file
+def latest_replay(parent_dir):
+	files = glob.glob(os.path.join(parent_dir, 'replays', '*.replay'))
+	if len(files) == 0:
+		print ('No replays found in {}, use -f to pick replay files'.format(os.path.join(parent_dir, 'replays')))
+		sys.exit()
+	return max(files, key=os.path.getctime)
+
+# joins the frames of every replay into one stream, the way the engine would send them
+def load_stream(files):
+	lines = []
+	for f_name in files:
+		with open(f_name, 'rb') as f:
+			lines.extend(line.strip() + b'\n' for line in f if line.strip())
+	return b''.join(lines), len(lines)
+
+# feeds the stream to one transport and returns the time it took in seconds
+def run_transport(util, stream, num_lines, binary):
+	stdin, stdout = sys.stdin, sys.stdout
+	sys.stdin = io.TextIOWrapper(io.BytesIO(stream))
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		start = time.perf_counter()
+		if binary:
+			for _ in range(num_lines):
+				state = util.loads(util.read_command())
+				if 'turnInfo' in state and state['turnInfo'][0] == 0:
+					util.send_commands('[]', '[]')
+		else:
+			for _ in range(num_lines):
+				state = json.loads(util.get_command())
+				if 'turnInfo' in state and state['turnInfo'][0] == 0:
+					util.send_command('[]')
+					util.send_command('[]')
+		return time.perf_counter() - start
+	finally:
+		sys.stdout.close()
+		sys.stdin, sys.stdout = stdin, stdout
+
+def main(args):
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	sys.path.insert(0, os.path.join(parent_dir, args['gamelib']))
+	from gamelib import util
+
+	files = args['file'] if len(args['file']) > 0 else [latest_replay(parent_dir)]
+	stream, num_lines = load_stream(files)
+	size = len(stream) / 1e6
+	print ('Stream: {} replays, {} frames, {:.1f} MB, JSON backend: {}'.format(len(files), num_lines, size, util.JSON_BACKEND))
+
+	results = []
+	for label, binary in (('text   (get_command + json.loads)', False), ('binary (read_command + loads)', True)):
+		best = min(run_transport(util, stream, num_lines, binary) for _ in range(max(1, args['repeat'])))
+		results.append(best)
+		print ('{: <38}: {:7.1f} ms {:7.1f} MB/s {:7.0f} frames/s'.format(label, best * 1000, size / best, num_lines / best))
+	print ('Speedup: {:.2f}x'.format(results[0] / results[1]))
+
+if __name__ == '__main__':
+	main(parse_args())
@@ -0,0 +1,843 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+A Terminal game engine written in python. Plays two algos against each other without java and
+writes a replay that get_results.py, watch_replay.py and run_arena.py can read.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+It is used the same way as the java engine, from the root of the starter kit:
+>py scripts/contributions/engine.py python-algo python-algo-def-turret-lined-walls
+
+or, as a drop in replacement for "java -jar engine.jar work algo1/run.sh algo2/run.sh":
+>py scripts/contributions/engine.py work python-algo/run.sh python-algo-def-turret-lined-walls/run.sh
+
+Both algos are started with their run.sh (run.ps1 on windows) and spoken to over stdin and
+stdout exactly as described in json-docs.html: the config first, then a deploy frame at the
+start of every turn (the algo answers with its build and deploy lines), every action frame and
+finally the end frame. Player 2 sees the game flipped, as if it was player 1. The replay is
+written from player 1's side to the replays folder, unless replaySave in game-configs.json
+asks for something else.
+
+The rules are read from game-configs.json (-c for another file): unit costs, health, ranges,
+damage, shields, upgrades, removal refunds, breach damage and the MP/SP schedule. Every action
+frame goes through these steps, in this order:
+
+	1. supports shield every friendly mobile unit in range, once per support and unit
+	2. mobile units move along the same shortest path gamelib's navigation.py predicts,
+	   breaching when they reach their target edge and self destructing when they are stuck
+	3. every unit attacks one target, chosen with the priorities of GameState.get_target
+	4. destroyed units are removed and units reroute around destroyed structures
+
+Structures marked for removal are taken off after the last frame of the action phase. An algo
+that does not answer within waitTimeBotMax skips its turn, and one that takes longer than
+waitTimeBotSoft loses 1 health for every started second over it. An algo that crashes loses.
+The game ends when a player runs out of health or after --max-turns turns (100 by default);
+the player with the most health wins, ties are won by the algo that used less time.
+
+--seed N (or ALGO_SEED=N in the environment, which run_arena.py sets) is passed to both algos
+in ALGO_SEED, and AlgoCore seeds random with it. The engine itself uses no randomness, so the
+same algos, config and seed play the same game again. The seed is written to the endStats of
+the replay as "seed".
+
+This is not the official engine. Games follow the documented rules, but results can differ from
+the java engine in details the documentation does not cover, so check important results with it.
+'''
+
+import os
+import sys
+import json
+import math
+import time
+import queue
+import random
+import argparse
+import datetime
+import threading
+import subprocess
+from collections import deque
+
+ARENA_SIZE = 28
+HALF_ARENA = 14
+MAX_TURNS = 100
+MAX_FRAMES = 2000				# safety limit on the frames of one action phase
+
+# environment variable gamelib's AlgoCore seeds random from, see util.algo_seed
+SEED_ENV = 'ALGO_SEED'
+
+EVENT_TYPES = ('selfDestruct', 'breach', 'damage', 'shield', 'move', 'spawn', 'death', 'attack', 'melee')
+# position of the owning player number and of the locations in every event, see json-docs.html
+EVENT_PLAYER = {'selfDestruct': 5, 'breach': 4, 'damage': 4, 'shield': 6, 'move': 5, 'spawn': 3, 'death': 3, 'attack': 6, 'melee': 5}
+EVENT_LOCATIONS = {'selfDestruct': (0,), 'breach': (0,), 'damage': (0,), 'shield': (0, 1), 'move': (0, 1, 2), 'spawn': (0,), 'death': (0,), 'attack': (0, 1), 'melee': (0, 1)}
+
+# edges in the order of gamelib's GameMap.get_edges
+TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT = range(4)
+EDGES = [
+	[(HALF_ARENA + i, ARENA_SIZE - 1 - i) for i in range(HALF_ARENA)],
+	[(HALF_ARENA - 1 - i, ARENA_SIZE - 1 - i) for i in range(HALF_ARENA)],
+	[(HALF_ARENA - 1 - i, i) for i in range(HALF_ARENA)],
+	[(HALF_ARENA + i, i) for i in range(HALF_ARENA)],
+	]
+EDGE_SETS = [set(edge) for edge in EDGES]
+# the edges each player may deploy mobile units on
+DEPLOY_EDGES = {1: EDGE_SETS[BOTTOM_LEFT] | EDGE_SETS[BOTTOM_RIGHT], 2: EDGE_SETS[TOP_LEFT] | EDGE_SETS[TOP_RIGHT]}
+
+HORIZONTAL = 1
+VERTICAL = 2
+
+is_windows = sys.platform.startswith('win')
+
+
+# returns True if a location is on the diamond shaped board
+def in_arena(x, y):
+	if y < HALF_ARENA:
+		return HALF_ARENA - y - 1 <= x <= HALF_ARENA + y
+	return y < ARENA_SIZE and y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+# returns the edge a unit starting at a location walks to
+def target_edge(x, y):
+	left = x < HALF_ARENA
+	bottom = y < HALF_ARENA
+	if bottom:
+		return TOP_RIGHT if left else TOP_LEFT
+	return BOTTOM_RIGHT if left else BOTTOM_LEFT
+
+# flips a location to the other player's side of the board
+def flip(location):
+	return [ARENA_SIZE - 1 - location[0], ARENA_SIZE - 1 - location[1]]
+
+# returns the (dx, dy) offsets of every location within range of a unit
+def range_offsets(radius, hit_radius):
+	reach = int(math.ceil(radius))
+	return [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1) if math.hypot(dx, dy) < radius + hit_radius]
+
+
+class Unit:
+	def __init__(self, uid, unit_type, info, player, x, y):
+		self.id = str(uid)
+		self.type = unit_type
+		self.player = player				# 1 or 2
+		self.x = x
+		self.y = y
+		self.stationary = info.get('unitCategory', 0) == 0
+		self.max_health = self.health = info.get('startHealth', 0)
+		self.cost = [info.get('cost1', 0), info.get('cost2', 0)]
+		self.upgraded = False
+		self.removal = None					# turns left before a structure marked for removal is removed
+		self.set_stats(info)
+		# movement
+		self.progress = 0.0
+		self.steps = 0
+		self.last_move = 0
+		self.edge = target_edge(x, y)
+		self.shielded_by = set()
+		self.finished = False				# breached or self destructed
+
+	def set_stats(self, info):
+		self.speed = info.get('speed', getattr(self, 'speed', 0))
+		self.attack_range = info.get('attackRange', getattr(self, 'attack_range', 0))
+		self.damage_walker = info.get('attackDamageWalker', getattr(self, 'damage_walker', 0))
+		self.damage_tower = info.get('attackDamageTower', getattr(self, 'damage_tower', 0))
+		self.shield_range = info.get('shieldRange', getattr(self, 'shield_range', 0))
+		self.shield_per_unit = info.get('shieldPerUnit', getattr(self, 'shield_per_unit', 0))
+		self.shield_bonus_per_y = info.get('shieldBonusPerY', getattr(self, 'shield_bonus_per_y', 0))
+		self.refund = info.get('refundPercentage', getattr(self, 'refund', 0))
+		self.turns_to_remove = info.get('turnsRequiredToRemove', getattr(self, 'turns_to_remove', 1))
+
+	# applies the upgrade section of the unit's config, an upgraded structure keeps its damage taken
+	def upgrade(self, upgrade_info):
+		self.set_stats(upgrade_info)
+		new_max = upgrade_info.get('startHealth', self.max_health)
+		self.health += new_max - self.max_health
+		self.max_health = new_max
+		self.cost[0] += upgrade_info.get('cost1', 0)
+		self.cost[1] += upgrade_info.get('cost2', 0)
+		self.upgraded = True
+
+	# y as seen by the unit's owner, 0 is the owner's side of the board
+	def own_y(self):
+		return self.y if self.player == 1 else ARENA_SIZE - 1 - self.y
+
+	def location(self):
+		return [self.x, self.y]
+
+
+# The pathing rules of gamelib's ShortestPathFinder, with the searches cached until a structure
+# is added or removed, so every unit does not search the whole board every step
+class Pathfinder:
+	def __init__(self):
+		self.blocked = [[False] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+		self.cache = {}
+
+	def set_blocked(self, x, y, blocked):
+		self.blocked[x][y] = blocked
+		self.cache.clear()
+
+	def __neighbors(self, x, y):
+		for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+			if in_arena(nx, ny) and not self.blocked[nx][ny]:
+				yield nx, ny
+
+	# breadth first search of the path lengths to the given tiles
+	def __path_lengths(self, starts):
+		lengths = [[-1] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+		todo = deque()
+		for x, y in starts:
+			lengths[x][y] = 0
+			# as in gamelib, blocked end points count as reached but are not searched from
+			if not self.blocked[x][y]:
+				todo.append((x, y))
+		while todo:
+			x, y = todo.popleft()
+			for nx, ny in self.__neighbors(x, y):
+				if lengths[nx][ny] == -1:
+					lengths[nx][ny] = lengths[x][y] + 1
+					todo.append((nx, ny))
+		return lengths
+
+	@staticmethod
+	def __idealness(x, y, edge):
+		if (x, y) in EDGE_SETS[edge]:
+			return sys.maxsize
+		up = edge in (TOP_RIGHT, TOP_LEFT)
+		right = edge in (TOP_RIGHT, BOTTOM_RIGHT)
+		return 28 * (y if up else 27 - y) + (x if right else 27 - x)
+
+	# the tile a unit that can not reach its edge walks to before self destructing
+	def __most_ideal(self, x, y, edge):
+		best, best_idealness = (x, y), self.__idealness(x, y, edge)
+		seen = {(x, y)}
+		todo = deque([(x, y)])
+		while todo:
+			cx, cy = todo.popleft()
+			for neighbor in self.__neighbors(cx, cy):
+				idealness = self.__idealness(neighbor[0], neighbor[1], edge)
+				if idealness > best_idealness:
+					best, best_idealness = neighbor, idealness
+				if neighbor not in seen:
+					seen.add(neighbor)
+					todo.append(neighbor)
+		return best
+
+	# returns the path lengths a unit at x, y follows
+	def path_lengths(self, x, y, edge):
+		lengths = self.cache.get(edge)
+		if lengths is None:
+			lengths = self.cache[edge] = self.__path_lengths(EDGES[edge])
+		if lengths[x][y] != -1:
+			return lengths
+		ideal = self.__most_ideal(x, y, edge)
+		lengths = self.cache.get((edge, ideal))
+		if lengths is None:
+			lengths = self.cache[(edge, ideal)] = self.__path_lengths([ideal])
+		return lengths
+
+	# returns the next tile of a unit, or None if it is at the end of its path
+	def next_step(self, unit):
+		lengths = self.path_lengths(unit.x, unit.y, unit.edge)
+		best, best_length = (unit.x, unit.y), lengths[unit.x][unit.y]
+		if best_length == 0:
+			return None
+		for neighbor in self.__neighbors(unit.x, unit.y):
+			length = lengths[neighbor[0]][neighbor[1]]
+			if length == -1 or length > best_length:
+				continue
+			if length == best_length and not self.__better_direction((unit.x, unit.y), neighbor, best, unit.last_move, unit.edge):
+				continue
+			best, best_length = neighbor, length
+		return best
+
+	# gamelib's tie break between two equally short moves: change direction, then head towards the edge
+	@staticmethod
+	def __better_direction(previous, new, best, last_move, edge):
+		if last_move == HORIZONTAL and new[0] != best[0]:
+			return previous[1] != new[1]
+		if last_move == VERTICAL and new[1] != best[1]:
+			return previous[0] != new[0]
+		if last_move == 0:
+			return previous[1] != new[1]
+		up = edge in (TOP_RIGHT, TOP_LEFT)
+		right = edge in (TOP_RIGHT, BOTTOM_RIGHT)
+		if new[1] == best[1]:
+			return new[0] > best[0] if right else new[0] < best[0]
+		if new[0] == best[0]:
+			return new[1] > best[1] if up else new[1] < best[1]
+		return True
+
+
+# An algo process, with a thread reading its output so reading a turn can time out
+class AlgoProcess:
+	def __init__(self, run_file, output=None, env=None):
+		self.name = os.path.basename(os.path.dirname(os.path.abspath(run_file)))
+		if is_windows:
+			command = ['powershell.exe', '-ExecutionPolicy', 'Bypass', '-File', run_file]
+		else:
+			command = ['bash', run_file]
+		self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=output, env=env)
+		self.lines = queue.Queue()
+		self.late_lines = 0				# lines of a turn that timed out, still to come
+		self.crashed = False
+		threading.Thread(target=self.__read, daemon=True).start()
+
+	def __read(self):
+		for line in self.process.stdout:
+			self.lines.put(line)
+		self.lines.put(None)
+
+	def send(self, line):
+		if self.crashed:
+			return
+		try:
+			self.process.stdin.write(line)
+			self.process.stdin.flush()
+		except (OSError, ValueError):
+			self.crashed = True
+
+	# waits for the build and deploy lines of a turn. Returns them and True if they came in time
+	def read_turn(self, timeout):
+		deadline = time.time() + timeout
+		commands = []
+		while len(commands) < 2 and not self.crashed:
+			try:
+				line = self.lines.get(timeout=max(0, deadline - time.time()))
+			except queue.Empty:
+				self.late_lines += 2 - len(commands)
+				return [[], []], False
+			if line is None:
+				self.crashed = True
+			elif self.late_lines > 0:
+				self.late_lines -= 1
+			else:
+				try:
+					commands.append(json.loads(line))
+				except ValueError:
+					commands.append([])
+		commands += [[]] * (2 - len(commands))
+		return commands, True
+
+	# lets the algo exit on its own after the end frame, then makes sure it is gone
+	def close(self, timeout):
+		try:
+			self.process.stdin.close()
+		except OSError:
+			pass
+		try:
+			self.process.wait(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+			self.process.wait()
+
+
+class Game:
+	def __init__(self, config, max_turns=MAX_TURNS):
+		self.config = config
+		self.max_turns = max_turns
+		self.info = config['unitInformation']
+		self.shorthands = {info.get('shorthand'): i for i, info in enumerate(self.info)}
+		self.remove_index = self.shorthands.get('RM', 6)
+		self.upgrade_index = self.shorthands.get('UP', 7)
+		self.hit_radius = self.info[0].get('getHitRadius', 0.01)
+		self.resources = config['resources']
+		self.timing = config.get('timingAndReplay', {})
+
+		self.next_id = 0
+		self.structures = {}		# (x, y) -> Unit
+		self.mobiles = []
+		self.pathfinder = Pathfinder()
+		self.offsets = {}
+		self.turn = 0
+		self.frames = 0
+		self.stats = {player: {
+			'health':		self.resources['startingHP'],
+			'SP':			self.resources['startingCores'],
+			'MP':			self.resources['startingBits'],
+			'time':			0,
+			'end':			{
+				'stationary_resource_spent':			0,
+				'dynamic_resource_spoiled':				0,
+				'crashed':								False,
+				'dynamic_resource_destroyed':			0,
+				'time_damage_taken':					0,
+				'dynamic_resource_spent':				0,
+				'stationary_resource_left_on_board':	0,
+				'timeout_death':						False,
+				'points_scored':						0,
+				'total_computation_time':				0,
+				},
+			} for player in (1, 2)}
+
+	def new_id(self):
+		self.next_id += 1
+		return self.next_id
+
+	@staticmethod
+	def new_events():
+		return {event: [] for event in EVENT_TYPES}
+
+	def is_structure(self, unit_type):
+		return self.info[unit_type].get('unitCategory', 0) == 0
+
+	# the frame of the current state from player 1's side
+	def frame(self, phase, frame_number, events):
+		units = {1: [[] for _ in range(len(self.info))], 2: [[] for _ in range(len(self.info))]}
+		for unit in sorted(self.structures.values(), key=lambda u: int(u.id)):
+			lists = units[unit.player]
+			lists[unit.type].append([unit.x, unit.y, unit.health, unit.id])
+			if unit.removal is not None:
+				lists[self.remove_index].append([unit.x, unit.y, unit.removal, unit.id])
+			if unit.upgraded:
+				lists[self.upgrade_index].append([unit.x, unit.y, unit.health, unit.id])
+		for unit in self.mobiles:
+			units[unit.player][unit.type].append([unit.x, unit.y, unit.health, unit.id])
+		frame = {'turnInfo': [phase, self.turn, frame_number], 'events': events}
+		for player in (1, 2):
+			stats = self.stats[player]
+			frame['p{}Stats'.format(player)] = [stats['health'], round(stats['SP'], 1), round(stats['MP'], 1), stats['time']]
+			frame['p{}Units'.format(player)] = units[player]
+		return frame
+
+	# the same frame as seen by player 2, who always sees itself as player 1 at the bottom
+	@staticmethod
+	def flipped(frame):
+		other = {1: 2, 2: 1}
+		units = {}
+		for key in ('p1Units', 'p2Units'):
+			units[key] = [[[ARENA_SIZE - 1 - u[0], ARENA_SIZE - 1 - u[1]] + u[2:] for u in unit_list] for unit_list in frame[key]]
+		events = {}
+		for event_type, event_list in frame['events'].items():
+			flipped_list = []
+			for event in event_list:
+				event = list(event)
+				for i in EVENT_LOCATIONS[event_type]:
+					event[i] = flip(event[i])
+				if event_type == 'selfDestruct':
+					event[1] = [flip(location) for location in event[1]]
+				event[EVENT_PLAYER[event_type]] = other[event[EVENT_PLAYER[event_type]]]
+				flipped_list.append(event)
+			events[event_type] = flipped_list
+		result = dict(frame, p1Units=units['p2Units'], p2Units=units['p1Units'], p1Stats=frame['p2Stats'], p2Stats=frame['p1Stats'], events=events)
+		if 'endStats' in frame:
+			end_stats = dict(frame['endStats'], player1=frame['endStats']['player2'], player2=frame['endStats']['player1'])
+			if end_stats['winner'] in other:
+				end_stats['winner'] = other[end_stats['winner']]
+			result['endStats'] = end_stats
+		return result
+
+	# applies the build and deploy lines of a player, given from their own side of the board
+	def apply_commands(self, player, commands, spawns):
+		stats = self.stats[player]
+		for command in commands:
+			try:
+				shorthand, x, y = command[0], int(command[1]), int(command[2])
+			except (TypeError, ValueError, IndexError, KeyError):
+				continue
+			if player == 2:
+				x, y = flip([x, y])
+			unit_type = self.shorthands.get(shorthand)
+			if unit_type is None or not in_arena(x, y):
+				continue
+			own_half = y < HALF_ARENA if player == 1 else y >= HALF_ARENA
+			structure = self.structures.get((x, y))
+
+			if unit_type == self.remove_index:
+				if structure is not None and structure.player == player and structure.removal is None:
+					structure.removal = structure.turns_to_remove
+					spawns.append([[x, y], unit_type, structure.id, player])
+			elif unit_type == self.upgrade_index:
+				if structure is None or structure.player != player or structure.upgraded:
+					continue
+				upgrade_info = self.info[structure.type].get('upgrade', {})
+				cost = upgrade_info.get('cost1', 0)
+				if cost > stats['SP']:
+					continue
+				stats['SP'] -= cost
+				stats['end']['stationary_resource_spent'] += cost
+				structure.upgrade(upgrade_info)
+				spawns.append([[x, y], unit_type, structure.id, player])
+			elif self.is_structure(unit_type):
+				cost = self.info[unit_type].get('cost1', 0)
+				if not own_half or structure is not None or cost > stats['SP']:
+					continue
+				stats['SP'] -= cost
+				stats['end']['stationary_resource_spent'] += cost
+				unit = Unit(self.new_id(), unit_type, self.info[unit_type], player, x, y)
+				self.structures[(x, y)] = unit
+				self.pathfinder.set_blocked(x, y, True)
+				spawns.append([[x, y], unit_type, unit.id, player])
+			else:
+				cost = self.info[unit_type].get('cost2', 0)
+				if (x, y) not in DEPLOY_EDGES[player] or structure is not None or cost > stats['MP']:
+					continue
+				stats['MP'] -= cost
+				stats['end']['dynamic_resource_spent'] += cost
+				unit = Unit(self.new_id(), unit_type, self.info[unit_type], player, x, y)
+				self.mobiles.append(unit)
+				spawns.append([[x, y], unit_type, unit.id, player])
+
+	# the offsets of the locations within a range, worked out once per range
+	def offsets_within(self, radius):
+		offsets = self.offsets.get(radius)
+		if offsets is None:
+			offsets = self.offsets[radius] = range_offsets(radius, self.hit_radius)
+		return offsets
+
+	def __shield(self, events):
+		supports = [s for s in self.structures.values() if s.shield_per_unit > 0 or s.shield_bonus_per_y > 0]
+		for support in supports:
+			amount = support.shield_per_unit + support.shield_bonus_per_y * support.own_y()
+			limit = support.shield_range + self.hit_radius
+			for unit in self.mobiles:
+				if unit.player != support.player or support.id in unit.shielded_by:
+					continue
+				if math.hypot(unit.x - support.x, unit.y - support.y) < limit:
+					unit.shielded_by.add(support.id)
+					unit.health += amount
+					events['shield'].append([support.location(), unit.location(), amount, unit.type, support.id, unit.id, support.player])
+
+	def __breach(self, unit, events):
+		info = self.info[unit.type]
+		damage = info.get('playerBreachDamage', 1)
+		enemy = 2 if unit.player == 1 else 1
+		self.stats[enemy]['health'] = max(0, self.stats[enemy]['health'] - damage)
+		self.stats[unit.player]['SP'] += info.get('metalForBreach', 0)
+		self.stats[unit.player]['end']['points_scored'] += damage
+		events['breach'].append([unit.location(), damage, unit.type, unit.id, unit.player])
+		events['death'].append([unit.location(), unit.type, unit.id, unit.player, False])
+		unit.finished = True
+
+	def __self_destruct(self, unit, events):
+		info = self.info[unit.type]
+		targets = []
+		if unit.steps >= info.get('selfDestructStepsRequired', 5):
+			radius = info.get('selfDestructRange', 1.5)
+			damage_walker = info.get('selfDestructDamageWalker', 0)
+			damage_tower = info.get('selfDestructDamageTower', 0)
+			for target in self.__enemies(unit, radius, damage_walker > 0, damage_tower > 0):
+				damage = damage_tower if target.stationary else damage_walker
+				target.health -= damage
+				targets.append(target.location())
+				events['damage'].append([target.location(), damage, target.type, target.id, target.player])
+			events['selfDestruct'].append([unit.location(), targets, max(damage_walker, damage_tower), unit.type, unit.id, unit.player])
+		events['death'].append([unit.location(), unit.type, unit.id, unit.player, False])
+		self.stats[unit.player]['end']['dynamic_resource_destroyed'] += unit.cost[1]
+		unit.finished = True
+
+	def __move(self, events):
+		for unit in self.mobiles:
+			if unit.health <= 0:
+				continue
+			unit.progress += unit.speed
+			while unit.progress >= 1 - 1e-9 and not unit.finished:
+				unit.progress -= 1
+				step = self.pathfinder.next_step(unit)
+				if step is None:
+					self.__self_destruct(unit, events)
+					break
+				previous = unit.location()
+				unit.last_move = VERTICAL if step[0] == unit.x else HORIZONTAL
+				unit.x, unit.y = step
+				unit.steps += 1
+				events['move'].append([previous, unit.location(), [-1, -1], unit.type, unit.id, unit.player])
+				if step in EDGE_SETS[unit.edge]:
+					self.__breach(unit, events)
+		# units killed by a self destruct stay until __remove_dead reports them
+		self.mobiles = [unit for unit in self.mobiles if not unit.finished]
+
+	# every enemy unit within radius of a unit, mobile units first
+	def __enemies(self, unit, radius, walkers=True, towers=True):
+		enemies = []
+		if walkers:
+			limit = radius + self.hit_radius
+			enemies += [u for u in self.mobiles if u.player != unit.player and u.health > 0 and math.hypot(u.x - unit.x, u.y - unit.y) < limit]
+		if towers:
+			for dx, dy in self.offsets_within(radius):
+				target = self.structures.get((unit.x + dx, unit.y + dy))
+				if target is not None and target.player != unit.player and target.health > 0:
+					enemies.append(target)
+		return enemies
+
+	# GameState.get_target: mobile units, then nearest, lowest health, closest to the attacker's side, furthest from the middle
+	def __target(self, unit):
+		candidates = self.__enemies(unit, unit.attack_range, unit.damage_walker > 0, unit.damage_tower > 0)
+		if not candidates:
+			return None
+		side = 1 if unit.player == 1 else -1
+		return min(candidates, key=lambda t: (
+			t.stationary,
+			math.hypot(t.x - unit.x, t.y - unit.y),
+			t.health,
+			side * t.y,
+			-abs(HALF_ARENA - 0.5 - t.x),
+			int(t.id)))
+
+	def __attack(self, events):
+		attackers = [u for u in self.structures.values() if u.damage_walker > 0 or u.damage_tower > 0]
+		attackers = sorted(attackers, key=lambda u: int(u.id)) + [u for u in self.mobiles if u.damage_walker > 0 or u.damage_tower > 0]
+		for unit in attackers:
+			target = self.__target(unit)
+			if target is None:
+				continue
+			damage = unit.damage_tower if target.stationary else unit.damage_walker
+			target.health -= damage
+			events['attack'].append([unit.location(), target.location(), damage, unit.type, unit.id, target.id, unit.player])
+			events['damage'].append([target.location(), damage, target.type, target.id, target.player])
+
+	def __remove_dead(self, events):
+		for location, unit in list(self.structures.items()):
+			if unit.health <= 0:
+				events['death'].append([unit.location(), unit.type, unit.id, unit.player, False])
+				del self.structures[location]
+				self.pathfinder.set_blocked(unit.x, unit.y, False)
+		for unit in self.mobiles:
+			if unit.health <= 0:
+				events['death'].append([unit.location(), unit.type, unit.id, unit.player, False])
+				self.stats[unit.player]['end']['dynamic_resource_destroyed'] += unit.cost[1]
+		self.mobiles = [unit for unit in self.mobiles if unit.health > 0]
+
+	# structures marked for removal lose a turn, the ones whose time is up are refunded and removed
+	def __remove_marked(self, events):
+		for location, unit in list(self.structures.items()):
+			if unit.removal is None:
+				continue
+			unit.removal -= 1
+			if unit.removal > 0:
+				continue
+			refund = unit.cost[0] * unit.refund * max(0, unit.health) / unit.max_health if unit.max_health > 0 else 0
+			self.stats[unit.player]['SP'] += refund
+			events['death'].append([unit.location(), unit.type, unit.id, unit.player, True])
+			del self.structures[location]
+			self.pathfinder.set_blocked(unit.x, unit.y, False)
+
+	# yields every frame of the action phase, the first one only holds the spawns of the deploy phase
+	def action_phase(self, spawns):
+		events = self.new_events()
+		events['spawn'] = spawns
+		frame_number = 0
+		while True:
+			last = len(self.mobiles) == 0 or frame_number >= MAX_FRAMES
+			if last:
+				self.__remove_marked(events)
+			yield self.frame(1, frame_number, events)
+			self.frames += 1
+			if last:
+				return
+			frame_number += 1
+			events = self.new_events()
+			self.__shield(events)
+			self.__move(events)
+			self.__attack(events)
+			self.__remove_dead(events)
+
+	# SP and MP of the next turn. MP decays first, then grows with the turn number
+	def end_turn(self):
+		resources = self.resources
+		self.turn += 1
+		bits = resources['bitsPerRound'] + resources['bitGrowthRate'] * (self.turn // resources['turnIntervalForBitSchedule'])
+		for player in (1, 2):
+			stats = self.stats[player]
+			stats['SP'] += resources['coresPerRound']
+			spoiled = stats['MP'] * resources['bitDecayPerRound']
+			stats['end']['dynamic_resource_spoiled'] += spoiled
+			stats['MP'] = min(resources['maxBits'], stats['MP'] - spoiled + bits)
+
+	# the health lost for taking longer than the soft time limit
+	def time_damage(self, player, elapsed_ms):
+		soft = self.timing.get('waitTimeBotSoft', 0)
+		if self.timing.get('waitForever') or soft <= 0 or elapsed_ms <= soft:
+			return
+		damage = math.ceil((elapsed_ms - soft) / 1000)
+		stats = self.stats[player]
+		stats['health'] = max(0, stats['health'] - damage)
+		stats['end']['time_damage_taken'] += damage
+		if stats['health'] <= 0:
+			stats['end']['timeout_death'] = True
+
+	def over(self):
+		return any(self.stats[player]['health'] <= 0 or self.stats[player]['end']['crashed'] for player in (1, 2)) or self.turn >= self.max_turns
+
+	def winner(self):
+		crashed = [self.stats[player]['end']['crashed'] for player in (1, 2)]
+		if crashed[0] != crashed[1]:
+			return 2 if crashed[0] else 1
+		h1, h2 = self.stats[1]['health'], self.stats[2]['health']
+		if h1 != h2:
+			return 1 if h1 > h2 else 2
+		t1, t2 = (self.stats[player]['end']['total_computation_time'] for player in (1, 2))
+		if t1 != t2:
+			return 1 if t1 < t2 else 2
+		return 0
+
+	def end_stats(self, names, duration):
+		end_stats = {'duration': duration, 'winner': self.winner(), 'turns': self.turn, 'frames': self.frames}
+		for player in (1, 2):
+			stats = dict(self.stats[player]['end'])
+			stats['name'] = names[player - 1]
+			stats['stationary_resource_left_on_board'] = sum(u.cost[0] for u in self.structures.values() if u.player == player)
+			end_stats['player{}'.format(player)] = stats
+		return end_stats
+
+
+# writes the frames of a game to the replay files that replaySave asks for
+class ReplayWriter:
+	def __init__(self, replay_dir, config):
+		self.files = []
+		save = config.get('timingAndReplay', {}).get('replaySave', 1)
+		if save == 0:
+			return
+		os.makedirs(replay_dir, exist_ok=True)
+		now = datetime.datetime.now()
+		suffix = '{}-{}--{}.replay'.format(now.strftime('%d-%m-%Y-%H-%M-%S'), int(time.time() * 1000), random.SystemRandom().randrange(1 << 31))
+		for player in (1, 2):
+			if save == player or save == 3:
+				f = open(os.path.join(replay_dir, 'p{}-{}'.format(player, suffix)), 'w')
+				self.files.append((player, f))
+		self.write_line(json.dumps(config))
+
+	def write_line(self, line, flipped_line=None):
+		for player, f in self.files:
+			f.write((flipped_line if player == 2 and flipped_line is not None else line) + '\n')
+
+	def paths(self):
+		return [f.name for _, f in self.files]
+
+	def close(self):
+		for _, f in self.files:
+			f.close()
+
+
+# plays a game between two algos and returns its end stats
+def play(run_files, config, replay_dir, max_turns=MAX_TURNS, seed=None):
+	game = Game(config, max_turns)
+	# the seed is passed to both algos, unless it is left to the one run_arena.py set
+	if seed is None and os.environ.get(SEED_ENV, '').lstrip('-').isdigit():
+		seed = int(os.environ[SEED_ENV])
+	env = dict(os.environ, **{SEED_ENV: str(seed)}) if seed is not None else None
+	timing = game.timing
+	bot_errors = sys.stdout if config.get('debug', {}).get('printBotErrors', True) else subprocess.DEVNULL
+	start = time.time()
+	algos = [AlgoProcess(run_file, bot_errors, env) for run_file in run_files]
+	names = [algo.name for algo in algos]
+	replay = ReplayWriter(replay_dir, config)
+	max_wait = float('inf') if timing.get('waitForever') else timing.get('waitTimeBotMax', 35000) / 1000
+
+	# sends a frame to both algos and the replay
+	def send(frame):
+		line = json.dumps(frame)
+		flipped_line = json.dumps(Game.flipped(frame))
+		algos[0].send((line + '\n').encode())
+		algos[1].send((flipped_line + '\n').encode())
+		replay.write_line(line, flipped_line)
+
+	config_line = (json.dumps(config) + '\n').encode()
+	for algo in algos:
+		algo.send(config_line)
+
+	try:
+		while True:
+			send(game.frame(0, -1, game.new_events()))
+			# both algos think at the same time, the time of each is measured from the deploy frame
+			sent = time.time()
+			replies = [None, None]
+			def read(i):
+				replies[i] = algos[i].read_turn(max_wait) + ((time.time() - sent) * 1000,)
+			threads = [threading.Thread(target=read, args=(i,)) for i in range(2)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+
+			spawns = []
+			for player in (1, 2):
+				(build, deploy), answered, elapsed = replies[player - 1]
+				stats = game.stats[player]
+				stats['end']['crashed'] = algos[player - 1].crashed
+				stats['time'] = int(elapsed)
+				stats['end']['total_computation_time'] += int(elapsed)
+				game.time_damage(player, elapsed)
+				if answered:
+					game.apply_commands(player, build if isinstance(build, list) else [], spawns)
+					game.apply_commands(player, deploy if isinstance(deploy, list) else [], spawns)
+			if any(algo.crashed for algo in algos):
+				break
+
+			for frame in game.action_phase(spawns):
+				send(frame)
+			game.end_turn()
+			if game.over():
+				break
+
+		end = game.frame(2, game.frames, game.new_events())
+		end['endStats'] = game.end_stats(names, int((time.time() - start) * 1000))
+		if seed is not None:
+			end['endStats']['seed'] = seed
+		send(end)
+	finally:
+		replay.close()
+		for algo in algos:
+			algo.close(timing.get('waitTimeEndGame', 3000) / 1000)
+	return end['endStats'], replay.paths()
+
+# turns an algo folder or run file into the run file for this platform
+def run_file(algo):
+	run_name = 'run.ps1' if is_windows else 'run.sh'
+	if os.path.isdir(algo):
+		return os.path.join(algo, run_name)
+	return algo
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"algos",
+		nargs='+',
+		help="the two algos to play, as folders or run files. A leading 'work' or 'play' is ignored like in the java engine\n\n")
+	ap.add_argument(
+		"-c", "--config",
+		default=None,
+		help="game config, defaults to game-configs.json in the root of the starter kit\n\n")
+	ap.add_argument(
+		"-o", "--replay-dir",
+		default=None,
+		help="folder the replay is written to, defaults to replays in the root of the starter kit\n\n")
+	ap.add_argument(
+		"--max-turns",
+		type=int,
+		default=MAX_TURNS,
+		help="turns after which the player with the most health wins\n\n")
+	ap.add_argument(
+		"--seed",
+		type=int,
+		default=None,
+		help="seed passed to both algos in the {} environment variable and written to the replay\n\n".format(SEED_ENV))
+	args = vars(ap.parse_args())
+	if args['algos'][0] in ('work', 'play'):
+		args['algos'] = args['algos'][1:]
+	if len(args['algos']) != 2:
+		ap.error('expected two algos')
+	return args
+
+if __name__ == '__main__':
+	args = parse_args()
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	with open(args['config'] if args['config'] else os.path.join(parent_dir, 'game-configs.json')) as f:
+		config = json.load(f)
+
+	end_stats, replays = play(
+		[run_file(algo) for algo in args['algos']],
+		config,
+		args['replay_dir'] if args['replay_dir'] else os.path.join(parent_dir, 'replays'),
+		args['max_turns'],
+		args['seed'])
+
+	winner = end_stats['winner']
+	names = [end_stats['player1']['name'], end_stats['player2']['name']]
+	print ('Winner: {}'.format('tie' if winner == 0 else 'p{} {}'.format(winner, names[winner - 1])))
+	print ('Turns: {}   Frames: {}   Duration: {:.1f}s'.format(end_stats['turns'], end_stats['frames'], end_stats['duration'] / 1000))
+	for replay in replays:
+		print ('Replay: {}'.format(replay))
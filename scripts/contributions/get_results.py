@@ -70,6 +70,26 @@ You can specify how many replays back you would like to run (by date) using the
 
 would run the last 3 games you ran
 
+----------------------------------------------------------------------------------------
+-j: Number of processes reading replays
+
+Replays are read by a pool of processes, one per CPU core by default. Every process only
+sends back the per turn data of the replays it read, which are merged in the order of the
+files, so the output is the same as reading them one after another. You can set the number
+of processes with:
+>py scripts/contributions/get_results.py -a -j 4
+
+and read everything in this process with -j 1.
+
+----------------------------------------------------------------------------------------
+--no-cache: Read every replay again
+
+The summary of every replay that was read is kept in results_cache.sqlite (see summary_cache.py)
+together with the size and modification time of the replay, so only new replays are read the
+next time. That includes the summary run_arena.py prints after its matches. To ignore the cache
+and read every replay again:
+>py scripts/contributions/get_results.py -a --no-cache
+
 ----------------------------------------------------------------------------------------
 -avg: Print average data fro a single replay (not very useful right now)
 
@@ -83,6 +103,11 @@ The only (currently) accepted parameters for -avg are:
 	- cores_spent
 	- bits_spent
 	- cores_on_board
+	- cores_refunded
+
+cores_spent and bits_spent are the SP and MP spent on spawns and upgrades so far, cores_refunded
+the SP given back for removed structures so far and cores_on_board the SP value of the structures
+on the board, upgrades included. All of them use the unit costs in the config of the replay.
 
 You can include 1, 2, or all in your output. For example:
 >py scripts/contributions/get_results.py -avg health bits cores
@@ -100,6 +125,7 @@ If you install matplotlib you can graph the following for individual matches:
 	- cores_spent
 	- bits_spent
 	- cores_on_board
+	- cores_refunded
 
 Simply do:
 >py scripts/contributions/get_results.py -g [PARAMETERS]
@@ -168,6 +194,9 @@ If you have any suggestions/questions let me know :) - @Isaac
 
 plt_installed = False
 
+# changes whenever the data a replay summary holds changes, older cached summaries are not used
+SUMMARY_VERSION = 2
+
 try:
 	import os
 	import sys
@@ -175,6 +204,9 @@ try:
 	import glob
 	import math
 	import argparse
+	import multiprocessing as mp
+	from replay_reader import ReplayReader, SpendAccounting
+	from summary_cache import SummaryCache, CACHE_FILE
 except ImportError as e:
 	sys.stderr.write("WARNING: Module not found, full error:\n\n")
 	sys.stderr.write(e)
@@ -220,17 +252,26 @@ def parse_args():
 		"-avg", "--averages",
 		nargs="*",
 		default=[],
-		help="data you would like the average of (not very useful right now)\nValid Options:\n\t- health\n\t- bits\n\t- cores\n\t- cores_spent\n\t- bits_spent\n\t- cores_on_board\n\n")
+		help="data you would like the average of (not very useful right now)\nValid Options:\n\t- health\n\t- bits\n\t- cores\n\t- cores_spent\n\t- bits_spent\n\t- cores_on_board\n\t- cores_refunded\n\n")
 	ap.add_argument(
 		"-f", "--file",
 		nargs="*",
 		default=[],
 		help="specify a replay file (or multiple) you'd like to analyze\n\n")
+	ap.add_argument(
+		"-j", "--jobs",
+		type=int,
+		default=None,
+		help="number of processes reading replays, defaults to the number of CPU cores\n\n")
+	ap.add_argument(
+		"--no-cache",
+		action='store_true',
+		help="read every replay again instead of using the summaries in results_cache.sqlite\n\n")
 	ap.add_argument(
 		"-g", "--graph",
 		nargs="*",
 		default=[],
-		help="specify what data you would like to be graphed - you must have matplotlib installed\n\nValid Options For Single Game:\n\t- health\n\t- bits\n\t- cores\n\t- cores_spent\n\t- bits_spent\n\t- cores_on_board\n\nValid Options For Multiple Games:\n\t- wins\n\n")
+		help="specify what data you would like to be graphed - you must have matplotlib installed\n\nValid Options For Single Game:\n\t- health\n\t- bits\n\t- cores\n\t- cores_spent\n\t- bits_spent\n\t- cores_on_board\n\t- cores_refunded\n\nValid Options For Multiple Games:\n\t- wins\n\n")
 	return vars(ap.parse_args())
 
 
@@ -239,7 +280,7 @@ class Graph:
 	pos = (0,0)
 	empty_plots = []
 
-	verbose_options = ['health', 'bits', 'cores', 'cores_spent', 'bits_spent', 'cores_on_board']
+	verbose_options = ['health', 'bits', 'cores', 'cores_spent', 'bits_spent', 'cores_on_board', 'cores_refunded']
 	summary_options = ['wins']
 
 	@staticmethod
@@ -442,14 +483,16 @@ class Algo:
 
 # Stores data from a single replay and creates the Algo classes
 class Replay:
-	def __init__(self, f_name, algos):
+	def __init__(self, f_name, algos, summary=None):
 		self.fname = f_name;
 		self.ref = None
-		self.turns = {}
-		self.valid_turns = []
+		self.turns = None
 
-		self.load_data()				# handles loading all the data from file into python variables
-		self.unpack_data(algos)		# stores relevant data after it has been loaded
+		self.load_data()				# opens the replay, frames are read from the file when they are needed
+		if summary is None:
+			self.unpack_data(algos)		# stores relevant data after it has been loaded
+		else:
+			self.merge_summary(algos, summary)	# stores data another process already unpacked (see summarize_replay)
 
 	def __eq__(self, other):
 		return self.fname == other.fname
@@ -461,106 +504,95 @@ class Replay:
 		return self.__string()
 
 	def load_data(self):
-		with open(self.fname) as f:
-			for line in f:
-				line = line.replace("\n", "")
-				line = line.replace("\t", "")
-
-				if (line != ''):
-					data = json.loads(line)
-
-					try:
-						data['debug']
-						self.ref = data
-					except:
-						turn_num = data['turnInfo'][1]
-						frame_num = data['turnInfo'][2]
-						self.turns[(turn_num, frame_num)] = data
-						if (turn_num, frame_num) not in self.valid_turns:
-							self.valid_turns.append((turn_num, frame_num))
-
-	def get_cores_on_board(self, filters, encryptors, destructors):
-		return len(filters) + len(encryptors) * 4 + len(destructors) * 3
-
-	def get_bits_spent(self, algo, spawn):
-		p_index = 1 if algo == self.algo1 else 2
-		pings = [x for x in spawn if x[3] == p_index and x[1] == 3]
-		emps = [x for x in spawn if x[3] == p_index and x[1] == 4]
-		scramblers = [x for x in spawn if x[3] == p_index and x[1] == 5]
-		return len(pings) + len(emps) * 3 + len(scramblers)
-
-	def get_cores_spent(self, algo, spawn):
-		p_index = 1 if algo == self.algo1 else 2
-		filters = [x for x in spawn if x[3] == p_index and x[1] == 0]
-		encryptors = [x for x in spawn if x[3] == p_index and x[1] == 1]
-		destructors = [x for x in spawn if x[3] == p_index and x[1] == 2]
-		return len(filters) + len(encryptors) * 4 + len(destructors) * 3
-
-	def add_data_to_algo(self, algo, t, f, stats, units, spawn):
+		self.turns = ReplayReader(self.fname)
+
+	def add_data_to_algo(self, algo, t, stats, board_value, totals):
 		algo.add_data(self.fname, t, 'health', stats[0])
 		algo.add_data(self.fname, t, 'cores', stats[1])
 		algo.add_data(self.fname, t, 'bits', stats[2])
+		algo.add_data(self.fname, t, 'cores_on_board', board_value)
 
-		filters, encryptors, destructors, pings, emps, scramblers, removes = units
-
-		algo.add_data(self.fname, t, 'cores_on_board', self.get_cores_on_board(filters, encryptors, destructors))
-
-		if f == 0:
-			algo.add_data(self.fname, t, 'cores_spent', self.get_cores_spent(algo, spawn), True)
-			algo.add_data(self.fname, t, 'bits_spent', self.get_bits_spent(algo, spawn), True)
+		# running totals, so every turn holds what was spent and refunded up to its end
+		algo.add_data(self.fname, t, 'cores_spent', totals['sp_spent'])
+		algo.add_data(self.fname, t, 'bits_spent', totals['mp_spent'])
+		algo.add_data(self.fname, t, 'cores_refunded', totals['refund'])
 
 	def unpack_data(self, algos):
 		try:
 			self.algo1, self.algo2 = self.create_algos(algos)
 
-			for t, f in self.get_valid_turns():
-				turn = self.get_turn(t, f)
+			# costs, upgrade costs and refunds come from the config of the replay itself
+			accounting = SpendAccounting(self.turns.config)
+			totals = {player: {'sp_spent': 0.0, 'mp_spent': 0.0, 'refund': 0.0} for player in (1, 2)}
 
-				turn_info = turn['turnInfo']
-				events = turn['events']
-				spawn = events['spawn']
+			# one pass over the file, only the frame being added is decoded at a time
+			for turn in self.turns.frames():
+				t = turn['turnInfo'][1]
+				spending = accounting.frame(turn)
 
-				p1_stats = turn['p1Stats']
-				p1_units = turn['p1Units']
+				for player in (1, 2):
+					for key in totals[player]:
+						totals[player][key] += spending[player][key]
 
-				p2_stats = turn['p2Stats']
-				p2_units = turn['p2Units']
+				self.add_data_to_algo(self.algo1, t, turn['p1Stats'], spending[1]['board_value'], totals[1])
+				self.add_data_to_algo(self.algo2, t, turn['p2Stats'], spending[2]['board_value'], totals[2])
 
-				self.add_data_to_algo(self.algo1, t, f, p1_stats, p1_units, spawn)
-				self.add_data_to_algo(self.algo2, t, f, p2_stats, p2_units, spawn)
+			self.ref = self.turns.config
 
 			self.algo1.recored_final_data(self.fname, self.algo2)
 			self.algo2.recored_final_data(self.fname, self.algo1)
-			self.algo1.add_end_stats(self.fname, self.turns[self.valid_turns[-1]]['endStats']['player1'])
-			self.algo2.add_end_stats(self.fname, self.turns[self.valid_turns[-1]]['endStats']['player2'])
+			end_stats = self.turns.end_frame()['endStats']
+			self.algo1.add_end_stats(self.fname, end_stats['player1'])
+			self.algo2.add_end_stats(self.fname, end_stats['player2'])
 		except Exception as e:
 			sys.stderr.write(str(e))
 
 	# only creates a new algo class if that algo does not already exist. Otherwise data is added to the existing one
 	def create_algos(self, algos):
-		end_stats = self.turns[self.valid_turns[-1]]['endStats']
+		end_stats = self.turns.end_frame()['endStats']
 		p1_algo = end_stats['player1']['name']
 		p2_algo = end_stats['player2']['name']
 
-		if p1_algo not in algos:
-			algo1 = Algo(p1_algo)
-			algos.append(algo1)
-		else:
-			algo1 = algos[algos.index(p1_algo)]
+		return self.get_algo(algos, p1_algo), self.get_algo(algos, p2_algo)
 
-		if p2_algo not in algos:
-			algo2 = Algo(p2_algo)
-			algos.append(algo2)
-		else:
-			algo2 = algos[algos.index(p2_algo)]
+	def get_algo(self, algos, name):
+		if name not in algos:
+			algo = Algo(name)
+			algos.append(algo)
+			return algo
+		return algos[algos.index(name)]
 
-		return algo1, algo2
+	# returns only what the algos learned from this replay, small enough to send between processes and store as JSON
+	def get_summary(self):
+		try:
+			algos = [self.algo1, self.algo2]
+		except AttributeError:
+			return {'version': SUMMARY_VERSION, 'names': [], 'data': {}}		# the replay could not be unpacked, the error was already written
+
+		# the turns are kept as a list of items, JSON would turn their numbers into strings
+		return {
+			'version':	SUMMARY_VERSION,
+			'names':	[algo.name for algo in algos],
+			'data':		{algo.name: [list(algo.replays[self.fname].items()) if self.fname in algo.replays else None, algo.wins] for algo in algos},
+			}
+
+	# adds a summary of this replay made by get_summary to the algos, the way unpack_data would have
+	def merge_summary(self, algos, summary):
+		if len(summary['names']) == 0:
+			return
+
+		self.algo1, self.algo2 = [self.get_algo(algos, name) for name in summary['names']]
+		for name, (data, wins) in summary['data'].items():
+			algo = self.get_algo(algos, name)
+			if data is not None:
+				algo.replays[self.fname] = dict(data)
+			algo.wins += wins
 
 	def get_algos(self):
 		return [self.algo1, self.algo2]
 
 	def get_valid_turns(self):
-		return self.valid_turns
+		return list(self.turns)
 	def get_turns(self):
 		return self.turns
 	def get_turn(self, turn, frame=-1):
@@ -600,16 +632,42 @@ class FileHandler:
 			return files
 		return files[:num]
 
-	def load_files(self, num=1, a=False, f_names=[]):
+	def load_files(self, num=1, a=False, f_names=[], jobs=None, cache_file=None):
 		if len(f_names) > 0:
-			for f_name in f_names:
-				if f_name.find('replays') == -1:
-					self.replays.append(Replay('replays/'+f_name, self.algos))
-				else:
-					self.replays.append(Replay(f_name, self.algos))
+			files = [f_name if f_name.find('replays') != -1 else 'replays/'+f_name for f_name in f_names]
+		else:
+			files = self.__latest_replays(num, a)
+
+		cache = SummaryCache(cache_file) if cache_file else None
+		summaries = {}
+		if cache is not None:
+			for f_name in files:
+				summary = cache.get(f_name)
+				# summaries made by an older version of this script may hold other data
+				if summary is not None and summary.get('version') == SUMMARY_VERSION:
+					summaries[f_name] = summary
+		todo = [f_name for f_name in files if f_name not in summaries]
+
+		jobs = min(jobs if jobs else os.cpu_count() or 1, len(todo))
+		if jobs <= 1:
+			summaries.update(summarize_replay(f_name) for f_name in todo)
 		else:
-			for f_name in self.__latest_replays(num, a):
-				self.replays.append(Replay(f_name, self.algos))
+			with mp.Pool(jobs) as pool:
+				for i, (f_name, summary) in enumerate(pool.imap_unordered(summarize_replay, todo)):
+					summaries[f_name] = summary
+					sys.stderr.write('\rRead {} of {} replays'.format(i + 1, len(todo)))
+			sys.stderr.write('\n\n')
+
+		if cache is not None:
+			# replays that could not be read may still be written by the engine, they are read again next time
+			for f_name in todo:
+				if len(summaries[f_name]['names']) > 0:
+					cache.put(f_name, summaries[f_name])
+			cache.close()
+
+		# merged in the order of the files, so the algos end up like they would reading them one after another
+		for f_name in files:
+			self.replays.append(Replay(f_name, self.algos, summaries[f_name]))
 
 	def add_plot(self, lbl):
 		if lbl == 'wins':
@@ -630,6 +688,10 @@ class FileHandler:
 			Graph.advance()
 
 
+# reads a single replay on a worker process of FileHandler.load_files and returns its summary
+def summarize_replay(f_name):
+	return f_name, Replay(f_name, []).get_summary()
+
 # displays detailed data for every replay stored in the fileManager fh.
 def run_every_replay_verbose(fh, graphing_enabled, options):
 	for replay in fh.get_replays():
@@ -710,8 +772,12 @@ def get_graph_options(options):
 def main(args):
 	verbose_options, summary_options = get_graph_options(args['graph'])
 
+	# other scripts call main with their own dict, which may not have the newer options
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	cache_file = None if args.get('no_cache', False) else os.path.join(parent_dir, CACHE_FILE)
+
 	fh = FileHandler()
-	fh.load_files(int(args['num']), args['all'], args['file']) #loads the files - all JSON reading is here
+	fh.load_files(int(args['num']), args['all'], args['file'], args.get('jobs'), cache_file) #loads the files - all JSON reading is here
 
 	# check to see if matplotlib is installed
 	graphing_enabled = True if len(verbose_options) > 0 or len(summary_options) > 0 else False
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Adds up where an algo was breached, damaged and lost structures and where its opponents spawned, over every replay, into heatmaps algos can load.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+game_state.last_action_phase (gamelib/action_summary.py) tells an algo where it was breached or
+damaged in the last turn only. This script adds the same tallies up over a whole folder of
+replays, for one algo:
+
+>py scripts/contributions/heatmaps.py python-algo -o algos/python-algo/heatmaps.json
+
+reads the replays through the replay store (see replay_store.py, only replays that are not in
+the store yet are read) and writes 28x28 maps of
+
+	breaches			enemy units that scored on the algo
+	damage_taken		damage the structures of the algo took
+	structures_lost		structures of the algo that were destroyed (not removed by itself)
+	enemy_spawns		units the opponent spawned, one map per unit type
+
+for every opponent and for all of them together ("*"), and for every turn range given with -r
+(0-9 10-19 20- by default). Games where the algo was player 2 are flipped, so every map is seen
+from the algo's side of the board like in game_state. Run the script with -s to also print the
+most breached and damaged locations.
+
+The maps hold the totals over the games and the number of games they come from, and only the
+locations that are not 0, so the file stays small. An algo loads them at startup with
+gamelib/heatmaps.py:
+
+	self.heatmaps = gamelib.heatmaps.load(os.path.join(os.path.dirname(__file__), 'heatmaps.json'))
+	grid = self.heatmaps.grid('breaches', game_state.turn_number)		# average per game, grid[x][y]
+'''
+
+import sys
+try:
+	import os
+	import glob
+	import json
+	import argparse
+	from array import array
+	from replay_store import ReplayStore, STORE_DIR
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+
+HEATMAP_DIR = 'heatmaps'
+ARENA_SIZE = 28
+ALL_OPPONENTS = '*'
+TURN_RANGES = [(0, 9), (10, 19), (20, None)]
+
+# the unit types tallied, the same as in gamelib/action_summary.py
+UNIT_TYPES = 6
+STRUCTURE_TYPES = (0, 1, 2)
+
+
+# parses a turn range like 0-9, 20- or 5
+def parse_range(value):
+	first, _, last = value.partition('-')
+	try:
+		first = int(first)
+		last = None if _ and last == '' else int(last) if last else first
+	except ValueError:
+		raise argparse.ArgumentTypeError('turn ranges look like 0-9, 20- or 5, not {}'.format(value))
+	return first, last
+
+# returns the index of the turn range a turn falls in, or None if it falls in none
+def range_index(turn_ranges, turn):
+	for i, (first, last) in enumerate(turn_ranges):
+		if turn >= first and (last is None or turn <= last):
+			return i
+	return None
+
+# returns {game index: [(player number of the algo, opponent name)]}, both sides of a game against itself
+def sides_of(store, algo):
+	sides = {}
+	for i, game in store.current_games():
+		if game['p1'] == algo:
+			sides.setdefault(i, []).append((1, game['p2']))
+		if game['p2'] == algo:
+			sides.setdefault(i, []).append((2, game['p1']))
+	return sides
+
+
+# Adds up the events of the store into flat ARENA_SIZE * ARENA_SIZE arrays, by opponent, turn range and map
+class HeatmapBuilder:
+	def __init__(self, store, algo, turn_ranges=TURN_RANGES):
+		self.store = store
+		self.algo = algo
+		self.turn_ranges = list(turn_ranges)
+		self.sides = sides_of(store, algo)
+		self.games = {ALL_OPPONENTS: 0}
+		for sides in self.sides.values():
+			for _, opponent in sides:
+				self.games[opponent] = self.games.get(opponent, 0) + 1
+				self.games[ALL_OPPONENTS] += 1
+		self.maps = {}					# (opponent, turn range index, map name) -> array
+
+	def add(self, opponent, turn, name, x, y, value):
+		i = range_index(self.turn_ranges, turn)
+		if i is None:
+			return
+		for key in ((opponent, i, name), (ALL_OPPONENTS, i, name)):
+			grid = self.maps.get(key)
+			if grid is None:
+				grid = self.maps[key] = array('d', bytes(8 * ARENA_SIZE * ARENA_SIZE))
+			grid[x * ARENA_SIZE + y] += value
+
+	# goes through the event tables of the store once each
+	def build(self):
+		column = self.store.column
+		games = self.store.games
+
+		def rows(table, *names):
+			return zip(*(column(table, name) for name in ('game', 'turn', 'player') + names))
+
+		# yields the side, opponent and location of an event as the algo sees it, for every side it played in the game
+		def seen_by(game, player, x, y, own):
+			for side, opponent in self.sides.get(game, ()):
+				if (player == side) == own:
+					yield opponent, (x, y) if side == 1 else (ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y)
+
+		for game, turn, player, x, y in rows('breaches', 'x', 'y'):
+			for opponent, (x_, y_) in seen_by(game, player, x, y, False):
+				self.add(opponent, turn, 'breaches', x_, y_, 1)
+		for game, turn, player, unit_type, damage, x, y in rows('damage', 'type', 'damage', 'x', 'y'):
+			if unit_type in STRUCTURE_TYPES:
+				for opponent, (x_, y_) in seen_by(game, player, x, y, True):
+					self.add(opponent, turn, 'damage_taken', x_, y_, damage)
+		for game, turn, player, unit_type, x, y, removed in rows('deaths', 'type', 'x', 'y', 'removed'):
+			if unit_type in STRUCTURE_TYPES and not removed:
+				for opponent, (x_, y_) in seen_by(game, player, x, y, True):
+					self.add(opponent, turn, 'structures_lost', x_, y_, 1)
+		for game, turn, player, unit_type, x, y in rows('spawns', 'type', 'x', 'y'):
+			if unit_type < UNIT_TYPES and game in self.sides:
+				units = games[game].get('units') or []
+				name = units[unit_type] if unit_type < len(units) else str(unit_type)
+				for opponent, (x_, y_) in seen_by(game, player, x, y, False):
+					self.add(opponent, turn, 'enemy_spawns:' + name, x_, y_, 1)
+		return self
+
+	# returns the heatmaps in the format gamelib/heatmaps.py loads, with only the locations that are not 0
+	def export(self):
+		opponents = {}
+		for opponent, games in self.games.items():
+			opponents[opponent] = {'games': games, 'maps': [{'enemy_spawns': {}} for _ in self.turn_ranges]}
+		for (opponent, i, name), grid in sorted(self.maps.items()):
+			cells = [[n // ARENA_SIZE, n % ARENA_SIZE, round(value, 3)] for n, value in enumerate(grid) if value]
+			maps = opponents[opponent]['maps'][i]
+			if name.startswith('enemy_spawns:'):
+				maps['enemy_spawns'][name.split(':', 1)[1]] = cells
+			else:
+				maps[name] = cells
+		return {
+			'algo':			self.algo,
+			'turn_ranges':	[list(turn_range) for turn_range in self.turn_ranges],
+			'opponents':	opponents,
+			}
+
+	# returns the locations with the highest totals of a map over every turn range, highest first
+	def hottest(self, name, opponent=ALL_OPPONENTS, count=5):
+		totals = array('d', bytes(8 * ARENA_SIZE * ARENA_SIZE))
+		for (map_opponent, _, map_name), grid in self.maps.items():
+			if map_opponent == opponent and map_name == name:
+				for n, value in enumerate(grid):
+					totals[n] += value
+		ranked = sorted((value, n) for n, value in enumerate(totals) if value)[::-1][:count]
+		return [([n // ARENA_SIZE, n % ARENA_SIZE], value) for value, n in ranked]
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"algo",
+		help="name of the algo the heatmaps are made for, as it shows up in the replays (its folder name)\n\n")
+	ap.add_argument(
+		"-o", "--out",
+		default=None,
+		help="file the heatmaps are written to, defaults to heatmaps/ALGO.json in the starter kit folder\n\n")
+	ap.add_argument(
+		"-r", "--ranges",
+		nargs="*",
+		type=parse_range,
+		default=TURN_RANGES,
+		help="turn ranges to make separate maps for, like 0-9 10-19 20-\n\n")
+	ap.add_argument(
+		"--store",
+		default=None,
+		help="folder of the replay store, defaults to replay_store in the starter kit folder\n\n")
+	ap.add_argument(
+		"-f", "--file",
+		nargs="*",
+		default=None,
+		help="replay files to add to the store first, defaults to every replay in the replays folder\n\n")
+	ap.add_argument(
+		"-s", "--show",
+		action='store_true',
+		help="print the most breached and damaged locations\n\n")
+	return vars(ap.parse_args())
+
+def main(args):
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	store = ReplayStore(args['store'] if args['store'] else os.path.join(parent_dir, STORE_DIR))
+	store.update(args['file'] if args['file'] is not None else sorted(glob.glob(os.path.join(parent_dir, 'replays', '*.replay'))))
+
+	builder = HeatmapBuilder(store, args['algo'], args['ranges']).build()
+	if builder.games[ALL_OPPONENTS] == 0:
+		print ('{} played none of the {} games in {}'.format(args['algo'], len(store.current_games()), store.path))
+		return
+
+	out = args['out'] if args['out'] else os.path.join(parent_dir, HEATMAP_DIR, args['algo'] + '.json')
+	os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+	with open(out, 'w') as f:
+		json.dump(builder.export(), f, separators=(',', ':'))
+	print ('Heatmaps of {} from {} games against {} opponents written to {}'.format(
+		args['algo'], builder.games[ALL_OPPONENTS], len(builder.games) - 1, out))
+
+	if args['show']:
+		for name in ('breaches', 'damage_taken', 'structures_lost'):
+			print ('\nMost {}:'.format(name.replace('_', ' ')))
+			for location, value in builder.hottest(name):
+				print ('|{: >12} : {}'.format(str(location), round(value, 1)))
+
+
+if __name__ == '__main__':
+	main(parse_args())
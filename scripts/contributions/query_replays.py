@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Finds the turns and frames of replays that match some conditions, like where you were breached or how many scouts the enemy sent, without decoding every frame.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Looking into losses usually comes down to questions like "in which games was I breached at
+x <= 3 before turn 10" or "when did the enemy send 10 or more scouts in one turn". This script
+answers them over a folder of replays and prints the matching frames, with the command to open
+each of them in watch_replay.py:
+
+>py scripts/contributions/query_replays.py -a python-algo -t 0-9 -e breach by=enemy x<=3
+>py scripts/contributions/query_replays.py -a python-algo -c 10 spawn by=enemy type=SI
+
+Conditions compare a field to a value with <, <=, >, >=, = or !=, and several conditions after
+one option must all hold. The options are:
+
+	-a ALGO					look at the games from the side of ALGO, only games it played are searched
+	--opponent NAME			only search games against NAME
+	-t 0-9					only search these turns (20- is turn 20 and later)
+	-s own.health<10		the stats of a frame (own. or enemy. with health, sp, mp or time)
+	-e KIND CONDITIONS		frames with at least one event of KIND that matches
+	-c N KIND CONDITIONS	turns with at least N events of KIND that match, over all their frames
+
+The event kinds are spawn, breach, damage and death, and their fields:
+
+	x, y					where it happened, flipped when ALGO is player 2 so own units are at the bottom
+	type					the shorthand of the unit, like FF or SI (RM and UP for removals and upgrades)
+	by						own or enemy: who spawned the unit, whose unit scored (breach) or whose unit
+							was damaged or died (damage, death)
+	damage					the damage of a breach or damage event
+	removed					1 if a death was a removal
+
+Without -a every game is looked at from the side of player 1.
+
+-e and -s pick frames and -c picks turns: with both, the frames that match in the turns that
+match are printed, with only -c the frame where the last count was reached is printed.
+
+----------------------------------------------------------------------------------------
+How it stays fast
+
+Every condition is checked as early as it can be, so most of a replay is never decoded:
+
+1. the player names are read from the last frame of the replay, which is read from the end of
+   the file, so replays ALGO did not play are skipped without reading the rest
+2. the turn range and stat conditions are checked on the index of the replay (replay_reader.py),
+   which has the turn, frame and stats of every frame and is built once and saved as REPLAY.idx
+3. the frames left are read as undecoded lines, and only decoded if they have events of the kinds
+   the conditions ask about
+
+The script prints how many frames it had to decode at the end. From python:
+
+	from query_replays import ReplayQuery
+	query = ReplayQuery(algo='python-algo').turns(0, 9)
+	query.event('breach', lambda event: event.by == 'enemy' and event.x <= 3)
+	for ref in query.run(f_names):		# FrameRef(replay, turn, frame)
+		print (ref)
+'''
+
+import sys
+try:
+	import os
+	import re
+	import glob
+	import json
+	import argparse
+	from collections import namedtuple
+	from replay_reader import ReplayReader
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+
+ARENA_SIZE = 28
+EVENT_KINDS = ('spawn', 'breach', 'damage', 'death')
+
+# finds an event list of a kind with at least one event in it, in an undecoded frame
+HAS_EVENTS = {kind: re.compile(r'"{}"\s*:\s*\[\s*\['.format(kind).encode()) for kind in EVENT_KINDS}
+
+CONDITION = re.compile(r'^([\w.]+)\s*(<=|>=|!=|=|<|>)\s*(.+)$')
+OPERATORS = {
+	'<':	lambda a, b: a < b,
+	'<=':	lambda a, b: a <= b,
+	'>':	lambda a, b: a > b,
+	'>=':	lambda a, b: a >= b,
+	'=':	lambda a, b: a == b,
+	'!=':	lambda a, b: a != b,
+	}
+
+Event = namedtuple('Event', ['kind', 'x', 'y', 'type', 'by', 'damage', 'removed'])
+Stats = namedtuple('Stats', ['health', 'sp', 'mp', 'time'])
+FrameRef = namedtuple('FrameRef', ['replay', 'turn', 'frame'])
+
+
+# yields the events of a kind in a decoded frame as the given side sees them
+def events_of(data, kind, side, units):
+	for event in data['events'].get(kind, ()):
+		damage, removed = 0, 0
+		if kind == 'spawn':
+			(x, y), unit_type, player = event[0], event[1], event[3]
+		elif kind == 'death':
+			(x, y), unit_type, player, removed = event[0], event[1], event[3], int(bool(event[4]))
+		else:
+			(x, y), damage, unit_type, player = event[0], event[1], event[2], event[4]
+		if side == 2:
+			x, y = ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y
+		name = units[unit_type] if unit_type < len(units) else str(unit_type)
+		yield Event(kind, x, y, name, 'own' if player == side else 'enemy', damage, removed)
+
+
+# Searches replays for frames and turns that match every condition it was given
+class ReplayQuery:
+	def __init__(self, algo=None, opponent=None):
+		self.algo = algo
+		self.opponent = opponent
+		self.first_turn = 0
+		self.last_turn = None
+		self.stat_filters = []				# predicate(own Stats, enemy Stats)
+		self.event_filters = []				# (kind, predicate(Event))
+		self.turn_filters = []				# (kind, count, predicate(Event))
+		self.counts = {'replays': 0, 'searched': 0, 'frames': 0, 'decoded': 0}
+
+	def turns(self, first=0, last=None):
+		self.first_turn, self.last_turn = first, last
+		return self
+
+	def stats(self, predicate):
+		self.stat_filters.append(predicate)
+		return self
+
+	def event(self, kind, predicate=None):
+		self.event_filters.append((kind, predicate or (lambda event: True)))
+		return self
+
+	def per_turn(self, kind, count, predicate=None):
+		self.turn_filters.append((kind, count, predicate or (lambda event: True)))
+		return self
+
+	# returns the player number the replay is looked at from, or None if its players do not match
+	def side_of(self, reader):
+		if self.algo is None and self.opponent is None:
+			return 1
+		end = reader.end_frame()
+		if not end or 'endStats' not in end:
+			return None
+		names = {1: end['endStats']['player1']['name'], 2: end['endStats']['player2']['name']}
+		for side, other in ((1, 2), (2, 1)):
+			if self.algo not in (None, names[side]):
+				continue
+			if self.opponent not in (None, names[other]):
+				continue
+			return side
+		return None
+
+	# returns the (turn, frame) keys of a replay that pass the turn range and stat conditions, grouped by turn, from its index
+	def candidates(self, reader, side):
+		turns = {}
+		for turn, frame, _, p1_stats, p2_stats in reader.headlines():
+			if turn < self.first_turn or (self.last_turn is not None and turn > self.last_turn):
+				continue
+			own, enemy = (p1_stats, p2_stats) if side == 1 else (p2_stats, p1_stats)
+			if all(predicate(Stats(*own[:4]), Stats(*enemy[:4])) for predicate in self.stat_filters):
+				turns.setdefault(turn, []).append((turn, frame))
+		self.counts['frames'] += sum(len(keys) for keys in turns.values())
+		return turns
+
+	# yields a FrameRef for every match in one replay
+	def search(self, f_name):
+		self.counts['replays'] += 1
+		reader = ReplayReader(f_name)
+		side = self.side_of(reader)
+		if side is None:
+			return
+		self.counts['searched'] += 1
+		units = [unit.get('shorthand') for unit in reader.config['unitInformation']]
+		frame_kinds = set(kind for kind, _ in self.event_filters)
+		turn_kinds = set(kind for kind, _, _ in self.turn_filters)
+
+		for turn, keys in self.candidates(reader, side).items():
+			matches = []
+			counts = [0] * len(self.turn_filters)
+			reached = None
+			for key in keys:
+				data = None
+				if frame_kinds or turn_kinds:
+					line = reader.line(key)
+					present = set(kind for kind in frame_kinds | turn_kinds if HAS_EVENTS[kind].search(line))
+					# a frame is only decoded if it has every event kind the frame conditions need, or one the turn conditions count
+					if (frame_kinds and frame_kinds <= present) or (present & turn_kinds and reached is None):
+						data = json.loads(line)
+						self.counts['decoded'] += 1
+
+				if data is not None and reached is None and self.turn_filters:
+					for i, (kind, count, predicate) in enumerate(self.turn_filters):
+						if kind in present:
+							counts[i] += sum(1 for event in events_of(data, kind, side, units) if predicate(event))
+					if all(counted >= count for counted, (_, count, _) in zip(counts, self.turn_filters)):
+						reached = key
+
+				if self.event_filters:
+					if data is not None and frame_kinds <= present and all(
+							any(predicate(event) for event in events_of(data, kind, side, units)) for kind, predicate in self.event_filters):
+						matches.append(key)
+				elif self.stat_filters or not self.turn_filters:
+					matches.append(key)
+
+			if self.turn_filters:
+				if reached is None:
+					continue
+				if not self.event_filters and not self.stat_filters:
+					matches = [reached]
+			for match in matches:
+				yield FrameRef(f_name, match[0], match[1])
+
+	# yields a FrameRef for every match in the replays, in the order of the files
+	def run(self, f_names):
+		for f_name in f_names:
+			for ref in self.search(f_name):
+				yield ref
+
+
+# returns a predicate of an Event or Stats with the fields of the condition, like x<=3 or type=SI
+def condition(text, fields=Event._fields):
+	match = CONDITION.match(text)
+	if match is None:
+		raise argparse.ArgumentTypeError('conditions look like x<=3 or type=SI, not {}'.format(text))
+	field, operator, value = match.groups()
+	if field not in fields:
+		raise argparse.ArgumentTypeError('{} has no field {}, use one of {}'.format(text, field, ', '.join(fields)))
+	try:
+		value = float(value)
+	except ValueError:
+		pass
+	compare = OPERATORS[operator]
+	return lambda item: compare(getattr(item, field), value)
+
+# returns a predicate of the own and enemy Stats, from conditions like own.health<10
+def stats_condition(text):
+	side, _, field = text.partition('.')
+	if side not in ('own', 'enemy') or not field:
+		raise argparse.ArgumentTypeError('stat conditions look like own.health<10 or enemy.mp>=10, not {}'.format(text))
+	predicate = condition(field, Stats._fields)
+	return lambda own, enemy: predicate(own if side == 'own' else enemy)
+
+# returns a predicate of an Event that holds if every condition does
+def all_conditions(texts):
+	predicates = [condition(text) for text in texts]
+	return lambda event: all(predicate(event) for predicate in predicates)
+
+# parses a turn range like 0-9, 20- or 5
+def parse_range(value):
+	first, dash, last = value.partition('-')
+	try:
+		return int(first), (None if last == '' else int(last)) if dash else int(first)
+	except ValueError:
+		raise argparse.ArgumentTypeError('turn ranges look like 0-9, 20- or 5, not {}'.format(value))
+
+def event_kind(kind):
+	if kind not in EVENT_KINDS:
+		raise argparse.ArgumentTypeError('event kinds are {}, not {}'.format(', '.join(EVENT_KINDS), kind))
+	return kind
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-f", "--file",
+		nargs="*",
+		default=None,
+		help="replay files to search, defaults to every replay in the replays folder\n\n")
+	ap.add_argument(
+		"-a", "--algo",
+		default=None,
+		help="only search games of this algo, from its side of the board\n\n")
+	ap.add_argument(
+		"--opponent",
+		default=None,
+		help="only search games against this opponent\n\n")
+	ap.add_argument(
+		"-t", "--turns",
+		type=parse_range,
+		default=(0, None),
+		help="only search these turns, like 0-9 or 20-\n\n")
+	ap.add_argument(
+		"-s", "--stat",
+		nargs="+",
+		type=stats_condition,
+		default=[],
+		help="conditions on the stats of a frame, like own.health<10 enemy.mp>=10\n\n")
+	ap.add_argument(
+		"-e", "--event",
+		nargs="+",
+		action="append",
+		default=[],
+		help="an event kind and conditions a frame needs an event for, like breach by=enemy x<=3 (can be given more than once)\n\n")
+	ap.add_argument(
+		"-c", "--count",
+		nargs="+",
+		action="append",
+		default=[],
+		help="a count, an event kind and conditions a turn needs that many events for, like 10 spawn by=enemy type=SI (can be given more than once)\n\n")
+	ap.add_argument(
+		"-n", "--limit",
+		type=int,
+		default=None,
+		help="stop after this many matches\n\n")
+	return vars(ap.parse_args())
+
+def main(args):
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	f_names = args['file'] if args['file'] is not None else sorted(glob.glob(os.path.join(parent_dir, 'replays', '*.replay')))
+
+	query = ReplayQuery(args['algo'], args['opponent']).turns(*args['turns'])
+	try:
+		for predicate in args['stat']:
+			query.stats(predicate)
+		for kind, *conditions in args['event']:
+			query.event(event_kind(kind), all_conditions(conditions))
+		for count in args['count']:
+			if len(count) < 2 or not count[0].isdigit():
+				raise argparse.ArgumentTypeError('-c takes a count and an event kind, like 10 spawn, not {}'.format(' '.join(count)))
+			query.per_turn(event_kind(count[1]), int(count[0]), all_conditions(count[2:]))
+	except argparse.ArgumentTypeError as e:
+		print ('ERROR: {}'.format(e))
+		sys.exit(1)
+
+	found = 0
+	for ref in query.run(f_names):
+		print ('{}  turn {} frame {}\t-> watch_replay.py -f {} -at {} {}'.format(
+			os.path.basename(ref.replay), ref.turn, ref.frame, ref.replay, ref.turn, ref.frame))
+		found += 1
+		if args['limit'] is not None and found >= args['limit']:
+			break
+
+	counts = query.counts
+	print ('\n{} matches in {} of {} replays, decoded {} of the {} frames that passed the index'.format(
+		found, counts['searched'], counts['replays'], counts['decoded'], counts['frames']))
+
+
+if __name__ == '__main__':
+	main(parse_args())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+A persistent Glicko rating ladder for algos, updated after every arena match. Used by run_arena.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Every algo has a rating (starting at 1500) and a rating deviation RD (starting at 350) that
+says how unsure the rating still is. After every match both algos are updated with the
+Glicko formulas, so ratings are always up to date and never need the match history again.
+A new algo simply starts with the default rating. When the contents of an algo folder
+change, its RD is raised back to CHANGED_RD so it can move quickly to its new strength.
+
+Each match is only counted once. Matches are identified by the same key the arena cache
+uses, so re-running an arena with cached results does not count them twice.
+
+Ratings are stored in ratings.json in the root of the starter kit. To see the ladder:
+>py scripts/contributions/ratings.py
+
+The most informative pairings to play next are the ones whose result is the least certain
+(an expected score close to 0.5) between algos whose ratings are the least certain (high RD).
+run_arena.py --ladder uses them to spend a game budget where it helps the ranking most.
+'''
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import itertools
+
+RATINGS_FILE = 'ratings.json'
+DEFAULT_RATING = 1500.0
+DEFAULT_RD = 350.0
+CHANGED_RD = 150.0
+MIN_RD = 30.0					# keeps ratings moving a little, algos that time out or crash can change
+
+Q = math.log(10) / 400
+
+
+# reduces the weight of a result against an opponent whose rating is uncertain
+def g(rd):
+	return 1 / math.sqrt(1 + 3 * Q ** 2 * rd ** 2 / math.pi ** 2)
+
+# expected score of a player against an opponent
+def expected_score(rating, opponent_rating, opponent_rd):
+	return 1 / (1 + 10 ** (-g(opponent_rd) * (rating - opponent_rating) / 400))
+
+
+class Ratings:
+	def __init__(self, f_name=None):
+		self.fname = f_name
+		self.players = {}		# name -> {'rating', 'rd', 'games', 'hash'}
+		self.rated = set()		# keys of the matches already counted
+		if f_name is not None and os.path.isfile(f_name):
+			with open(f_name) as f:
+				data = json.load(f)
+			self.players = data.get('players', {})
+			self.rated = set(data.get('rated', []))
+
+	# returns the entry of an algo, adding it if it is new and widening its RD if it changed
+	def player(self, name, algo_hash=None):
+		entry = self.players.get(name)
+		if entry is None:
+			entry = self.players[name] = {'rating': DEFAULT_RATING, 'rd': DEFAULT_RD, 'games': 0, 'hash': algo_hash}
+		elif algo_hash is not None and entry['hash'] != algo_hash:
+			entry['hash'] = algo_hash
+			entry['rd'] = max(entry['rd'], CHANGED_RD)
+		return entry
+
+	# updates both algos after a match. score is player 1's: 1 win, 0.5 tie, 0 loss.
+	# returns False if the match with this key was already counted
+	def update(self, name1, name2, score, key=None, hash1=None, hash2=None):
+		if key is not None:
+			if key in self.rated:
+				return False
+			self.rated.add(key)
+		p1 = self.player(name1, hash1)
+		p2 = self.player(name2, hash2)
+		new1 = self.__glicko(p1, p2, score)
+		new2 = self.__glicko(p2, p1, 1 - score)
+		p1['rating'], p1['rd'] = new1
+		p2['rating'], p2['rd'] = new2
+		p1['games'] += 1
+		p2['games'] += 1
+		return True
+
+	def __glicko(self, player, opponent, score):
+		g_rd = g(opponent['rd'])
+		e = expected_score(player['rating'], opponent['rating'], opponent['rd'])
+		e = min(max(e, 1e-6), 1 - 1e-6)
+		d_squared = 1 / (Q ** 2 * g_rd ** 2 * e * (1 - e))
+		denominator = 1 / player['rd'] ** 2 + 1 / d_squared
+		rating = player['rating'] + Q / denominator * g_rd * (score - e)
+		rd = max(MIN_RD, math.sqrt(1 / denominator))
+		return rating, rd
+
+	# how much a game between two algos is expected to teach us about the ranking
+	def information(self, name1, name2):
+		p1 = self.player(name1)
+		p2 = self.player(name2)
+		e = expected_score(p1['rating'], p2['rating'], math.hypot(p1['rd'], p2['rd']))
+		return e * (1 - e) * (p1['rd'] ** 2 + p2['rd'] ** 2)
+
+	# picks up to count different pairings of names, most informative first, with random sides
+	def informative_pairs(self, names, count):
+		pairs = sorted(itertools.combinations(names, 2), key=lambda pair: -self.information(*pair))[:count]
+		return [pair if random.random() < 0.5 else (pair[1], pair[0]) for pair in pairs]
+
+	# returns the algos sorted by the lower end of their rating, so uncertain ratings rank lower
+	def ladder(self):
+		return sorted(self.players.items(), key=lambda item: -(item[1]['rating'] - 2 * item[1]['rd']))
+
+	def print_ladder(self):
+		print ('{: <6}{: <40}{: >8}{: >8}{: >8}'.format('Rank', 'Algo', 'Rating', 'RD', 'Games'))
+		for rank, (name, entry) in enumerate(self.ladder(), 1):
+			print ('{: <6}{: <40}{: >8.0f}{: >8.0f}{: >8}'.format(rank, name, entry['rating'], entry['rd'], entry['games']))
+
+	# writes to a temporary file first so an interrupted run never leaves the ratings half written
+	def save(self):
+		tmp = self.fname + '.tmp'
+		with open(tmp, 'w') as f:
+			json.dump({'players': self.players, 'rated': sorted(self.rated)}, f, indent=1, sort_keys=True)
+		os.replace(tmp, self.fname)
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-r", "--ratings",
+		default=None,
+		help="ratings file, defaults to ratings.json in the root of the starter kit\n\n")
+	return vars(ap.parse_args())
+
+if __name__ == '__main__':
+	args = parse_args()
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	f_name = args['ratings'] if args['ratings'] else os.path.join(parent_dir, RATINGS_FILE)
+	if not os.path.isfile(f_name):
+		print ('No ratings found in {}, run some matches with run_arena.py first'.format(f_name))
+		sys.exit()
+	Ratings(f_name).print_ladder()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Streams the frames of a replay file and reads single frames on demand. Used by get_results.py and watch_replay.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+A replay is one JSON line with the game config followed by one line per frame. Decoding every
+line up front and keeping all frames in memory is slow and takes a lot of memory for long
+games, so the ReplayReader only decodes what it is asked for:
+
+	reader = ReplayReader('replays/some.replay')
+	for frame in reader.frames():		# decoded one line at a time, never all at once
+		print(frame['turnInfo'], frame['p1Stats'][0])
+
+	reader[(3, -1)]						# the deploy frame of turn 3, read from disk when asked for
+	reader.end_frame()					# the last frame, with the endStats, read from the end of the file
+	reader.line((3, -1))				# the same frame as undecoded bytes
+
+Frames are keyed by (turn, frame) from their turnInfo, like the dicts get_results.py and
+watch_replay.py used to build. The reader is a read only mapping of those keys, so len, in and
+iterating over the keys work as they did on the dict. It only keeps where each frame is in the
+file and the last CACHE_FRAMES frames it read, since visualizers read the same frame several
+times in a row.
+
+----------------------------------------------------------------------------------------
+Index files
+
+Where each frame is, is kept in an index: the offset and length of the line of every frame, and
+its headline stats (the phase and the pNStats of both players), in file order. The index is
+saved next to the replay as REPLAY.idx (some.replay.idx) and used as long as the replay has the
+size and modification time it had when the index was built, so after the first time a frame is
+opened with one small read and decode.
+
+When there is no up to date index file, it is built by whatever reads the file first: a full
+pass of frames() records it while it decodes the frames, and random access without such a pass
+builds it by only looking for the turnInfo and pNStats of each line, without decoding the
+frames. The index file is only written for finished replays (the last frame has endStats) and
+is not written at all if the folder can not be written to.
+
+For a replay the engine is still writing, follow() indexes only the frames appended since it
+was last called, with the file kept open in between, so watching a game live does not read the
+whole file again every time a frame is added.
+
+headlines() returns the headline stats of every frame and summary() builds the frames per turn,
+the health of both players and the end stats from them, so neither has to decode a frame once
+the index exists.
+'''
+
+import os
+import re
+import json
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# frames kept in memory after they are read, the most recently read ones
+CACHE_FRAMES = 16
+
+INDEX_EXTENSION = '.idx'
+INDEX_VERSION = 1
+
+TURN_INFO = re.compile(rb'"turnInfo"\s*:\s*\[\s*(-?\d+)\s*,\s*(-?\d+)\s*,\s*(-?\d+)\s*\]')
+STATS = {
+	1: re.compile(rb'"p1Stats"\s*:\s*(\[[^\]]*\])'),
+	2: re.compile(rb'"p2Stats"\s*:\s*(\[[^\]]*\])'),
+	}
+END_STATS = b'"endStats"'
+
+
+# returns the file the index of a replay is saved in
+def index_file(f_name):
+	return f_name + INDEX_EXTENSION
+
+# returns what the index of a replay has to match to still be up to date with it
+def file_version(f_name):
+	stat = os.stat(f_name)
+	return {'version': INDEX_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+# yields the offset and bytes of every complete line of a replay, a frame the engine is still writing is left out
+def read_lines(f_name):
+	offset = 0
+	with open(f_name, 'rb') as f:
+		for line in f:
+			if not line.endswith(b'\n') and not line.rstrip().endswith(b'}'):
+				break
+			yield offset, line
+			offset += len(line)
+
+# returns [turn, frame, offset, length, phase, p1Stats, p2Stats] of a line of a replay by only looking for its turnInfo and pNStats,
+# or None if it is not a frame or misses the stats of a player
+def index_entry(offset, line):
+	match = TURN_INFO.search(line)
+	if match is None:
+		return None
+	stats = [STATS[player].search(line) for player in (1, 2)]
+	if None in stats:
+		return None
+	phase, turn, frame = (int(group) for group in match.groups())
+	return [turn, frame, offset, len(line), phase] + [json.loads(stat.group(1)) for stat in stats]
+
+# returns (SP, MP, upgrade SP, upgrade MP) costs of every unit type in the config line of a replay, by unit type index
+def unit_costs(config):
+	costs = []
+	for unit in config['unitInformation']:
+		upgrade = unit.get('upgrade', {})
+		costs.append((unit.get('cost1', 0.0), unit.get('cost2', 0.0), upgrade.get('cost1', 0.0), upgrade.get('cost2', 0.0)))
+	return costs
+
+# returns the index of the unit type with the given shorthand in the config line of a replay, or default if it has none
+def unit_index(config, shorthand, default=None):
+	for i, unit in enumerate(config['unitInformation']):
+		if unit.get('shorthand') == shorthand:
+			return i
+	return default
+
+
+# Adds up what both players spend, get refunded and have on the board, one frame at a time, with the costs of the replay's own config
+class SpendAccounting:
+	def __init__(self, config):
+		units = config['unitInformation']
+		self.costs = unit_costs(config)
+		self.structures = [i for i, unit in enumerate(units) if unit.get('unitCategory') == 0]
+		self.remove = unit_index(config, 'RM', 6)
+		self.upgrade = unit_index(config, 'UP', 7)
+		# (base, upgraded) start health and refund percentage of every unit type
+		self.health = [(unit.get('startHealth', 0), unit.get('upgrade', {}).get('startHealth', unit.get('startHealth', 0))) for unit in units]
+		self.refund = [(unit.get('refundPercentage', 0), unit.get('upgrade', {}).get('refundPercentage', unit.get('refundPercentage', 0))) for unit in units]
+		self.previous = {1: {}, 2: {}}		# unit id -> (type, health, upgraded) of every structure in the last frame, by player
+
+	# returns {player: {'sp_spent', 'mp_spent', 'refund', 'board_value'}} for a frame, frames have to be given in order
+	def frame(self, data):
+		events = data['events']
+		units = {1: data['p1Units'], 2: data['p2Units']}
+		structures = {}
+
+		# every spawn event is read once and counted by player and type, the costs are applied to the counts
+		spawned = {1: {}, 2: {}}
+		upgraded = {1: {}, 2: {}}
+		for spawn in events['spawn']:
+			(x, y), unit_type, player = spawn[0], spawn[1], spawn[3]
+			if unit_type == self.upgrade:
+				if player not in structures:
+					structures[player] = {(unit[0], unit[1]): t for t in self.structures if t < len(units[player]) for unit in units[player][t]}
+				target = structures[player].get((x, y))
+				if target is not None:
+					upgraded[player][target] = upgraded[player].get(target, 0) + 1
+			elif unit_type != self.remove and unit_type < len(self.costs):
+				spawned[player][unit_type] = spawned[player].get(unit_type, 0) + 1
+
+		result = {}
+		for player in (1, 2):
+			sp = sum(count * self.costs[t][0] for t, count in spawned[player].items()) + sum(count * self.costs[t][2] for t, count in upgraded[player].items())
+			mp = sum(count * self.costs[t][1] for t, count in spawned[player].items()) + sum(count * self.costs[t][3] for t, count in upgraded[player].items())
+			result[player] = {'sp_spent': sp, 'mp_spent': mp, 'refund': 0.0, 'board_value': 0.0}
+
+		# removed structures give back a part of what they cost, less the more damaged they were
+		for death in events['death']:
+			unit_id, player, removed = death[2], death[3], death[4]
+			if not removed or unit_id not in self.previous[player]:
+				continue
+			unit_type, health, is_upgraded = self.previous[player][unit_id]
+			cost = self.costs[unit_type][0] + (self.costs[unit_type][2] if is_upgraded else 0)
+			max_health = self.health[unit_type][is_upgraded]
+			if max_health > 0:
+				result[player]['refund'] += cost * self.refund[unit_type][is_upgraded] * max(0, health) / max_health
+
+		for player in (1, 2):
+			player_units = units[player]
+			upgrades = set((unit[0], unit[1]) for unit in player_units[self.upgrade]) if self.upgrade is not None and self.upgrade < len(player_units) else set()
+			value = 0.0
+			previous = {}
+			for t in self.structures:
+				if t >= len(player_units):
+					continue
+				value += len(player_units[t]) * self.costs[t][0]
+				for unit in player_units[t]:
+					is_upgraded = 1 if (unit[0], unit[1]) in upgrades else 0
+					value += self.costs[t][2] * is_upgraded
+					previous[unit[3]] = (t, unit[2], is_upgraded)
+			result[player]['board_value'] = value
+			self.previous[player] = previous
+		return result
+
+
+# Reads the frames of a single replay file without keeping them all in memory
+class ReplayReader(Mapping):
+	def __init__(self, f_name, cache_frames=CACHE_FRAMES, save_index=True):
+		self.fname = f_name
+		self.cache_frames = cache_frames
+		self.save_index = save_index		# whether a built index is saved next to the replay
+		self.__config = None
+		self.__entries = None				# [turn, frame, offset, length, phase, p1Stats, p2Stats] of every frame, once indexed
+		self.__offsets = None				# (turn, frame) keys to the offset and length of their line
+		self.__cache = OrderedDict()
+		self.__file = None					# kept open by follow() between calls
+		self.finished = False				# whether the last frame indexed has the endStats
+
+	def __getitem__(self, key):
+		key = tuple(key)
+		if key in self.__cache:
+			self.__cache.move_to_end(key)
+			return self.__cache[key]
+
+		data = json.loads(self.line(key))
+
+		self.__cache[key] = data
+		if len(self.__cache) > self.cache_frames:
+			self.__cache.popitem(last=False)
+		return data
+
+	def __iter__(self):
+		return iter(self.offsets())
+
+	def __len__(self):
+		return len(self.offsets())
+
+	def __contains__(self, key):
+		return tuple(key) in self.offsets()
+
+	def __repr__(self):
+		return 'ReplayReader({!r})'.format(self.fname)
+
+	# returns the undecoded line of a frame, to look at it without paying for a full decode
+	def line(self, key):
+		offset, length = self.offsets()[tuple(key)]
+		with open(self.fname, 'rb') as f:
+			f.seek(offset)
+			return f.read(length)
+
+	# the first line of the replay, with the game config
+	@property
+	def config(self):
+		if self.__config is None:
+			for _, line in read_lines(self.fname):
+				if line.strip():
+					self.__config = json.loads(line)
+					break
+		return self.__config
+
+	# yields every frame of the replay in file order, decoding one line at a time
+	def frames(self):
+		entries = []
+		finished = False
+		for offset, line in read_lines(self.fname):
+			if not line.strip():
+				continue
+
+			data = json.loads(line)
+			if 'turnInfo' not in data:
+				self.__config = data
+				continue
+
+			phase, turn, frame = data['turnInfo'][:3]
+			entries.append([turn, frame, offset, len(line), phase, data['p1Stats'], data['p2Stats']])
+			finished = 'endStats' in data
+			yield data
+
+		# only a pass that reached the end of the file knows where every frame is
+		if self.__entries is None:
+			self.__set_index(entries, finished)
+
+	# returns the (turn, frame) keys with the offset and length of their lines, indexing the file if needed
+	def offsets(self):
+		if self.__offsets is None:
+			self.index()
+		return self.__offsets
+
+	# returns [turn, frame, phase, p1Stats, p2Stats] of every frame in file order
+	def headlines(self):
+		if self.__entries is None:
+			self.index()
+		return [[turn, frame, phase, p1_stats, p2_stats] for turn, frame, _, _, phase, p1_stats, p2_stats in self.__entries]
+
+	# loads the index file of the replay if it is up to date, otherwise finds every frame without decoding them
+	def index(self):
+		if self.load_index():
+			return
+
+		entries = []
+		finished = False
+		for offset, line in read_lines(self.fname):
+			entry = index_entry(offset, line)
+			if entry is None:
+				continue
+			entries.append(entry)
+			finished = END_STATS in line
+		self.__set_index(entries, finished)
+
+	# indexes the frames the engine appended since the index was built or the last call, without reading the rest of the file again,
+	# and returns their [turn, frame, phase, p1Stats, p2Stats]. The file is kept open between calls, see close()
+	def follow(self):
+		if self.__entries is None:
+			self.index()
+			return [[turn, frame, phase, p1_stats, p2_stats] for turn, frame, _, _, phase, p1_stats, p2_stats in self.__entries]
+		if self.finished:
+			return []
+
+		start = self.__entries[-1][2] + self.__entries[-1][3] if self.__entries else 0
+		if self.__file is None:
+			self.__file = open(self.fname, 'rb')
+		self.__file.seek(start)
+		data = self.__file.read()
+		end = data.rfind(b'\n') + 1
+		lines = data[:end].splitlines(keepends=True)
+
+		# what follows the last newline is a frame the engine is still writing, unless it is a whole frame at the end of the file
+		rest = data[end:]
+		if rest.strip():
+			try:
+				json.loads(rest)
+				lines.append(rest)
+			except ValueError:
+				pass
+
+		new = []
+		offset = start
+		for line in lines:
+			entry = index_entry(offset, line)
+			offset += len(line)
+			if entry is None:
+				continue
+			self.__entries.append(entry)
+			self.__offsets[(entry[0], entry[1])] = (entry[2], entry[3])
+			new.append([entry[0], entry[1], entry[4], entry[5], entry[6]])
+			if END_STATS in line:
+				self.finished = True
+				if self.save_index:
+					self.write_index()
+		return new
+
+	def close(self):
+		if self.__file is not None:
+			self.__file.close()
+			self.__file = None
+
+	# uses the saved index of the replay, returns False if there is none or the replay changed since it was saved
+	def load_index(self):
+		try:
+			with open(index_file(self.fname)) as f:
+				saved = json.load(f)
+			if saved['file'] != file_version(self.fname):
+				return False
+			self.__set_index(saved['frames'], False)
+			self.finished = True			# only finished replays have their index saved
+			return True
+		except (OSError, ValueError, KeyError, TypeError):
+			return False
+
+	# writes the index next to the replay, replacing an older one
+	def write_index(self):
+		f_name = index_file(self.fname)
+		try:
+			with open(f_name + '.tmp', 'w') as f:
+				json.dump({'file': file_version(self.fname), 'frames': self.__entries}, f)
+			os.replace(f_name + '.tmp', f_name)
+		except OSError:
+			pass
+
+	def __set_index(self, entries, finished):
+		self.__entries = entries
+		self.finished = finished
+		self.__offsets = {(turn, frame): (offset, length) for turn, frame, offset, length, _, _, _ in entries}
+		if finished and self.save_index:
+			self.write_index()
+
+	# returns the last frame of the replay by reading backwards from the end of the file, None if it has no frames
+	def end_frame(self):
+		with open(self.fname, 'rb') as f:
+			end = f.seek(0, os.SEEK_END)
+			size = 1 << 16
+			while True:
+				start = max(0, end - size)
+				f.seek(start)
+				lines = f.read(end - start).split(b'\n')
+				# a frame the engine is still writing is left out
+				if not lines[-1].rstrip().endswith(b'}'):
+					lines.pop()
+				lines = [line for line in lines if line.strip()]
+				# the first line read may start in the middle of a frame, unless it starts the file
+				if len(lines) > 1 or (start == 0 and lines):
+					data = json.loads(lines[-1])
+					return data if 'turnInfo' in data else None
+				if start == 0:
+					return None
+				size *= 2
+
+	# returns the number of frames of every turn, the health of both players in every frame and the end stats
+	def summary(self):
+		frames_in_turn = {}
+		healths = ([], [])
+
+		for turn, frame, phase, p1_stats, p2_stats in self.headlines():
+			frames_in_turn[turn] = frames_in_turn.get(turn, 0) + 1
+			healths[0].append(p1_stats[0])
+			healths[1].append(p2_stats[0])
+
+		end = self.end_frame()
+		return {
+			'frames_in_turn':	frames_in_turn,
+			'healths':			healths,
+			'end_stats':		end.get('endStats') if end else None,
+			}
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Converts a folder of replays into a compact columnar store and answers get_results.py style questions from it in milliseconds.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+get_results.py decodes every frame of every replay each time it runs. This script reads the
+replays once and keeps what the summaries need as typed columns, one binary file per column:
+
+>py scripts/contributions/replay_store.py
+
+adds every replay in the replays folder that is not in the store yet to replay_store/ (-o for
+another folder, -f for specific replay files) and prints the wins of every algo. Replays already
+in the store are not read again, so running it after every arena run only reads the new games.
+A replay that changed since it was read is read again and its new game replaces the old one.
+
+>py scripts/contributions/replay_store.py -avg health cores_on_board bits_spent
+
+prints the averages get_results.py -avg prints, over every game in the store. The metrics are
+the ones of get_results.py (health, cores, bits, cores_spent, bits_spent, cores_on_board) and the
+columns of the turns table below without their pN_ prefix (sp_spent, breaches, units_2, ...).
+Costs are taken from the config of each replay, the same way get_results.py does.
+
+----------------------------------------------------------------------------------------
+Tables
+
+	frames		one row per frame: game, turn, frame, phase and for both players (p1_, p2_) health,
+				sp, mp, time, board_value (SP value of their structures, upgrades included) and
+				units_0 to units_5 (number of units of every type)
+	turns		one row per turn: game, turn and for both players the values of the last frame
+				of the turn, sp_spent and mp_spent (spawns and upgrades of the turn), spawned_0
+				to spawned_5, breaches (scored) and damage_taken
+	spawns		game, turn, frame, player, type, x, y of every spawn event
+	breaches	game, turn, frame, player (whose unit scored), damage, x, y of every breach
+	damage		game, turn, frame, player (whose unit was hit), type, damage, x, y
+	deaths		game, turn, frame, player, type, x, y, removed (1 if its owner removed it)
+
+Each column is a file TABLE/COLUMN.bin of raw values with the typecode of the array module
+given in manifest.json, which also lists the games: their replay file, algos, winner, number of
+turns, unit costs and shorthands and the rows of the frames and turns tables that belong to them. A game
+replaced by a newer read of its replay is marked "superseded", its rows stay in the columns but
+games_of, wins and series skip it. The files can be used without this script as well, for example with numpy:
+
+	numpy.fromfile('replay_store/turns/p1_health.bin', dtype='d')
+
+From python:
+
+	from replay_store import ReplayStore
+	store = ReplayStore('replay_store')
+	store.average('algo-att-delay', 'health')
+	store.series('algo-att-delay', 'cores_spent')		# game -> value of every turn, like get_results.py plots
+	store.column('breaches', 'x')						# array of the x of every breach in the store
+'''
+
+import sys
+try:
+	import os
+	import glob
+	import json
+	import time
+	import argparse
+	from array import array
+	from itertools import accumulate
+	from replay_reader import ReplayReader, SpendAccounting
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+
+STORE_DIR = 'replay_store'
+MANIFEST_FILE = 'manifest.json'
+STORE_VERSION = 1
+
+# games read before the columns are written to disk
+FLUSH_GAMES = 50
+
+# unit types counted per player, the structures and mobile units of the current season
+UNIT_TYPES = 6
+PLAYERS = (1, 2)
+
+FRAME_STATS = ['health', 'sp', 'mp', 'time', 'board_value'] + ['units_{}'.format(t) for t in range(UNIT_TYPES)]
+TURN_STATS = ['health', 'sp', 'mp', 'board_value'] + ['units_{}'.format(t) for t in range(UNIT_TYPES)] + \
+	['sp_spent', 'mp_spent'] + ['spawned_{}'.format(t) for t in range(UNIT_TYPES)] + ['breaches', 'damage_taken']
+STAT_TYPES = {'health': 'd', 'sp': 'd', 'mp': 'd', 'time': 'd', 'board_value': 'd', 'sp_spent': 'd', 'mp_spent': 'd', 'damage_taken': 'd'}
+
+# table -> [(column, typecode)], counts are 'h' unless STAT_TYPES says otherwise
+TABLES = {
+	'frames':	[('game', 'i'), ('turn', 'h'), ('frame', 'i'), ('phase', 'b')] +
+				[('p{}_{}'.format(p, stat), STAT_TYPES.get(stat, 'h')) for p in PLAYERS for stat in FRAME_STATS],
+	'turns':	[('game', 'i'), ('turn', 'h')] +
+				[('p{}_{}'.format(p, stat), STAT_TYPES.get(stat, 'h')) for p in PLAYERS for stat in TURN_STATS],
+	'spawns':	[('game', 'i'), ('turn', 'h'), ('frame', 'i'), ('player', 'b'), ('type', 'b'), ('x', 'b'), ('y', 'b')],
+	'breaches':	[('game', 'i'), ('turn', 'h'), ('frame', 'i'), ('player', 'b'), ('damage', 'd'), ('x', 'b'), ('y', 'b')],
+	'damage':	[('game', 'i'), ('turn', 'h'), ('frame', 'i'), ('player', 'b'), ('type', 'b'), ('damage', 'd'), ('x', 'b'), ('y', 'b')],
+	'deaths':	[('game', 'i'), ('turn', 'h'), ('frame', 'i'), ('player', 'b'), ('type', 'b'), ('x', 'b'), ('y', 'b'), ('removed', 'b')],
+	}
+
+# get_results.py metrics and the turns columns they are read from, the spent ones are summed up over the turns
+METRICS = {
+	'health':			'health',
+	'cores':			'sp',
+	'bits':				'mp',
+	'cores_on_board':	'board_value',
+	'cores_spent':		'sp_spent',
+	'bits_spent':		'mp_spent',
+	}
+CUMULATIVE = {'cores_spent', 'bits_spent'}
+
+
+# returns what identifies a replay file as the one already in the store
+def fingerprint(f_name):
+	stat = os.stat(f_name)
+	return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+# reads a replay and returns its game entry and the rows of every table, as {table: {column: [values]}}
+def read_game(f_name, game_id):
+	reader = ReplayReader(f_name, save_index=False)
+	rows = {table: {column: [] for column, _ in columns} for table, columns in TABLES.items()}
+	accounting = None
+	end_stats = None
+	turn_row = None
+
+	for data in reader.frames():
+		if accounting is None:
+			accounting = SpendAccounting(reader.config)
+
+		phase, turn, frame = data['turnInfo'][:3]
+		events = data['events']
+		end_stats = data.get('endStats', end_stats)
+
+		frames = rows['frames']
+		for name, value in (('game', game_id), ('turn', turn), ('frame', frame), ('phase', phase)):
+			frames[name].append(value)
+		spending = accounting.frame(data)
+		stats = {}
+		for p in PLAYERS:
+			units = data['p{}Units'.format(p)]
+			health, sp, mp, spent_time = data['p{}Stats'.format(p)][:4]
+			stats[p] = {'health': health, 'sp': sp, 'mp': mp, 'time': spent_time, 'board_value': spending[p]['board_value']}
+			for unit_type in range(UNIT_TYPES):
+				stats[p]['units_{}'.format(unit_type)] = len(units[unit_type]) if unit_type < len(units) else 0
+			for stat in FRAME_STATS:
+				frames['p{}_{}'.format(p, stat)].append(stats[p][stat])
+
+		# a turn row holds the values of the last frame of its turn, and what happened during it
+		if turn_row is None or turn_row['turn'] != turn:
+			if turn_row is not None:
+				add_row(rows['turns'], turn_row)
+			turn_row = {'game': game_id, 'turn': turn}
+			for p in PLAYERS:
+				for stat in TURN_STATS:
+					turn_row['p{}_{}'.format(p, stat)] = 0
+		for p in PLAYERS:
+			for stat in FRAME_STATS:
+				if stat != 'time':
+					turn_row['p{}_{}'.format(p, stat)] = stats[p][stat]
+			turn_row['p{}_sp_spent'.format(p)] += spending[p]['sp_spent']
+			turn_row['p{}_mp_spent'.format(p)] += spending[p]['mp_spent']
+
+		for spawn in events['spawn']:
+			(x, y), unit_type, player = spawn[0], spawn[1], spawn[3]
+			add_row(rows['spawns'], {'game': game_id, 'turn': turn, 'frame': frame, 'player': player, 'type': unit_type, 'x': x, 'y': y})
+			if unit_type < UNIT_TYPES:
+				turn_row['p{}_spawned_{}'.format(player, unit_type)] += 1
+		for breach in events['breach']:
+			(x, y), damage, player = breach[0], breach[1], breach[4]
+			add_row(rows['breaches'], {'game': game_id, 'turn': turn, 'frame': frame, 'player': player, 'damage': damage, 'x': x, 'y': y})
+			turn_row['p{}_breaches'.format(player)] += 1
+		for hit in events['damage']:
+			(x, y), damage, unit_type, player = hit[0], hit[1], hit[2], hit[4]
+			add_row(rows['damage'], {'game': game_id, 'turn': turn, 'frame': frame, 'player': player, 'type': unit_type, 'damage': damage, 'x': x, 'y': y})
+			turn_row['p{}_damage_taken'.format(player)] += damage
+		for death in events['death']:
+			(x, y), unit_type, player, removed = death[0], death[1], death[3], death[4]
+			add_row(rows['deaths'], {'game': game_id, 'turn': turn, 'frame': frame, 'player': player, 'type': unit_type, 'x': x, 'y': y, 'removed': 1 if removed else 0})
+
+	if turn_row is not None:
+		add_row(rows['turns'], turn_row)
+	if end_stats is None:
+		return None, None
+
+	game = {
+		'file':			os.path.abspath(f_name),
+		'fingerprint':	fingerprint(f_name),
+		'p1':			end_stats['player1']['name'],
+		'p2':			end_stats['player2']['name'],
+		'winner':		end_stats.get('winner'),
+		'turns':		end_stats.get('turns'),
+		'costs':		accounting.costs,
+		'units':		[unit.get('shorthand') for unit in reader.config['unitInformation']],
+		}
+	return game, rows
+
+def add_row(table, row):
+	for name, value in row.items():
+		table[name].append(value)
+
+
+# The columnar store of a replay folder, see the README above
+class ReplayStore:
+	def __init__(self, path=STORE_DIR):
+		self.path = path
+		self.manifest = {'version': STORE_VERSION, 'byteorder': sys.byteorder, 'tables': TABLES, 'rows': {table: 0 for table in TABLES}, 'games': []}
+		if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+			with open(os.path.join(path, MANIFEST_FILE)) as f:
+				self.manifest = json.load(f)
+		self.games = self.manifest['games']
+		self.__columns = {}
+		self.__pending = []
+
+	# reads the replays that are not in the store yet, returns how many were added
+	def update(self, f_names, progress=True):
+		known = {game['file']: game['fingerprint'] for game in self.games}
+		todo = [f_name for f_name in f_names if known.get(os.path.abspath(f_name)) != fingerprint(f_name)]
+		added = 0
+		for i, f_name in enumerate(todo):
+			game, rows = read_game(f_name, len(self.games) + len(self.__pending))
+			if game is None:
+				continue				# a game that is still running or was cut off
+			self.__pending.append((game, rows))
+			added += 1
+			if len(self.__pending) >= FLUSH_GAMES:
+				self.flush()
+			if progress:
+				print ('\rRead {} of {} new replays'.format(i + 1, len(todo)), end='', flush=True)
+		self.flush()
+		if progress and len(todo) > 0:
+			print ()
+		return added
+
+	# appends the games read since the last flush to the column files, then writes the manifest
+	def flush(self):
+		if len(self.__pending) == 0:
+			return
+		for table, columns in self.manifest['tables'].items():
+			os.makedirs(os.path.join(self.path, table), exist_ok=True)
+			start = self.manifest['rows'][table]
+			for column, typecode in columns:
+				values = array(typecode)
+				for _, rows in self.__pending:
+					values.extend(rows[table][column])
+				with open(self.column_file(table, column), 'r+b' if os.path.exists(self.column_file(table, column)) else 'wb') as f:
+					# anything after the rows in the manifest is left over from an interrupted flush
+					f.truncate(start * values.itemsize)
+					f.seek(0, os.SEEK_END)
+					values.tofile(f)
+			for game, rows in self.__pending:
+				if table in ('frames', 'turns'):
+					game['{}_rows'.format(table)] = [start, start + len(rows[table]['game'])]
+				start += len(rows[table]['game'])
+			self.manifest['rows'][table] = start
+
+		# a replay that changed since it was read replaces its old game, the rows of which stay in the columns
+		latest = {game['file']: i for i, game in self.current_games()}
+		for game, _ in self.__pending:
+			if game['file'] in latest:
+				self.games[latest[game['file']]]['superseded'] = True
+			latest[game['file']] = len(self.games)
+			self.games.append(game)
+		self.__pending = []
+		self.__columns = {}
+		tmp = os.path.join(self.path, MANIFEST_FILE + '.tmp')
+		with open(tmp, 'w') as f:
+			json.dump(self.manifest, f)
+		os.replace(tmp, os.path.join(self.path, MANIFEST_FILE))
+
+	def column_file(self, table, column):
+		return os.path.join(self.path, table, column + '.bin')
+
+	# returns a column of a table as an array, read from disk the first time it is asked for
+	def column(self, table, column):
+		key = (table, column)
+		if key not in self.__columns:
+			typecode = dict(self.manifest['tables'][table])[column]
+			values = array(typecode)
+			rows = self.manifest['rows'][table]
+			if rows > 0:
+				with open(self.column_file(table, column), 'rb') as f:
+					values.fromfile(f, rows)
+				if self.manifest['byteorder'] != sys.byteorder:
+					values.byteswap()
+			self.__columns[key] = values
+		return self.__columns[key]
+
+	# returns [(game index, game)] of every game that was not replaced by a newer read of its replay
+	def current_games(self):
+		return [(i, game) for i, game in enumerate(self.games) if not game.get('superseded')]
+
+	# returns {game index: player number} of every game the algo played
+	def games_of(self, algo):
+		games = {}
+		for i, game in self.current_games():
+			if game['p1'] == algo:
+				games[i] = 1
+			elif game['p2'] == algo:
+				games[i] = 2
+		return games
+
+	# returns {game index: [value of every turn]} of a metric for an algo, the data get_results.py plots
+	def series(self, algo, metric):
+		series = {}
+		for i, player in self.games_of(algo).items():
+			start, stop = self.games[i]['turns_rows']
+			values = self.column('turns', 'p{}_{}'.format(player, METRICS.get(metric, metric)))[start:stop]
+			series[i] = list(accumulate(values)) if metric in CUMULATIVE else values.tolist()
+		return series
+
+	# returns the average of a metric over every turn of every game of an algo, None if it played none
+	def average(self, algo, metric):
+		total, count = 0.0, 0
+		for values in self.series(algo, metric).values():
+			total += sum(values)
+			count += len(values)
+		return total / count if count > 0 else None
+
+	# returns {algo name: number of games won}, every algo in the store included
+	def wins(self):
+		wins = {}
+		for _, game in self.current_games():
+			for p in PLAYERS:
+				name = game['p{}'.format(p)]
+				wins[name] = wins.get(name, 0) + (1 if game['winner'] == p else 0)
+		return wins
+
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-o", "--out",
+		default=None,
+		help="folder of the store, defaults to replay_store in the starter kit folder\n\n")
+	ap.add_argument(
+		"-f", "--file",
+		nargs="*",
+		default=[],
+		help="replay files to add, defaults to every replay in the replays folder\n\n")
+	ap.add_argument(
+		"-avg", "--averages",
+		nargs="*",
+		default=[],
+		help="metrics to print the average of for every algo\nValid Options:\n\t- health\n\t- bits\n\t- cores\n\t- cores_spent\n\t- bits_spent\n\t- cores_on_board\n\t- any column of the turns table without its pN_ prefix\n\n")
+	return vars(ap.parse_args())
+
+def main(args):
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	store = ReplayStore(args['out'] if args['out'] else os.path.join(parent_dir, STORE_DIR))
+	f_names = args['file'] if args['file'] else sorted(glob.glob(os.path.join(parent_dir, 'replays', '*.replay')))
+	added = store.update(f_names)
+	print ('{} new replays added, {} games in {}'.format(added, len(store.current_games()), store.path))
+
+	start = time.time()
+	wins = store.wins()
+	fill = max([len(name) for name in wins] + [0]) + 4
+	print ('\nWins by algo:')
+	for name in sorted(wins, key=lambda name: -wins[name]):
+		print ('|{: >{fill}} : {}'.format(name, wins[name], fill=fill))
+	for metric in args['averages']:
+		print ('\nAverage {}:'.format(metric))
+		for name in sorted(wins):
+			try:
+				average = store.average(name, metric)
+			except KeyError:
+				print ('Invalid metric \'{}\''.format(metric))
+				break
+			print ('|{: >{fill}} : {}'.format(name, '-' if average is None else round(average, 2), fill=fill))
+	print ('\nAnswered in {:.1f} ms'.format((time.time() - start) * 1000))
+
+
+if __name__ == '__main__':
+	main(parse_args())
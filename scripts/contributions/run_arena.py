@@ -49,16 +49,59 @@ algo3
 ...
 
 
-Lastly, the final argument you can (and should) in combination with each of these
-is -b, for batch_size. This controls how many games can run at one time to keep
-this from melting your computer. The default is 5.
+Lastly, you can combine each of these with -b, for batch_size. This controls how many games
+can run at one time. By default it is the number of CPU cores, lowered if there is not enough
+free memory to run that many games (see arena_scheduler.py). The other games wait in a queue
+and start as soon as a running game finishes.
 
 For example:
 >py scripts/contributions/run_arena.py -a -b 6
 
 This would run every single game like before, but 6 games at a time.
 
-DO NOT RUN WITH A LARGE BATCH SIZE (like >15, depending on your computer) or else it will take forever and crash.
+-t sets a timeout in seconds for a single game (default 600). Games that take longer are
+killed and reported, so one stuck algo can not hold up the whole arena.
+
+-e python plays the games with the python engine in engine.py instead of engine.jar. It needs
+no java and starts much faster, which adds up over many short games. It is not the official
+engine though, so confirm important results with the default -e java.
+
+--fork-server starts the fork server of every python algo in the arena first (see
+gamelib/forkserver.py in the algo, Linux and macOS only). Every game then starts its algos
+from an already imported copy instead of importing gamelib and the strategy again, and the
+servers are stopped when the arena is done.
+
+Outcomes are cached in arena_cache.json by the contents of both algo folders, the engine
+config and the seed (see arena_cache.py). Running the arena again only plays the pairings
+of algos that changed. Use -c to pick another cache file and --no-cache to play everything.
+--seed passes a seed to both algos in the ALGO_SEED environment variable. gamelib's AlgoCore
+seeds random with it, so the same algos and seed play the same game again (the python engine
+also writes it to the replay).
+
+The output of every match, with everything the algos print to stderr, is written to its own
+log file in arena_logs instead of being kept in memory. For every played match the turn times
+of both algos (p50, p95 and max), their peak memory and CPU time and their slow and timed out
+turns are appended to arena_metrics.jsonl, and a summary per algo is printed at the end, so an
+algo that got slower shows up next to the one that got weaker (see telemetry.py). --log-dir and
+--metrics pick other places and --no-telemetry turns it off.
+
+After every match both algos are rated (Glicko, see ratings.py) in ratings.json, and the
+ladder is printed at the end. Use -r to pick another ratings file. To rank many algos with a
+limited number of games, give them with -a, -s or -f and add --ladder GAMES:
+>py scripts/contributions/run_arena.py -a --ladder 100
+
+Instead of every combination, this plays 100 games in rounds, each round picking the pairings
+whose results the ratings are least sure about.
+
+To decide if a new version of an algo beats an old one, use the compare mode:
+>py scripts/contributions/run_arena.py --compare algo-def-responsive algo-def-mp-check
+
+It plays the two against each other on random seeds, every seed once from each side, and runs
+a sequential probability ratio test after every result (see sprt.py). As soon as it is sure
+enough either way it stops the remaining games and prints the decision with 95% confidence
+bounds on the score and Elo difference. --elo0/--elo1 set the hypotheses (default 0 and 50
+Elo), --alpha/--beta the error rates (default 0.05) and --max-games the game limit (400).
+The same --seed plays the same games again, so a repeated comparison reuses the cache.
 
 
 At the end I also run the get_results.py script that outputs some data. I recommend having
@@ -73,40 +116,38 @@ If you have questions just ask me on the forums - @Isaac
 import sys
 try:
 	import os
-	import subprocess
+	import glob
+	import shutil
+	import tempfile
 	import argparse
+	import atexit
 	import itertools
-	import time
-	import copy
-	import multiprocessing as mp
+	from arena_scheduler import ArenaScheduler, default_workers, start_fork_servers, stop_fork_servers
+	import random
+	from arena_cache import ArenaCache, CACHE_FILE, ENGINE_FILES, PYTHON_ENGINE_FILES, hash_directory, hash_engine, find_replay, read_outcome
+	from sprt import SPRT, ACCEPT_H0, ACCEPT_H1, CONTINUE, score_to_elo
+	from ratings import Ratings, RATINGS_FILE
+	from telemetry import Telemetry
 except ImportError as e:
 	print("WARNING: Module not found, full error:\n")
 	print(str(e))
 	sys.exit()
 
 
-# Runs a single game
-def run_single_game(process_command, algo1, algo2, max_name_len):
-	p = subprocess.Popen(
-		process_command,
-		shell=True,
-		stdout=subprocess.PIPE,
-		stderr=subprocess.PIPE
-		)
-	output, error = p.communicate()
-	# daemon necessary so game shuts down if this script is shut down by user
-	p.daemon = 1
-	p.wait()
-	print("{: <30}{: <{fill}}   vs   {}".format('Finished running match:', algo1, algo2, fill=str(max_name_len)))
-
-	# print (''.join(['{}\n'.format(x) for x in str(output).split('\\r\\n')])[1:])
-	if str(error) != "b''":
-		print ('Error with match - {} {}:\n\tError:\n{}'.format(algo1, algo2, error))
-
-def run_match(arg1='', arg2='', max_name_len=0):
-	# Get location of this run file
-	file_dir = os.path.dirname(os.path.realpath(__file__)).replace('\\contributions', '')
-	parent_dir = os.path.join(file_dir, os.pardir)
+# environment variable the seed of a match is passed to the algos in
+SEED_ENV = 'ALGO_SEED'
+
+# engines that can play the matches, see engine.py for the python one
+JAVA_ENGINE = 'java'
+PYTHON_ENGINE = 'python'
+
+
+# returns the shell command that plays a single game, and the directory to run it from
+# with a game_dir the game is played from that folder and writes its replay to game_dir/replays
+def match_command(arg1='', arg2='', engine=JAVA_ENGINE, game_dir=None):
+	# Get location of this run file, the starter kit is two folders up
+	file_dir = os.path.dirname(os.path.realpath(__file__))
+	parent_dir = os.path.join(file_dir, os.pardir, os.pardir)
 	parent_dir = os.path.abspath(parent_dir)
 
 	# Get if running in windows OS
@@ -140,7 +181,35 @@ def run_match(arg1='', arg2='', max_name_len=0):
 			trailing_char = "" if algo2.endswith('/') else "/"
 			algo2 = algo2 + trailing_char + "run.sh"
 
-	run_single_game("cd {} && java -jar engine.jar work {} {}".format(parent_dir, algo1, algo2), algo1.split('\\')[-2].replace('algos/',''),  algo2.split('\\')[-2].replace('algos/',''), max_name_len)
+	if game_dir is not None:
+		algo1 = os.path.join(parent_dir, algo1)
+		algo2 = os.path.join(parent_dir, algo2)
+		if engine == PYTHON_ENGINE:
+			return '"{}" "{}" work "{}" "{}" -c "{}" -o "{}"'.format(sys.executable, os.path.join(file_dir, 'engine.py'), algo1, algo2,
+				os.path.join(parent_dir, 'game-configs.json'), os.path.join(game_dir, 'replays')), parent_dir
+		# the java engine reads game-configs.json from and writes its replay to the folder it runs in
+		shutil.copy(os.path.join(parent_dir, 'game-configs.json'), game_dir)
+		return 'java -jar "{}" work "{}" "{}"'.format(os.path.join(parent_dir, 'engine.jar'), algo1, algo2), parent_dir
+
+	if engine == PYTHON_ENGINE:
+		return '"{}" "{}" work {} {}'.format(sys.executable, os.path.join(file_dir, 'engine.py'), algo1, algo2), parent_dir
+	return "java -jar engine.jar work {} {}".format(algo1, algo2), parent_dir
+
+# Runs a single game
+def run_match(arg1='', arg2='', max_name_len=0, engine=JAVA_ENGINE):
+	command, parent_dir = match_command(arg1, arg2, engine)
+	result = ArenaScheduler(workers=1).run_command((arg1, arg2), command, parent_dir)
+	print_result(result, max_name_len)
+
+# prints how a game went as soon as it finishes
+def print_result(result, max_name_len):
+	algo1, algo2 = result['name'][:2]
+	if result['timed_out']:
+		print ('{: <30}{: <{fill}}   vs   {}   after {:.0f}s'.format('Timed out match:', algo1, algo2, result['elapsed'], fill=str(max_name_len)))
+	else:
+		print ('{: <30}{: <{fill}}   vs   {}   in {:.0f}s'.format('Finished running match:', algo1, algo2, result['elapsed'], fill=str(max_name_len)))
+	if result['error'] != '':
+		print ('Error with match - {} {}:\n\tError:\n{}'.format(algo1, algo2, result['error']))
 
 # handles all the arguments
 def parse_args():
@@ -162,14 +231,94 @@ def parse_args():
 	ap.add_argument(
 		"-b", "--batch",
 		type=int,
-		default=5,
-		help="number of games to run at a single time (on seperate threads)\n\n")
+		default=None,
+		help="number of games to run at a single time, defaults to what your cores and memory allow\n\n")
+	ap.add_argument(
+		"-t", "--timeout",
+		type=float,
+		default=600,
+		help="seconds a single game may take before it is killed\n\n")
+	ap.add_argument(
+		"-e", "--engine",
+		choices=[JAVA_ENGINE, PYTHON_ENGINE],
+		default=JAVA_ENGINE,
+		help="engine that plays the matches: engine.jar, or the python engine in engine.py\n\n")
+	ap.add_argument(
+		"--fork-server",
+		action='store_true',
+		help="start the algos of every game from a fork server that has them imported already\n\n")
+	ap.add_argument(
+		"-c", "--cache",
+		default=None,
+		help="file match outcomes are cached in, defaults to arena_cache.json in the root of the starter kit\n\n")
+	ap.add_argument(
+		"--no-cache",
+		action='store_true',
+		help="play every match again and do not cache outcomes\n\n")
+	ap.add_argument(
+		"--seed",
+		type=int,
+		default=None,
+		help="seed passed to the algos in the {} environment variable, part of the cache key\n\n".format(SEED_ENV))
+	ap.add_argument(
+		"--log-dir",
+		default=None,
+		help="folder the log of every match is written to, defaults to arena_logs in the root of the starter kit\n\n")
+	ap.add_argument(
+		"--metrics",
+		default=None,
+		help="file the metrics of every match are added to, defaults to arena_metrics.jsonl in the root of the starter kit\n\n")
+	ap.add_argument(
+		"--no-telemetry",
+		action='store_true',
+		help="keep no match logs and metrics\n\n")
+	ap.add_argument(
+		"-r", "--ratings",
+		default=None,
+		help="rating ladder file updated after every match, defaults to ratings.json in the root of the starter kit\n\n")
+	ap.add_argument(
+		"--ladder",
+		type=int,
+		default=None,
+		metavar='GAMES',
+		help="play GAMES games between the given algos, always picking the pairings that help the ratings most\n\n")
+	ap.add_argument(
+		"--compare",
+		nargs=2,
+		default=None,
+		metavar=('NEW', 'OLD'),
+		help="play NEW against OLD until a sequential test decides if NEW is stronger\n\n")
+	ap.add_argument(
+		"--elo0",
+		type=float,
+		default=0,
+		help="--compare: Elo difference of the null hypothesis (no improvement)\n\n")
+	ap.add_argument(
+		"--elo1",
+		type=float,
+		default=50,
+		help="--compare: Elo difference of the alternative hypothesis (improvement)\n\n")
+	ap.add_argument(
+		"--alpha",
+		type=float,
+		default=0.05,
+		help="--compare: chance of a false improvement\n\n")
+	ap.add_argument(
+		"--beta",
+		type=float,
+		default=0.05,
+		help="--compare: chance of missing a real improvement\n\n")
+	ap.add_argument(
+		"--max-games",
+		type=int,
+		default=400,
+		help="--compare: stop without a decision after this many games\n\n")
 	return vars(ap.parse_args())
 
 # called by the -a arg, runs every algo in directory
 def run_all():
-	algos_dir = os.path.dirname(os.path.realpath(__file__)).replace('scripts\\contributions', '')+'algos\\'
-	algos = os.listdir(algos_dir)
+	algos_dir = os.path.join(match_command()[1], 'algos')
+	algos = sorted(d for d in os.listdir(algos_dir) if os.path.isdir(os.path.join(algos_dir, d)))
 	matches = itertools.combinations(algos, 2)
 	return matches
 
@@ -188,46 +337,235 @@ def run_from_file(filePath):
 		print ('File {} was not found'.format(filePath))
 		sys.exit()
 
-# returns the number of processess that are active
-def get_num_running(processes):
-	c = 0
-	for i, proc in processes.items():
-		if proc.is_alive():
-			c += 1
-	return c
-
-# starts a subprocess for each match up to batch_size and then starts them as they finish
-def run_matches(matches, batch_size):
-	tmp = copy.deepcopy(matches)
-	max_name_len = len(max(tmp, key=lambda e:len(e[0]))[0])
-
-	algos = []
-	processes = {}
-	i = 0
+# starts a fork server for every algo that plays, they are stopped when the arena exits
+def use_fork_servers(algos):
+	algo_dirs = [os.path.join(match_command()[1], 'algos', algo) for algo in sorted(set(algos))]
+	servers = start_fork_servers(algo_dirs)
+	atexit.register(stop_fork_servers, servers)
+	print ('Started {} fork servers'.format(len(servers)))
+
+# returns the cache key of a match, hashing algo folders only the first time they are seen
+def match_key(hashes, parent_dir, algo1, algo2, seed, engine=JAVA_ENGINE):
+	if 'engine' not in hashes:
+		hashes['engine'] = hash_engine(parent_dir, PYTHON_ENGINE_FILES if engine == PYTHON_ENGINE else ENGINE_FILES)
+	for algo in (algo1, algo2):
+		if algo not in hashes:
+			hashes[algo] = hash_directory(os.path.join(parent_dir, 'algos', algo))
+	return ArenaCache.key(hashes[algo1], hashes[algo2], hashes['engine'], seed)
+
+# reads the outcome of a finished match from the replay in its own folder and caches it
+# the replays of the game are moved to the replays folder, next to the ones of single games
+def collect_outcome(result, parent_dir, cache=None, key=None):
+	game_replays = os.path.join(result['cwd'], 'replays')
+	# only this game wrote to its folder, so the players are enough to tell its replay from the flipped one of player 2
+	replay = find_replay(game_replays, result['name'][0], result['name'][1], result['start'])
+	replay_dir = os.path.join(parent_dir, 'replays')
+	for f_name in glob.glob(os.path.join(game_replays, '*.replay')):
+		os.replace(f_name, os.path.join(replay_dir, os.path.basename(f_name)))
+	shutil.rmtree(result['cwd'], ignore_errors=True)
+	if result['timed_out'] or result['returncode'] != 0 or replay is None:
+		return None
+	result['outcome'] = read_outcome(os.path.join(replay_dir, os.path.basename(replay)))
+	if cache is not None:
+		cache.put(key, result['outcome'])
+		cache.save()
+	return result['outcome']
+
+# counts an outcome in the ratings, every match key is only counted once
+def rate_outcome(ratings, hashes, name, outcome, key):
+	if ratings is None:
+		return
+	if ratings.update(name[0], name[1], score_for(name[0], name, outcome), key, hashes.get(name[0]), hashes.get(name[1])):
+		ratings.save()
+
+# returns the job that plays a match in a new folder of its own, with a log file if telemetry is on
+# games of the same algos run at the same time, so a shared replays folder could mix up their replays
+def match_job(name, parent_dir, env, engine=JAVA_ENGINE, telemetry=None):
+	replay_dir = os.path.join(parent_dir, 'replays')
+	os.makedirs(replay_dir, exist_ok=True)
+	game_dir = tempfile.mkdtemp(prefix='game-', dir=replay_dir)
+	command, _ = match_command('algos/{}'.format(name[0]), 'algos/{}'.format(name[1]), engine, game_dir)
+	return (name, command, game_dir, env, telemetry.log_file(name) if telemetry is not None else None)
+
+# removes the folders of the games that never ran or were stopped
+def remove_game_dirs(jobs):
+	for job in jobs:
+		shutil.rmtree(job[2], ignore_errors=True)
+
+# queues every match that is not cached yet and runs batch_size of them at a time, printing results as they finish
+def run_matches(matches, batch_size=None, timeout=None, cache_file=None, seed=None, ratings=None, engine=JAVA_ENGINE, telemetry=None):
+	matches = list(matches)
+	if len(matches) == 0:
+		print ('No matches to run')
+		return []
+	max_name_len = len(max(matches, key=lambda e:len(e[0]))[0])
+	env = {SEED_ENV: str(seed)} if seed is not None else None
+
+	cache = ArenaCache(cache_file) if cache_file else None
+	hashes = {}
+	keys = {}
+	results = []
+	jobs = []
+	parent_dir = match_command()[1]
 	for match in matches:
-		algos.append((match[0],match[1]))
-		algo1 = 'algos/{}'.format(match[0])
-		algo2 = 'algos/{}'.format(match[1])
-		processes[i] = mp.Process(target=run_match, args=(algo1, algo2, max_name_len))
-		i += 1
-
-	for i in range(len(processes)):
-		print ('{: <30}{: <{fill}}   vs   {}'.format('Starting match:', algos[i][0], algos[i][1], fill=str(max_name_len)))
-		processes[i].start()
-		i += 1
-		while get_num_running(processes) >= batch_size:
-			time.sleep(.1)
-
-	while get_num_running(processes) > 0:
-			time.sleep(.1)
+		name = (match[0], match[1])
+		if cache is not None or ratings is not None:
+			keys[name] = match_key(hashes, parent_dir, match[0], match[1], seed, engine)
+		if cache is not None:
+			outcome = cache.get(keys[name])
+			if outcome is not None:
+				print ('{: <30}{: <{fill}}   vs   {}'.format('Cached match:', match[0], match[1], fill=str(max_name_len)))
+				rate_outcome(ratings, hashes, name, outcome, keys[name])
+				results.append({'name': name, 'cached': True, 'timed_out': False, 'outcome': outcome})
+				continue
+		jobs.append(match_job(name, parent_dir, env, engine, telemetry))
+
+	scheduler = ArenaScheduler(workers=batch_size, timeout=timeout, sampler=telemetry.sampler if telemetry is not None else None)
+	print ('Running {} matches, {} at a time ({} cached)'.format(len(jobs), scheduler.workers, len(results)))
+	print ()
+
+	try:
+		for result in scheduler.run(jobs):
+			print_result(result, max_name_len)
+			outcome = collect_outcome(result, parent_dir, cache, keys.get(result['name']))
+			if outcome is not None:
+				rate_outcome(ratings, hashes, result['name'], outcome, keys.get(result['name']))
+			if telemetry is not None:
+				telemetry.record(result, outcome, seed, engine)
+			results.append(result)
+	finally:
+		remove_game_dirs(jobs)
 
 	print ()
 	print ('Finished all matches!')
+	timed_out = sum(1 for result in results if result['timed_out'])
+	if timed_out > 0:
+		print ('{} matches timed out'.format(timed_out))
+	print ()
+	return results
+
+# returns algo_a's score for a game: 1 for a win, 0.5 for a tie and 0 for a loss
+def score_for(algo_a, name, outcome):
+	if outcome['winner'] == 0:
+		return 0.5
+	return 1 if name[outcome['winner'] - 1] == algo_a else 0
+
+# prints the state of the sequential test after every game
+def print_sprt(test):
+	print ('{: <30}{} games   W-D-L {}-{}-{}   LLR {:.2f} [{:.2f}, {:.2f}]'.format(
+		'SPRT:', test.games(), test.wins, test.draws, test.losses, test.llr(), test.lower, test.upper))
+
+# plays algo_a against algo_b on random seeds and alternating sides until the SPRT reaches a decision
+def run_compare(algo_a, algo_b, batch_size=None, timeout=None, cache_file=None, seed=None, max_games=400,
+		elo0=0, elo1=50, alpha=0.05, beta=0.05, ratings=None, engine=JAVA_ENGINE, telemetry=None):
+	if seed is None:
+		seed = random.randrange(2 ** 31)
+	rng = random.Random(seed)			# the same --seed replays the same games, so they come from the cache
+	max_name_len = max(len(algo_a), len(algo_b))
+	test = SPRT(elo0, elo1, alpha, beta)
+	print ('Comparing {} against {}: H0 elo <= {}, H1 elo >= {}, alpha {}, beta {}, seed {}'.format(
+		algo_a, algo_b, elo0, elo1, alpha, beta, seed))
+	print ()
+
+	cache = ArenaCache(cache_file) if cache_file else None
+	hashes = {}
+	keys = {}
+	queued = []
+	parent_dir = match_command()[1]
+	for i in range(max_games):
+		# every seed is played from both sides, so luck of the seed cancels out of the comparison
+		if i % 2 == 0:
+			game_seed = rng.randrange(2 ** 31)
+		name = (algo_a, algo_b, game_seed) if i % 2 == 0 else (algo_b, algo_a, game_seed)
+		if cache is not None or ratings is not None:
+			keys[name] = match_key(hashes, parent_dir, name[0], name[1], game_seed, engine)
+		if cache is not None:
+			outcome = cache.get(keys[name])
+			if outcome is not None:
+				test.add(score_for(algo_a, name, outcome))
+				rate_outcome(ratings, hashes, name, outcome, keys[name])
+				continue
+		queued.append((name, {SEED_ENV: str(game_seed)}))
+	if test.games() > 0:
+		print ('{: <30}{} games'.format('Cached:', test.games()))
+		print_sprt(test)
+
+	failed = 0
+	if test.status() == CONTINUE:
+		jobs = [match_job(name, parent_dir, env, engine, telemetry) for name, env in queued]
+		results = ArenaScheduler(workers=batch_size, timeout=timeout, sampler=telemetry.sampler if telemetry is not None else None).run(jobs)
+		try:
+			for result in results:
+				print_result(result, max_name_len)
+				outcome = collect_outcome(result, parent_dir, cache, keys.get(result['name']))
+				if telemetry is not None:
+					telemetry.record(result, outcome, engine=engine)
+				if outcome is None:
+					failed += 1
+					continue
+				test.add(score_for(algo_a, result['name'], outcome))
+				rate_outcome(ratings, hashes, result['name'], outcome, keys.get(result['name']))
+				print_sprt(test)
+				if test.status() != CONTINUE:
+					break
+		finally:
+			# stops the games that are still queued or running once there is a decision
+			results.close()
+			remove_game_dirs(jobs)
+
+	low, high = test.elo_interval()
+	score_low, score_high = test.score_interval()
+	print ()
+	if test.status() == ACCEPT_H1:
+		print ('{} is stronger than {} (H1 accepted)'.format(algo_a, algo_b))
+	elif test.status() == ACCEPT_H0:
+		print ('{} is not stronger than {} (H0 accepted)'.format(algo_a, algo_b))
+	else:
+		print ('No decision after {} games, inconclusive'.format(test.games()))
+	print ('Score of {}: {:.3f}, 95% confidence [{:.3f}, {:.3f}]'.format(algo_a, test.score(), score_low, score_high))
+	print ('Elo difference: {:.0f}, 95% confidence [{:.0f}, {:.0f}]'.format(score_to_elo(test.score()), low, high))
+	if failed > 0:
+		print ('{} games crashed or timed out and were not counted'.format(failed))
+	print ()
+	return test
+
+# spends a budget of games on the pairings the ratings are least sure about, a round of batch_size games at a time
+def run_ladder(matches, games, batch_size=None, timeout=None, cache_file=None, ratings=None, engine=JAVA_ENGINE, telemetry=None):
+	algos = sorted(set(algo for match in matches for algo in match))
+	workers = batch_size if batch_size else default_workers()
+	played = 0
+	while played < games:
+		pairs = ratings.informative_pairs(algos, min(workers, games - played))
+		if len(pairs) == 0:
+			break
+		# a fresh seed every round so repeated pairings are new games
+		run_matches(pairs, workers, timeout, cache_file, random.randrange(2 ** 31), ratings, engine, telemetry)
+		played += len(pairs)
+	ratings.print_ladder()
 	print ()
 
 if __name__ == '__main__':
 	args = parse_args() # get command line arguments
 
+	cache_file = None
+	if not args['no_cache']:
+		cache_file = args['cache'] if args['cache'] else os.path.join(match_command()[1], CACHE_FILE)
+
+	ratings = Ratings(args['ratings'] if args['ratings'] else os.path.join(match_command()[1], RATINGS_FILE))
+
+	telemetry = None
+	if not args['no_telemetry']:
+		telemetry = Telemetry(match_command()[1], args['log_dir'], args['metrics'])
+
+	if args['compare'] is not None:
+		if args['fork_server']:
+			use_fork_servers(args['compare'])
+		run_compare(args['compare'][0], args['compare'][1], args['batch'], args['timeout'], cache_file, args['seed'],
+			args['max_games'], args['elo0'], args['elo1'], args['alpha'], args['beta'], ratings, args['engine'], telemetry)
+		if telemetry is not None:
+			telemetry.print_summary()
+		sys.exit()
+
 	if args['all']:
 		print ('Running all algos')
 		matches = run_all()
@@ -239,17 +577,32 @@ if __name__ == '__main__':
 		print ('No arguments - no action taken')
 		sys.exit()
 
-	tmp = copy.deepcopy(matches)
-	run_matches(matches, args['batch'])		# run all matches
+	matches = list(matches)
+	if args['fork_server']:
+		use_fork_servers(algo for match in matches for algo in match)
+
+	if args['ladder'] is not None:
+		run_ladder(matches, args['ladder'], args['batch'], args['timeout'], cache_file, ratings, args['engine'], telemetry)
+		if telemetry is not None:
+			telemetry.print_summary()
+		sys.exit()
+
+	results = run_matches(matches, args['batch'], args['timeout'], cache_file, args['seed'], ratings, args['engine'], telemetry)		# run all matches
+	ratings.print_ladder()
+	print ()
+	if telemetry is not None:
+		telemetry.print_summary()
 
 	# if get_results is avalible, run a summary of the matches played
 	try:
 		args = {	'all':		False, 				\
 					'verbose':	False, 				\
 					'averages':	[], 				\
-					'file':		[],					\
+					'file':		[r['outcome']['replay'] for r in results if 'outcome' in r and os.path.isfile(r['outcome']['replay'])],	\
 					'graph':	['wins'],	\
-					'num':		len(list(tmp))		\
+					'num':		len(results),		\
+					'jobs':		args['batch'],		\
+					'no_cache':	False				\
 				}
 		from get_results import main
 		main(args)
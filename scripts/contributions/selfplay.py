@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Plays many games with swept strategy parameters and turns them into a per turn dataset for training.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Strategies can read knobs from the ALGO_PARAMS environment variable (see util.algo_params in
+gamelib), for example algo-att-channel reads offensive_walls, offensive_scouts and attack_mp
+with self.params.get(name, default). This script plays an algo against itself, or against
+--opponents, for every combination of the given parameter values:
+
+>py scripts/contributions/selfplay.py algo-att-channel -p offensive_walls=4,6,8 -p offensive_scouts=6,8,10 -g 20 -e python
+
+plays 3 * 3 combinations, 20 games each, as many at a time as the machine allows (see
+arena_scheduler.py). Every game gets its own seed in ALGO_SEED and the parameters of its
+combination in ALGO_PARAMS; both algos of a game get the same ALGO_PARAMS and ignore the knobs
+they do not know. Sides alternate between games against another opponent.
+
+Every finished game is turned into two rows per turn, one from each player's side, with the
+columns in COLUMNS plus a param_<name> column per swept parameter: the algo of that side,
+resources and health of both sides at the start of the turn, their structures, the mobile
+units each side spawned and the breaches it scored in that turn, and how the game ended for
+that side (won is 1, 0.5 or 0). The replays are deleted once they are read, unless --keep-replays is given.
+
+Rows are written to datasets/<algo> (-o for another folder) in chunks of --chunk-rows rows.
+Each chunk is a gzip compressed JSON object of columns, {"turn": [...], "mp": [...], ...},
+and manifest.json lists the chunks and the games they hold. Stopping the script (Ctrl+C) loses
+at most the games of the chunk being filled; running the same command again skips the games
+that are already in the dataset. Games that crash or time out are recorded as failed and not
+played again.
+
+To load the dataset, for example to train the enemy_attack_predictor of algo-att-channel:
+
+	from selfplay import load_dataset
+	data = load_dataset('datasets/algo-att-channel', ['turn', 'enemy_mp', 'enemy_health', 'enemy_scouts'])
+	X = list(zip(data['turn'], data['enemy_mp'], data['enemy_health']))
+	GaussianNB().fit(X, data['enemy_scouts'])
+'''
+
+import sys
+try:
+	import os
+	import glob
+	import gzip
+	import json
+	import random
+	import shutil
+	import argparse
+	import itertools
+	from arena_scheduler import ArenaScheduler
+	from run_arena import SEED_ENV, JAVA_ENGINE, PYTHON_ENGINE
+except ImportError as e:
+	print("WARNING: Module not found, full error:\n")
+	print(str(e))
+	sys.exit()
+
+
+# environment variable the parameters of a game are passed to the algos in, see gamelib/util.py
+PARAMS_ENV = 'ALGO_PARAMS'
+DATASET_DIR = 'datasets'
+MANIFEST_FILE = 'manifest.json'
+CHUNK_ROWS = 20000
+
+# indexes of the unit lists in pNUnits and of the unit types in spawn events
+WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE = range(8)
+
+COLUMNS = [
+	'game', 'turn', 'player', 'algo', 'won', 'turns',
+	'health', 'sp', 'mp', 'enemy_health', 'enemy_sp', 'enemy_mp',
+	'walls', 'supports', 'turrets', 'upgraded',
+	'enemy_walls', 'enemy_supports', 'enemy_turrets', 'enemy_upgraded',
+	'scouts', 'demolishers', 'interceptors',
+	'enemy_scouts', 'enemy_demolishers', 'enemy_interceptors',
+	'breaches', 'enemy_breaches',
+	]
+
+is_windows = sys.platform.startswith('win')
+
+
+# returns the shell command that plays a game in its own folder, so its replay can not be mixed up with another game's
+def game_command(parent_dir, algo1, algo2, game_dir, engine=JAVA_ENGINE):
+	run_name = 'run.ps1' if is_windows else 'run.sh'
+	run1 = os.path.join(parent_dir, 'algos', algo1, run_name)
+	run2 = os.path.join(parent_dir, 'algos', algo2, run_name)
+	if engine == PYTHON_ENGINE:
+		engine_file = os.path.join(parent_dir, 'scripts', 'contributions', 'engine.py')
+		return '"{}" "{}" work "{}" "{}" -c "{}" -o "{}"'.format(
+			sys.executable, engine_file, run1, run2, os.path.join(parent_dir, 'game-configs.json'), os.path.join(game_dir, 'replays'))
+	# the java engine reads game-configs.json from and writes its replay to the folder it runs in
+	shutil.copy(os.path.join(parent_dir, 'game-configs.json'), game_dir)
+	return 'java -jar "{}" work "{}" "{}"'.format(os.path.join(parent_dir, 'engine.jar'), run1, run2)
+
+# parses NAME=V1,V2,... into the name and its values, values that are not JSON are kept as strings
+def parse_param(text):
+	if '=' not in text:
+		raise argparse.ArgumentTypeError('expected NAME=VALUE,VALUE,..., got {}'.format(text))
+	name, values = text.split('=', 1)
+	parsed = []
+	for value in values.split(','):
+		try:
+			parsed.append(json.loads(value))
+		except ValueError:
+			parsed.append(value)
+	return name.strip(), parsed
+
+# returns every game of a sweep in a fixed order, so a resumed run plans the same games
+def plan_games(spec):
+	names = sorted(spec['params'])
+	rng = random.Random(spec['seed'])
+	games = []
+	for values in itertools.product(*(spec['params'][name] for name in names)):
+		params = dict(zip(names, values))
+		for opponent in spec['opponents']:
+			for i in range(spec['games']):
+				algo1, algo2 = (spec['algo'], opponent) if i % 2 == 0 else (opponent, spec['algo'])
+				games.append({'id': len(games), 'algo1': algo1, 'algo2': algo2, 'params': params, 'seed': rng.randrange(2 ** 31)})
+	return games
+
+
+# counts the units of each type in a pNUnits entry
+def unit_counts(units):
+	return [len(units[WALL]), len(units[SUPPORT]), len(units[TURRET]), len(units[UPGRADE]) if len(units) > UPGRADE else 0]
+
+# reads a replay and returns one row per turn and player
+def game_rows(f_name, game):
+	turns = []			# [deploy frame, {player: [scouts, demolishers, interceptors]}, {player: breaches}]
+	end = None
+	with open(f_name) as f:
+		for line in f:
+			if '"turnInfo"' not in line:
+				continue
+			frame = json.loads(line)
+			phase = frame['turnInfo'][0]
+			if phase == 0:
+				turns.append([frame, {1: [0, 0, 0], 2: [0, 0, 0]}, {1: 0, 2: 0}])
+			elif phase == 1 and len(turns) > 0:
+				events = frame.get('events', {})
+				for spawn in events.get('spawn', []):
+					if spawn[1] in (SCOUT, DEMOLISHER, INTERCEPTOR) and spawn[3] in (1, 2):
+						turns[-1][1][spawn[3]][spawn[1] - SCOUT] += 1
+				for breach in events.get('breach', []):
+					if breach[4] in (1, 2):
+						turns[-1][2][breach[4]] += 1
+			elif phase == 2:
+				end = frame
+	if end is None:
+		return []
+
+	winner = end.get('endStats', {}).get('winner')
+	if winner not in (1, 2):
+		winner = 1 if end['p1Stats'][0] > end['p2Stats'][0] else 2 if end['p2Stats'][0] > end['p1Stats'][0] else 0
+	rows = []
+	for frame, spawns, breaches in turns:
+		for player, enemy in ((1, 2), (2, 1)):
+			stats = frame['p{}Stats'.format(player)]
+			enemy_stats = frame['p{}Stats'.format(enemy)]
+			row = [
+				game['id'], frame['turnInfo'][1], player, game['algo{}'.format(player)], 0.5 if winner == 0 else 1 if winner == player else 0, end['turnInfo'][1],
+				stats[0], stats[1], stats[2], enemy_stats[0], enemy_stats[1], enemy_stats[2],
+				] + unit_counts(frame['p{}Units'.format(player)]) + unit_counts(frame['p{}Units'.format(enemy)]) \
+				+ spawns[player] + spawns[enemy] + [breaches[player], breaches[enemy]]
+			rows.append(row + [game['params'][name] for name in sorted(game['params'])])
+	return rows
+
+
+# a dataset of rows stored as gzip compressed column chunks, with a manifest of the games it holds
+class ChunkedDataset:
+	def __init__(self, path, spec=None, chunk_rows=CHUNK_ROWS):
+		self.path = path
+		self.chunk_rows = chunk_rows
+		self.manifest = {'spec': spec, 'columns': None, 'chunks': [], 'failed': []}
+		if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+			with open(os.path.join(path, MANIFEST_FILE)) as f:
+				self.manifest = json.load(f)
+		if self.manifest['columns'] is None and spec is not None:
+			self.manifest['columns'] = COLUMNS + ['param_' + name for name in sorted(spec['params'])]
+		self.columns = self.manifest['columns']
+		self.__rows = []
+		self.__games = []
+		self.__failed = []
+
+	# ids of every game stored in a chunk or recorded as failed
+	def done(self):
+		ids = set(self.manifest['failed'])
+		for chunk in self.manifest['chunks']:
+			ids.update(chunk['games'])
+		return ids
+
+	def rows(self):
+		return sum(chunk['rows'] for chunk in self.manifest['chunks']) + len(self.__rows)
+
+	# adds the rows of a finished game, writing a chunk when enough rows are waiting
+	def add_game(self, game_id, rows):
+		self.__rows.extend(rows)
+		self.__games.append(game_id)
+		if len(self.__rows) >= self.chunk_rows:
+			self.flush()
+
+	def add_failed(self, game_id):
+		self.__failed.append(game_id)
+
+	# writes the waiting rows as a new chunk, then the manifest, each to a temporary file first
+	def flush(self):
+		if len(self.__games) == 0 and len(self.__failed) == 0:
+			return
+		os.makedirs(self.path, exist_ok=True)
+		if len(self.__games) > 0:
+			f_name = 'chunk-{:05d}.json.gz'.format(len(self.manifest['chunks']))
+			columns = {name: [row[i] for row in self.__rows] for i, name in enumerate(self.columns)}
+			tmp = os.path.join(self.path, f_name + '.tmp')
+			with gzip.open(tmp, 'wt') as f:
+				json.dump({'columns': columns}, f, separators=(',', ':'))
+			os.replace(tmp, os.path.join(self.path, f_name))
+			self.manifest['chunks'].append({'file': f_name, 'rows': len(self.__rows), 'games': self.__games})
+		self.manifest['failed'].extend(self.__failed)
+		tmp = os.path.join(self.path, MANIFEST_FILE + '.tmp')
+		with open(tmp, 'w') as f:
+			json.dump(self.manifest, f)
+		os.replace(tmp, os.path.join(self.path, MANIFEST_FILE))
+		self.__rows, self.__games, self.__failed = [], [], []
+
+	# yields every stored chunk as a dict of column name -> list of values
+	def chunks(self, columns=None):
+		for chunk in self.manifest['chunks']:
+			with gzip.open(os.path.join(self.path, chunk['file']), 'rt') as f:
+				data = json.load(f)['columns']
+			yield {name: data[name] for name in columns} if columns else data
+
+# loads the given columns (all by default) of a dataset written by this script
+def load_dataset(path, columns=None):
+	dataset = ChunkedDataset(path)
+	data = {name: [] for name in (columns if columns else dataset.columns or [])}
+	for chunk in dataset.chunks(columns):
+		for name in data:
+			data[name].extend(chunk[name])
+	return data
+
+
+# plays every game of the sweep that is not in the dataset yet and adds its rows
+def run_selfplay(spec, out_dir, batch_size=None, timeout=None, chunk_rows=CHUNK_ROWS, keep_replays=False):
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	dataset = ChunkedDataset(out_dir, spec, chunk_rows)
+	if dataset.manifest['spec'] != spec:
+		print ('{} holds a dataset of another sweep, pick another folder with -o'.format(out_dir))
+		sys.exit()
+
+	games = plan_games(spec)
+	done = dataset.done()
+	todo = [game for game in games if game['id'] not in done]
+	print ('{} games planned, {} already in the dataset, {} to play'.format(len(games), len(games) - len(todo), len(todo)))
+	if len(todo) == 0:
+		return dataset
+
+	work_dir = os.path.join(out_dir, 'games')
+	jobs = []
+	by_name = {}
+	for game in todo:
+		game_dir = os.path.join(work_dir, str(game['id']))
+		os.makedirs(game_dir, exist_ok=True)
+		name = (game['algo1'], game['algo2'], game['id'])
+		by_name[name] = (game, game_dir)
+		env = {SEED_ENV: str(game['seed']), PARAMS_ENV: json.dumps(game['params'])}
+		jobs.append((name, game_command(parent_dir, game['algo1'], game['algo2'], game_dir, spec['engine']), game_dir, env))
+
+	scheduler = ArenaScheduler(workers=batch_size, timeout=timeout)
+	print ('Playing {} at a time, writing to {}'.format(scheduler.workers, out_dir))
+	played = 0
+	try:
+		for result in scheduler.run(jobs):
+			game, game_dir = by_name[result['name']]
+			replays = sorted(glob.glob(os.path.join(game_dir, 'replays', '*.replay')))
+			rows = []
+			if not result['timed_out'] and result['returncode'] == 0 and len(replays) > 0:
+				try:
+					rows = game_rows(replays[0], game)
+				except (OSError, ValueError, KeyError, IndexError):
+					rows = []
+			if len(rows) > 0:
+				dataset.add_game(game['id'], rows)
+				if keep_replays:
+					os.replace(replays[0], os.path.join(out_dir, 'replay-{}.replay'.format(game['id'])))
+			else:
+				print ('Game {} ({} vs {}) failed{}'.format(game['id'], game['algo1'], game['algo2'], ', timed out' if result['timed_out'] else ''))
+				dataset.add_failed(game['id'])
+			shutil.rmtree(game_dir, ignore_errors=True)
+			played += 1
+			if played % 50 == 0 or played == len(todo):
+				print ('{} of {} games played, {} rows'.format(played, len(todo), dataset.rows()))
+	finally:
+		# an interrupted run keeps every finished game
+		dataset.flush()
+		shutil.rmtree(work_dir, ignore_errors=True)
+	return dataset
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"algo",
+		help="folder name of the algo whose parameters are swept\n\n")
+	ap.add_argument(
+		"--opponents",
+		nargs='*',
+		default=None,
+		help="algos to play against, defaults to the algo itself\n\n")
+	ap.add_argument(
+		"-p", "--param",
+		type=parse_param,
+		action='append',
+		default=[],
+		metavar='NAME=V1,V2',
+		help="a strategy parameter and the values to sweep it over, can be given many times\n\n")
+	ap.add_argument(
+		"-g", "--games",
+		type=int,
+		default=10,
+		help="games per combination of parameter values and opponent\n\n")
+	ap.add_argument(
+		"-o", "--out",
+		default=None,
+		help="dataset folder, defaults to datasets/<algo> in the root of the starter kit\n\n")
+	ap.add_argument(
+		"-b", "--batch",
+		type=int,
+		default=None,
+		help="number of games to run at a single time, defaults to what your cores and memory allow\n\n")
+	ap.add_argument(
+		"-t", "--timeout",
+		type=float,
+		default=600,
+		help="seconds a single game may take before it is killed\n\n")
+	ap.add_argument(
+		"-e", "--engine",
+		choices=[JAVA_ENGINE, PYTHON_ENGINE],
+		default=JAVA_ENGINE,
+		help="engine that plays the games: engine.jar, or the python engine in engine.py\n\n")
+	ap.add_argument(
+		"--seed",
+		type=int,
+		default=0,
+		help="seed the seeds of the games are drawn from, part of the sweep\n\n")
+	ap.add_argument(
+		"--chunk-rows",
+		type=int,
+		default=CHUNK_ROWS,
+		help="rows written together in one chunk file\n\n")
+	ap.add_argument(
+		"--keep-replays",
+		action='store_true',
+		help="keep the replay of every game in the dataset folder\n\n")
+	return vars(ap.parse_args())
+
+if __name__ == '__main__':
+	args = parse_args()
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	spec = {
+		'algo':			args['algo'],
+		'opponents':	args['opponents'] if args['opponents'] else [args['algo']],
+		'params':		dict(args['param']),
+		'games':		args['games'],
+		'seed':			args['seed'],
+		'engine':		args['engine'],
+		}
+	out_dir = args['out'] if args['out'] else os.path.join(parent_dir, DATASET_DIR, args['algo'])
+	dataset = run_selfplay(spec, os.path.abspath(out_dir), args['batch'], args['timeout'], args['chunk_rows'], args['keep_replays'])
+	print ('Dataset: {} rows in {} chunks, {} failed games'.format(dataset.rows(), len(dataset.manifest['chunks']), len(dataset.manifest['failed'])))
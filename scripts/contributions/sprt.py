@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Sequential probability ratio test for deciding if one algo beats another. Used by run_arena.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+Instead of playing a fixed number of games, the SPRT looks at the results after every game
+and stops as soon as there is enough evidence for one of two hypotheses:
+
+	H0: algo A is at most elo0 Elo stronger than algo B (default 0, no improvement)
+	H1: algo A is at least elo1 Elo stronger than algo B (default 50)
+
+alpha is the chance of accepting H1 when H0 is true and beta the chance of accepting H0 when
+H1 is true (both 0.05 by default). Clear differences are usually decided in a few dozen
+games, close ones take longer or hit the game limit and are reported as inconclusive.
+
+Wins, draws and losses are scored 1, 0.5 and 0. The log likelihood ratio treats every game as
+a Bernoulli trial on the expected score of each hypothesis, with a draw counting as half a win
+and half a loss. The confidence bounds use the normal approximation of the mean score.
+
+	test = SPRT(elo0=0, elo1=50)
+	test.add(1)			# A won
+	test.add(0.5)		# draw
+	print(test.status(), test.llr(), test.elo_interval())
+'''
+
+import math
+
+ACCEPT_H0 = 'H0'
+ACCEPT_H1 = 'H1'
+CONTINUE = 'continue'
+
+
+# converts an Elo difference to the expected score of the stronger side
+def elo_to_score(elo):
+	return 1 / (1 + 10 ** (-elo / 400))
+
+# converts an expected score to an Elo difference
+def score_to_elo(score):
+	score = min(max(score, 1e-6), 1 - 1e-6)
+	return -400 * math.log10(1 / score - 1)
+
+# the quantile of the standard normal distribution for the given two sided confidence
+def normal_quantile(confidence):
+	# inverse of the error function by bisection, precise enough for confidence bounds
+	target = confidence
+	lo, hi = 0.0, 10.0
+	for _ in range(100):
+		mid = (lo + hi) / 2
+		if math.erf(mid / math.sqrt(2)) < target:
+			lo = mid
+		else:
+			hi = mid
+	return (lo + hi) / 2
+
+
+class SPRT:
+	def __init__(self, elo0=0, elo1=50, alpha=0.05, beta=0.05):
+		self.elo0 = elo0
+		self.elo1 = elo1
+		self.alpha = alpha
+		self.beta = beta
+		self.wins = 0
+		self.draws = 0
+		self.losses = 0
+		self.lower = math.log(beta / (1 - alpha))		# accept H0 below this
+		self.upper = math.log((1 - beta) / alpha)		# accept H1 above this
+
+	# adds the score of one game from algo A's point of view: 1 win, 0.5 draw, 0 loss
+	def add(self, score):
+		if score == 1:
+			self.wins += 1
+		elif score == 0:
+			self.losses += 1
+		else:
+			self.draws += 1
+
+	def games(self):
+		return self.wins + self.draws + self.losses
+
+	def score(self):
+		n = self.games()
+		return (self.wins + self.draws / 2) / n if n > 0 else 0.5
+
+	# variance of a single game score for the confidence bounds. Half a win and half a loss
+	# are added so a run of identical results does not make it zero
+	def variance(self):
+		w, d, l = self.wins + 0.5, self.draws, self.losses + 0.5
+		n = w + d + l
+		s = (w + d / 2) / n
+		return (w * (1 - s) ** 2 + d * (0.5 - s) ** 2 + l * s ** 2) / n
+
+	def llr(self):
+		s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+		points = self.wins + self.draws / 2
+		missed = self.losses + self.draws / 2
+		return points * math.log(s1 / s0) + missed * math.log((1 - s1) / (1 - s0))
+
+	def status(self):
+		llr = self.llr()
+		if llr >= self.upper:
+			return ACCEPT_H1
+		if llr <= self.lower:
+			return ACCEPT_H0
+		return CONTINUE
+
+	# returns the (low, high) bounds of the mean score at the given confidence
+	def score_interval(self, confidence=0.95):
+		n = self.games()
+		if n == 0:
+			return 0.0, 1.0
+		margin = normal_quantile(confidence) * math.sqrt(self.variance() / n)
+		return max(0.0, self.score() - margin), min(1.0, self.score() + margin)
+
+	# returns the (low, high) bounds of the Elo difference at the given confidence
+	def elo_interval(self, confidence=0.95):
+		low, high = self.score_interval(confidence)
+		return score_to_elo(low), score_to_elo(high)
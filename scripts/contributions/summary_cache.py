@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Caches the summaries get_results.py makes of replays, so a replay is only read once. Used by get_results.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+A finished replay never changes, but get_results.py used to read every replay again each time
+it ran, including the summary run_arena.py prints after every run. The SummaryCache keeps the
+summary of every replay it was given (the algos that played, the winner, their per turn stats
+and end stats) in results_cache.sqlite in the root of the starter kit, under the path of the
+replay together with its size and modification time:
+
+	cache = SummaryCache('results_cache.sqlite')
+	summary = cache.get('replays/some.replay')			# None if it is not cached or the replay changed
+	cache.put('replays/some.replay', summary)
+	cache.close()
+
+Summaries are stored as JSON, sqlite3 is part of the standard library. Delete the file (or run
+get_results.py with --no-cache) to read every replay again.
+'''
+
+import os
+import json
+import sqlite3
+
+CACHE_FILE = 'results_cache.sqlite'
+
+
+class SummaryCache:
+	def __init__(self, f_name=CACHE_FILE):
+		self.fname = f_name
+		self.db = sqlite3.connect(f_name)
+		self.db.execute('CREATE TABLE IF NOT EXISTS summaries (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, summary TEXT)')
+
+	# returns the cached summary of a replay, or None if it has none or the replay changed since
+	def get(self, f_name):
+		try:
+			stat = os.stat(f_name)
+		except OSError:
+			return None
+		row = self.db.execute('SELECT size, mtime_ns, summary FROM summaries WHERE path = ?', (os.path.abspath(f_name),)).fetchone()
+		if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+			return None
+		return json.loads(row[2])
+
+	def put(self, f_name, summary):
+		stat = os.stat(f_name)
+		self.db.execute('INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)',
+			(os.path.abspath(f_name), stat.st_size, stat.st_mtime_ns, json.dumps(summary, separators=(',', ':'))))
+
+	# commits what was put since the last save
+	def save(self):
+		self.db.commit()
+
+	def close(self):
+		self.db.commit()
+		self.db.close()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+'''
+------------------------------------------------------------------------------------------------
+Short Description:
+Performance telemetry of arena matches: turn times, memory and CPU of every algo. Used by run_arena.py.
+------------------------------------------------------------------------------------------------
+
+README:
+
+This program assumes this file is in the contributions/scripts directory
+
+An arena that only counts wins does not notice when a new version of an algo gets slower or
+hungrier, until it starts losing games to the time limit. For every match it plays,
+run_arena.py collects:
+
+	* the engine output (with the errors and prints of both algos) in a log file per match,
+	  arena_logs/<date>-<algo1>-vs-<algo2>.log, instead of keeping it all in memory
+	* the time each algo took for every turn, read from the replay (the last value of pNStats)
+	* the peak memory (RSS) and CPU time of each algo, sampled from /proc while the match runs
+	* the peak memory of the largest process and the CPU time of the whole match, engine and
+	  algos together, read with os.wait4 when the match ends
+
+and appends one record per match to arena_metrics.jsonl in the root of the starter kit:
+
+	{"algo1": "python-algo", "algo2": "algo-def-mp-check", "elapsed": 12.3, "timed_out": false, ...
+	 "players": {"p1": {"name": "python-algo", "turns": 41, "p50_ms": 48, "p95_ms": 131,
+	 "max_ms": 290, "slow_turns": 0, "turn_timeouts": 0, "timeout_death": false,
+	 "peak_rss_mb": 61.2, "cpu_s": 3.1}, "p2": {...}}, "engine_usage": {"peak_rss_mb": ..., "cpu_s": ...},
+	 "match_usage": {"peak_rss_mb": 212.4, "cpu_s": 9.8}}
+
+slow_turns counts turns over waitTimeBotSoft (the ones that cost health) and turn_timeouts the
+turns that hit waitTimeBotMax. Memory and CPU are only sampled on Linux, every 0.2s, so what an
+algo uses after the last sample before it exits is missing from its own numbers but counted in
+match_usage, which is exact but can not tell the algos apart. The algo processes are
+told apart by the run.sh they were started from, the first one started is player 1. An algo
+started from a fork server (see gamelib/forkserver.py) runs outside the match, so only its
+small client process is measured.
+
+To see the per algo summary of all recorded matches:
+>py scripts/contributions/telemetry.py
+'''
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from arena_cache import last_line
+
+METRICS_FILE = 'arena_metrics.jsonl'
+LOG_DIR = 'arena_logs'
+SAMPLE_INTERVAL = 0.2			# seconds between two samples of the processes of a match
+
+RUN_FILES = ('run.sh', 'run.ps1')
+PLAYERS = ('p1', 'p2')
+
+
+# returns the time in ms every player took for each turn of a replay, as lists indexed by turn
+def turn_times(f_name):
+	times = {1: [], 2: []}
+	waiting = False
+	with open(f_name) as f:
+		for line in f:
+			if '"turnInfo"' not in line:
+				continue
+			try:
+				frame = json.loads(line)
+			except ValueError:
+				continue
+			# the time of a turn shows up in the first frame after its deploy frame
+			if waiting:
+				for player in (1, 2):
+					times[player].append(frame['p{}Stats'.format(player)][3])
+				waiting = False
+			if frame['turnInfo'][0] == 0:
+				waiting = True
+	return times[1], times[2]
+
+# returns the value below which percent % of the sorted values fall
+def percentile(values, percent):
+	if len(values) == 0:
+		return None
+	values = sorted(values)
+	rank = (len(values) - 1) * percent / 100
+	low = int(rank)
+	high = min(low + 1, len(values) - 1)
+	return values[low] + (values[high] - values[low]) * (rank - low)
+
+def rounded(value, digits=1):
+	return None if value is None else round(value, digits)
+
+# summarizes the turn times of one player
+def turn_stats(times, soft_ms, max_ms):
+	return {
+		'turns':			len(times),
+		'p50_ms':			rounded(percentile(times, 50)),
+		'p95_ms':			rounded(percentile(times, 95)),
+		'max_ms':			max(times) if times else None,
+		'slow_turns':		sum(1 for t in times if t > soft_ms),
+		'turn_timeouts':	sum(1 for t in times if t >= max_ms),
+		}
+
+
+# samples the memory and CPU time of every process of a match while it runs
+class ProcessTreeSampler:
+	page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024) if hasattr(os, 'sysconf') else 0
+	ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+	# session is the pid of a match started in its own session, see ArenaScheduler.run_command
+	def __init__(self, session, interval=SAMPLE_INTERVAL):
+		self.session = session
+		self.interval = interval
+		self.roots = []				# pids of the run files, in the order the algos were started
+		self.peak_rss = {}			# 'p1', 'p2' or 'engine' -> MB
+		self.cpu = {}				# pid -> (owner, seconds)
+		self.__stop = threading.Event()
+		self.__thread = threading.Thread(target=self.__run, daemon=True)
+		self.__thread.start()
+
+	@staticmethod
+	def supported():
+		return os.path.isdir('/proc/self')
+
+	def __run(self):
+		while not self.__stop.is_set():
+			self.sample()
+			self.__stop.wait(self.interval)
+
+	# returns {pid: (ppid, rss_mb, cpu_s, cmdline)} of the processes in the session of the match
+	def processes(self):
+		processes = {}
+		for pid in os.listdir('/proc'):
+			if not pid.isdigit():
+				continue
+			try:
+				with open('/proc/{}/stat'.format(pid)) as f:
+					fields = f.read().rsplit(')', 1)[1].split()
+				if int(fields[3]) != self.session:
+					continue
+				with open('/proc/{}/cmdline'.format(pid), 'rb') as f:
+					cmdline = f.read().decode(errors='replace').split('\0')
+			except (OSError, IndexError, ValueError):
+				continue		# the process ended while it was read
+			cpu = (int(fields[11]) + int(fields[12])) / self.ticks
+			processes[int(pid)] = (int(fields[1]), int(fields[21]) * self.page_mb, cpu, cmdline)
+		return processes
+
+	# works out which player each process belongs to and adds the sample
+	def sample(self):
+		processes = self.processes()
+		for pid, (_, _, _, cmdline) in sorted(processes.items()):
+			if pid not in self.roots and len(self.roots) < 2 and self.runs_algo(cmdline):
+				self.roots.append(pid)
+		rss = {}
+		for pid, (ppid, mb, cpu, _) in processes.items():
+			owner = self.owner(pid, processes)
+			rss[owner] = rss.get(owner, 0) + mb
+			self.cpu[pid] = (owner, cpu)
+		for owner, mb in rss.items():
+			self.peak_rss[owner] = max(self.peak_rss.get(owner, 0), mb)
+
+	# True for a shell running a run file, but not for the engine that got the run files as arguments
+	@staticmethod
+	def runs_algo(cmdline):
+		return any(os.path.basename(arg) in RUN_FILES for arg in cmdline[:2])
+
+	# the player whose run file started a process, or the engine
+	def owner(self, pid, processes):
+		while pid in processes:
+			if pid in self.roots:
+				return PLAYERS[self.roots.index(pid)]
+			pid = processes[pid][0]
+		return 'engine'
+
+	# stops sampling and returns the peak RSS and CPU time of both players and the engine
+	def stop(self):
+		self.__stop.set()
+		self.__thread.join()
+		usage = {}
+		for owner in PLAYERS + ('engine',):
+			usage[owner] = {
+				'peak_rss_mb':	round(self.peak_rss[owner], 1) if owner in self.peak_rss else None,
+				'cpu_s':		round(sum(cpu for o, cpu in self.cpu.values() if o == owner), 2) if owner in self.peak_rss else None,
+				}
+		return usage
+
+
+# collects the logs and metrics of the matches of an arena
+class Telemetry:
+	def __init__(self, parent_dir, log_dir=None, metrics_file=None, config_file=None):
+		self.log_dir = log_dir if log_dir else os.path.join(parent_dir, LOG_DIR)
+		self.metrics_file = metrics_file if metrics_file else os.path.join(parent_dir, METRICS_FILE)
+		self.records = []
+		self.__logs = set()
+		with open(config_file if config_file else os.path.join(parent_dir, 'game-configs.json')) as f:
+			timing = json.load(f).get('timingAndReplay', {})
+		self.soft_ms = timing.get('waitTimeBotSoft', 3000)
+		self.max_ms = timing.get('waitTimeBotMax', 35000)
+		os.makedirs(self.log_dir, exist_ok=True)
+
+	# returns a new log file for a match, name is the (algo1, algo2[, seed]) name of the job
+	def log_file(self, name):
+		base = '{}-{}'.format(time.strftime('%Y-%m-%d-%H-%M-%S'), '-vs-'.join(str(part) for part in name[:2]))
+		if len(name) > 2:
+			base += '-seed-{}'.format(name[2])
+		base = re.sub(r'[^\w.-]', '_', base)
+		f_name, count = base, 1
+		while f_name in self.__logs or os.path.exists(os.path.join(self.log_dir, f_name + '.log')):
+			count += 1
+			f_name = '{}-{}'.format(base, count)
+		self.__logs.add(f_name)
+		return os.path.join(self.log_dir, f_name + '.log')
+
+	# starts sampling a match, passed to ArenaScheduler as its sampler
+	def sampler(self, pid):
+		if not ProcessTreeSampler.supported():
+			return None
+		return ProcessTreeSampler(pid)
+
+	# builds the metrics record of a finished match and appends it to the metrics file
+	def record(self, result, outcome=None, seed=None, engine=None):
+		usage = result.get('usage') or {}
+		record = {
+			'time':			round(result['start'], 3),
+			'algo1':		result['name'][0],
+			'algo2':		result['name'][1],
+			'seed':			result['name'][2] if len(result['name']) > 2 else seed,
+			'engine':		engine,
+			'elapsed':		round(result['elapsed'], 3),
+			'returncode':	result['returncode'],
+			'timed_out':	result['timed_out'],
+			'winner':		outcome['winner'] if outcome else None,
+			'replay':		outcome['replay'] if outcome else None,
+			'log':			result.get('log'),
+			'players':		{},
+			'engine_usage':	usage.get('engine'),
+			'match_usage':	result.get('exit_usage'),
+			}
+		times = ([], [])
+		end_stats = {}
+		if outcome is not None:
+			try:
+				times = turn_times(outcome['replay'])
+				end_stats = json.loads(last_line(outcome['replay'])).get('endStats', {})
+			except (OSError, ValueError):
+				pass
+		for i, player in enumerate(PLAYERS):
+			stats = turn_stats(times[i], self.soft_ms, self.max_ms)
+			stats['name'] = result['name'][i]
+			stats['timeout_death'] = end_stats.get('player{}'.format(i + 1), {}).get('timeout_death')
+			stats.update(usage.get(player) or {'peak_rss_mb': None, 'cpu_s': None})
+			record['players'][player] = stats
+		self.records.append(record)
+		with open(self.metrics_file, 'a') as f:
+			f.write(json.dumps(record, sort_keys=True) + '\n')
+		return record
+
+	def print_summary(self):
+		print_summary(self.records)
+
+
+# reads the records of a metrics file
+def read_records(f_name):
+	records = []
+	with open(f_name) as f:
+		for line in f:
+			try:
+				records.append(json.loads(line))
+			except ValueError:
+				continue			# a record cut off by an interrupted run
+	return records
+
+# prints the turn times, memory and CPU of every algo over the given match records
+def print_summary(records):
+	algos = {}
+	for record in records:
+		for stats in record['players'].values():
+			algos.setdefault(stats['name'], []).append(stats)
+	if len(algos) == 0:
+		return
+	print ('{: <40}{: >7}{: >9}{: >9}{: >9}{: >10}{: >9}{: >7}{: >10}'.format(
+		'Algo', 'Games', 'p50 ms', 'p95 ms', 'max ms', 'RSS MB', 'CPU s', 'Slow', 'Timeouts'))
+	for name, games in sorted(algos.items()):
+		p50s = [g['p50_ms'] for g in games if g['p50_ms'] is not None]
+		p95s = [g['p95_ms'] for g in games if g['p95_ms'] is not None]
+		maxes = [g['max_ms'] for g in games if g['max_ms'] is not None]
+		rss = [g['peak_rss_mb'] for g in games if g['peak_rss_mb'] is not None]
+		cpu = [g['cpu_s'] for g in games if g['cpu_s'] is not None]
+		print ('{: <40}{: >7}{: >9}{: >9}{: >9}{: >10}{: >9}{: >7}{: >10}'.format(
+			name,
+			len(games),
+			format_value(percentile(p50s, 50), '.0f'),		# the typical game
+			format_value(percentile(p95s, 50), '.0f'),
+			format_value(max(maxes) if maxes else None, '.0f'),
+			format_value(max(rss) if rss else None, '.1f'),
+			format_value(sum(cpu) / len(cpu) if cpu else None, '.2f'),
+			sum(g['slow_turns'] for g in games),
+			sum(g['turn_timeouts'] for g in games)))
+	print ()
+
+def format_value(value, spec):
+	return '-' if value is None else format(value, spec)
+
+# handles all the arguments
+def parse_args():
+	ap = argparse.ArgumentParser(add_help=False, formatter_class=argparse.RawTextHelpFormatter)
+	ap.add_argument('-h', '--help', action='help', help='show this help message and exit\n\n')
+	ap.add_argument(
+		"-m", "--metrics",
+		default=None,
+		help="metrics file, defaults to arena_metrics.jsonl in the root of the starter kit\n\n")
+	ap.add_argument(
+		"-s", "--specific",
+		nargs='*',
+		default=[],
+		help="only summarize matches these algos played in\n\n")
+	return vars(ap.parse_args())
+
+if __name__ == '__main__':
+	args = parse_args()
+	parent_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir))
+	f_name = args['metrics'] if args['metrics'] else os.path.join(parent_dir, METRICS_FILE)
+	if not os.path.isfile(f_name):
+		print ('No metrics found in {}, run some matches with run_arena.py first'.format(f_name))
+		sys.exit()
+	records = read_records(f_name)
+	if len(args['specific']) > 0:
+		records = [r for r in records if r['algo1'] in args['specific'] or r['algo2'] in args['specific']]
+	print_summary(records)
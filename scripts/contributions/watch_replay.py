@@ -34,6 +34,14 @@ You can specify which file you would like to run by:
 where REPLAY_FILE is the file you'd like to look at. You can list more than one, but it will
 NOT display more than one replay.
 
+----------------------------------------------------------------------------------------
+-at: Start at a turn and frame
+
+You can open a replay paused at a given turn and frame (the deploy phase is frame -1):
+>py scripts/contributions/watch_replay.py -f [REPLAY_FILE].replay -at 12 5
+
+Press space to play from there. query_replays.py prints this command for every frame it finds.
+
 ----------------------------------------------------------------------------------------
 -b: Blitting
 
@@ -45,6 +53,22 @@ Blitting will improve the performance of the graphing, but comes at the cost of
 - You may notice small graphical glitches with text updating (will not show if you do not use the keyboard inputs)
 - If you run the program in real-time the player names will not update (the winner name will be displayed correctly).
 
+----------------------------------------------------------------------------------------
+-col: Collections
+
+You can draw the units faster with this flag:
+>py scripts/contributions/watch_replay.py -col
+
+By default every unit is its own shape on the board, which is moved, reshaped or removed one by one
+every frame. With -col every kind of unit (and every ring of the static units) is one matplotlib
+collection, and each frame only sets the positions, health and colors of all of them at once, so
+late game boards with hundreds of units stay smooth at the higher speeds. The count labels of
+stacked units are reused instead of created again every frame. The board looks the same, except
+that health wedges move in steps of 6 degrees.
+
+The collections never change during the animation, so -col can be combined with -b (blitting):
+>py scripts/contributions/watch_replay.py -col -b
+
 ----------------------------------------------------------------------------------------
 -run: Real-time watching
 
@@ -197,6 +221,7 @@ try:
 	import argparse
 	import subprocess
 	import multiprocessing as mp
+	from replay_reader import ReplayReader
 except ImportError as e:
 	sys.stderr.write("WARNING: Module not found, full error:\n\n")
 	sys.stderr.write(e)
@@ -205,7 +230,9 @@ try:
 	import matplotlib.pyplot as plt
 	import matplotlib.animation as animation
 	from matplotlib.patches import Circle, Wedge, Polygon
-	from matplotlib.collections import PatchCollection
+	import numpy as np
+	from matplotlib.colors import to_rgba
+	from matplotlib.collections import PatchCollection, PolyCollection
 	from matplotlib.widgets import Slider
 except ImportError:
 	usr_in = input('Matplotlib not found.\nWould you like this program to try and install matplotlib? (y/n) ')
@@ -216,7 +243,9 @@ except ImportError:
 			import matplotlib.pyplot as plt
 			import matplotlib.animation as animation
 			from matplotlib.patches import Circle, Wedge, Polygon
-			from matplotlib.collections import PatchCollection
+			import numpy as np
+			from matplotlib.colors import to_rgba
+			from matplotlib.collections import PatchCollection, PolyCollection
 			from matplotlib.widgets import Slider
 
 			sys.stderr.write('\n\n')
@@ -226,7 +255,7 @@ except ImportError:
 			sys.exit()
 
 
-global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, MAX_HP, GET_VERTS, SPEED, BLIT
+global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, MAX_HP, GET_VERTS, SPEED, BLIT, COLLECTIONS
 FILTER = 0
 ENCRYPTOR = 1
 DESTRUCTOR = 2
@@ -235,6 +264,8 @@ EMP = 4
 SCRAMBLER = 5
 MAX_HP = {FILTER:60, ENCRYPTOR:30, DESTRUCTOR:75, PING:15, EMP:5, SCRAMBLER:40}
 SPEED = {'1':.25, '2':.5, '3':1, '4':2, '5':4, '6':8} # speed versions, key is user input (number)
+HEALTH_STEPS = 60	# the number of different health wedges drawn with -col
+ARC_POINTS = 24		# the number of points on the arc of a ring or circle drawn with -col
 
 
 # returns a rotated angle (created to make health deplete from vertical angle)
@@ -277,10 +308,20 @@ def parse_args():
 		nargs='*',
 		default=[],
 		help="specify a replay file you'd like to watch\n\n")
+	ap.add_argument(
+		'-at', '--at',
+		nargs='+',
+		type=int,
+		default=None,
+		help="specify a turn and optionally a frame to open the replay at, paused (press space to play)\n\n")
 	ap.add_argument(
 		'-b', '--blit',
 		action='store_true',
 		help="will tell the program to use blit - will improve performance, but you will not be able to see or use the slider and there will be minor text glitches when fast forwarding, etc (you can still use all the keyboard commands)\n\n")
+	ap.add_argument(
+		'-col', '--collections',
+		action='store_true',
+		help="draws every unit type as a single collection instead of a shape per unit - much faster for boards with many units, and works well with -b\n\n")
 	ap.add_argument(
 		'-run', '--run_match',
 		nargs='+',
@@ -301,6 +342,16 @@ def parse_args():
 		help="forces the save file to keep trying different writers until one works - flag only works if you are saving a replay\n\n")
 	return vars(ap.parse_args())
 
+# returns the vertices of a ring around 0,0 for every health step, the ring is cut off like the wedge of a static Unit
+def ring_templates(r, width):
+	templates = []
+	for step in range(HEALTH_STEPS+1):
+		angles = np.radians(rotate(np.linspace(0, 360 * step / HEALTH_STEPS, ARC_POINTS)))
+		outer = np.column_stack((np.cos(angles), np.sin(angles))) * r
+		inner = np.column_stack((np.cos(angles), np.sin(angles)))[::-1] * (r - width)
+		templates.append(np.concatenate((outer, inner)))
+	return np.array(templates)
+
 # stores all information for a single unit on the graph
 class Unit:
 	def __init__(self, t, x, y, hp, p, ID, count, ax):
@@ -359,7 +410,7 @@ class Unit:
 			 self.unit_type == EMP or \
 			 self.unit_type == SCRAMBLER:
 				verts = GET_VERTS[self.unit_type](self.x, self.y)
-				polygon = Polygon(verts, True)
+				polygon = Polygon(verts, closed=True)
 
 				self.polygons.append(polygon)
 				self.patches.append(ax.add_patch(polygon))
@@ -400,7 +451,7 @@ class Unit:
 		if self.unit_type == ENCRYPTOR:
 			self.patches[1].set_alpha(0.3)
 
-		if self.stability > MAX_HP[self.unit_type]:
+		if self.stability > MAX_HP[self.unit_type] and len(self.patches) > 1:
 			self.patches[1].set_fill(False)
 			self.patches[1].set_alpha(0.5)
 
@@ -529,6 +580,86 @@ class PatchWrapper:
 		return [patch for unit in self.units.values() for patch in unit.patches]
 
 
+# draws every unit class as one collection whose vertices and colors are set from arrays each frame,
+# instead of one patch per unit (see PatchWrapper), which keeps late game boards with many units fast
+class CollectionWrapper:
+	def __init__(self, ax):
+		self.loc = {}		# stores the number of units at a location with each location tuple (x,y) as the key
+		self.lbls = []		# a pool of count labels, reused every frame (hidden when not needed)
+		self.color = {1:np.array(to_rgba('C0')), 2:np.array(to_rgba('r'))}
+
+		# (unit type, outer radius, width, alpha) of every ring of a static unit, the rings show health like the wedges of Unit
+		self.rings = [(FILTER, .2, .07, 1), (ENCRYPTOR, .12, .03, 1), (ENCRYPTOR, .37, .15, .3), (DESTRUCTOR, .2, .07, 1), (DESTRUCTOR, .45, .01, 1)]
+		self.ring_verts = [ring_templates(r, width) for _, r, width, _ in self.rings]
+		self.mobile_verts = {t: np.array(GET_VERTS[t](0, 0)) for t in GET_VERTS}
+		self.circle_verts = np.array([(np.cos(a), np.sin(a)) for a in np.linspace(0, 2*np.pi, ARC_POINTS)])
+
+		empty = np.zeros((0, 2, 2))
+		self.ring_collections = [ax.add_collection(PolyCollection(empty, antialiased=True)) for _ in self.rings]
+		self.mobile_collections = {t: ax.add_collection(PolyCollection(empty, antialiased=True)) for t in GET_VERTS}
+		self.shield_collection = ax.add_collection(PolyCollection(empty, facecolors='none', linewidths=4, alpha=.5, antialiased=True))
+
+	# updates all units, units are (unit_type, (x, y), stability, p_index, ID) like PatchWrapper gets them
+	def update_units(self, units, ax):
+		by_type = {t: [] for t in MAX_HP}
+		loc = {}
+
+		for unit_type, pos, stability, p_index, ID in units:
+			loc[pos] = loc.get(pos, 0) + 1
+			by_type[unit_type].append((pos[0], pos[1], stability, p_index, loc[pos] == 1))		# the last column is whether it is the first unit at its location, only those show the extra stability circle
+		self.loc = loc
+
+		arrays = {t: np.array(rows, dtype=float).reshape(-1, 5) for t, rows in by_type.items()}
+
+		# static units, the health sets which template of every ring is used
+		for (unit_type, _, _, alpha), templates, collection in zip(self.rings, self.ring_verts, self.ring_collections):
+			data = arrays[unit_type]
+			steps = np.rint(np.clip(data[:, 2] / MAX_HP[unit_type], 0, 1) * HEALTH_STEPS).astype(int)
+			collection.set_verts(templates[steps] + data[:, None, 0:2])
+			collection.set_color(self.colors(data[:, 3], alpha))
+
+		# mobile units, the same shape moved to every unit
+		shields = []
+		for unit_type, collection in self.mobile_collections.items():
+			data = arrays[unit_type]
+			colors = self.colors(data[:, 3])
+			collection.set_verts(self.mobile_verts[unit_type] + data[:, None, 0:2])
+			collection.set_edgecolor(colors)
+			collection.set_facecolor(colors if unit_type == PING else 'none')
+
+			shielded = data[(data[:, 2] > MAX_HP[unit_type]) & (data[:, 4] == 1)]
+			radius = np.minimum((shielded[:, 2] - MAX_HP[unit_type]) / 50, .5)
+			shields.append((self.circle_verts * radius[:, None, None] + shielded[:, None, 0:2], self.colors(shielded[:, 3])))
+
+		self.shield_collection.set_verts(np.concatenate([verts for verts, _ in shields]))
+		self.shield_collection.set_edgecolor(np.concatenate([colors for _, colors in shields]))
+
+	# returns the colors of the given player indexes as an array of rgba rows
+	def colors(self, p_index, alpha=1):
+		colors = np.where((p_index == 1)[:, None], self.color[1], self.color[2])
+		colors[:, 3] = alpha
+		return colors
+
+	# shows the count labels at locations with more than one unit, reusing the labels of the last frame
+	def update_lbls(self, ax):
+		stacked = [(pos, count) for pos, count in self.loc.items() if count > 1]
+		while len(self.lbls) < len(stacked):
+			lbl = ax.text(0, 0, '', fontsize=10)
+			lbl.set_animated(BLIT)
+			self.lbls.append(lbl)
+
+		for lbl, ((x, y), count) in zip(self.lbls, stacked):
+			lbl.set_position((x+.4, y-.4))
+			lbl.set_text(str(count))
+			lbl.set_visible(True)
+		for lbl in self.lbls[len(stacked):]:
+			lbl.set_visible(False)
+
+	# return all the collections that need to be updated every animation
+	def values(self):
+		return self.ring_collections + list(self.mobile_collections.values()) + [self.shield_collection]
+
+
 # this class is for the right side (information side) except for the plot (see Plot class)
 class Info:
 	def __init__(self, endStats, ax, slider_exists=False):
@@ -676,7 +807,7 @@ class Plot:
 
 # this class contains all information regarding the entire window
 class Graph:
-	def __init__(self, data, frames_in_turn, healths, writers, keep_trying, save='', fh=None):
+	def __init__(self, data, frames_in_turn, healths, writers, keep_trying, save='', fh=None, start=None):
 
 		# pretty clear, if no data, raise an Error
 		if len(data) < 1:
@@ -700,11 +831,21 @@ class Graph:
 		self.single_advance = False													# true when user is scrubbing, but still want to move forward one frame
 		self.stop_slider_evt = False												# stop the slider event from triggereing when the code changes it
 
-		self.patches = PatchWrapper()												# creates the PatchWrapper object
+		# open at the asked for frame, paused unless the animation is being saved
+		if start is not None:
+			if start in self.data:
+				self.head = start
+				self.is_manual = save == ''
+			else:
+				print ('Turn {} frame {} is not in this replay, starting at the beginning'.format(*start))
+
+		self.patches = CollectionWrapper(self.board_ax) if COLLECTIONS else PatchWrapper()	# creates the object that draws the units
 
 		self.stream = self.data_stream()											# gets a data_reference - this passes all data to the animation
 
 		self.setup_board()															# initialize static parts of the board
+		if not BLIT and self.slider_exists and self.head != (0,-1):
+			self.update_slider(self.head)											# move the slider to the frame the replay opens at
 
 		self.fig.canvas.mpl_connect('key_press_event', self.keyboard_input)			# connect keyboard events to the keyboard_input function
 
@@ -817,7 +958,7 @@ class Graph:
 
 	# extension of __init__(), called every frame when real-time
 	def general_init(self, data, frames_in_turn, healths):
-		self.data = data 													# dict with keys of (turn, frame) tuple and values of a Frame object
+		self.data = data 													# ReplayReader with keys of (turn, frame) tuple and values of the frame data
 		self.frames_in_turn = frames_in_turn								# dict with keys of turn and values of number of frames in that turn
 		self.healths = healths												# all known health data, tuple containing two lists, player1 and player2 healths
 		self.num_frames = len(self.data)									# the number of total frames
@@ -828,7 +969,7 @@ class Graph:
 		# try and get endStats, if not then file is still being created by engine (game is still running)
 		try:
 			last_frame = max(self.data, key=lambda f: (f[0], f[1]))			# the last frame of the entire match (single number)
-			endStats = self.data[last_frame].data['endStats']				# here is where the error would be thrown - if endStats exists
+			endStats = self.data[last_frame]['endStats']					# here is where the error would be thrown - if endStats exists
 
 			# From here on we know we have all data for entire game - endStats exists
 
@@ -853,8 +994,8 @@ class Graph:
 		self.board_ax.set_xticks(range(-1, 29))
 		self.board_ax.set_yticks(range(-1, 29))
 		self.board_ax.tick_params(axis=u'both', which=u'both',length=0)
-		self.board_ax.set_xticklabels(['']+list(range(28)))
-		self.board_ax.set_yticklabels(['']+list(range(28)))
+		self.board_ax.set_xticklabels(['']+list(range(28))+[''])
+		self.board_ax.set_yticklabels(['']+list(range(28))+[''])
 		[spine.set_visible(False) for n, spine in self.board_ax.spines.items()]
 		self.board_ax.set_title('Local Match Visualizer')
 
@@ -999,19 +1140,19 @@ class Graph:
 	def data_stream(self):
 		while True:
 
-			# everything in this block (real-time) is extrememly inefficient, becuase it has to constantly load new data
+			# in real-time only the frames the engine wrote since the last tick are read, the data, frames_in_turn and healths grow in place
 			if self.real_time:
-				self.info_ax.clear()															# clear the inforation side
-
-				self.fh.load_files(1,False,args['file']) 										# load latest replay (again)
-				replay = self.fh.get_last_replay()												# get latest replay (again)
+				replay = self.fh.get_last_replay()												# the replay being watched
+				if replay.follow() > 0:
+					self.num_frames = len(self.data)
+					if replay.frames.finished:
+						self.info_ax.clear()													# clear the inforation side
+						self.general_init(replay.frames, replay.frames_in_turn, replay.healths)	# once the game is over, add the slider and player names
 
 				# user paused game, don't advance
 				if not self.is_manual:
 					self.advance()
 
-				self.general_init(replay.frames, replay.frames_in_turn, replay.healths)			# call general initialization
-
 				# this is for the first call - cannot send before yield is reached (function called)
 				try:
 					self.frame_generator.send(self.num_frames)		# send the inverval generator the number of frames loaded
@@ -1053,7 +1194,7 @@ class Graph:
 
 	# format all of the raw unit data into how my functions recieve it
 	def cache_units(self, units, p_index):
-		filters, encryptors, destructors, pings, emps, scramblers, removes = units
+		filters, encryptors, destructors, pings, emps, scramblers = units[:6]		# the lists after these are removals and upgrades
 		units_new = []
 		for unit in filters: units_new.append((FILTER, (unit[0], unit[1]), unit[2], p_index, unit[3]))
 		for unit in encryptors: units_new.append((ENCRYPTOR, (unit[0], unit[1]), unit[2], p_index, unit[3]))
@@ -1075,7 +1216,7 @@ class Graph:
 			except KeyError as e:							# outside of frame limit
 				self.end_of_game = True 					# must be end of game
 
-		if self.end_of_game: self.info.show_winner()		# show the winner if it is the end of game
+		if self.end_of_game and not self.real_time: self.info.show_winner()		# show the winner if it is the end of game (in real-time it may only be the latest frame)
 
 	# show the matplotlib window
 	def show(self):
@@ -1127,26 +1268,12 @@ class Graph:
 		return grid
 
 
-# a simple data storage class to hold the data for a single frame
-class Frame:
-	def __init__(self, t, f, data):
-		self.turn = t 					# the turn for this frame
-		self.frame = f 					# the local frame for this frame
-		self.data = data 				# the data for this frame
-
-	def __repr__(self):
-		return ('({}, {})'.format(self.turn, self.frame))
-
-	def __getitem__(self, key):
-		return self.data[key]
-
-
 # Stores data from a single replay
 class Replay:
 	def __init__(self, f_name):
 		self.fname = f_name 			# the file name of the replay
 		self.ref = None					# stores the raw dict data as a reference
-		self.frames = {}				# dict containing all data, keys are turn, frame tuple with Frame objects as values
+		self.frames = None				# ReplayReader mapping turn, frame tuples to the data of that frame, read from the file when needed
 		self.frames_in_turn = {}		# number of frames in each turn
 		self.healths = ([], [])			# contains the healths for player1 and player2
 
@@ -1161,32 +1288,23 @@ class Replay:
 	def __repr__(self):
 		return self.__string()
 
-	# loads all data from a replay into the python variables
+	# reads the summary of the replay from its index, the frames themselves are only read when they are shown
 	def load_data(self):
-		with open(self.fname) as f:
-			i = 0
-			for line in f:
-				line = line.replace("\n", "")
-				line = line.replace("\t", "")
-
-				if (line != ''):
-					data = json.loads(line)
-
-					try:
-						data['debug']
-						self.ref = data
-					except:
-						turn_num = data['turnInfo'][1]
-						frame_num = data['turnInfo'][2]
-						self.frames[(turn_num, frame_num)] = Frame(turn_num, frame_num, data)
-
-						self.healths[0].append(data['p1Stats'][0])
-						self.healths[1].append(data['p2Stats'][0])
-
-						try:
-							self.frames_in_turn[turn_num] += 1
-						except KeyError:
-							self.frames_in_turn[turn_num] = 1
+		self.frames = ReplayReader(self.fname)
+		summary = self.frames.summary()
+
+		self.ref = self.frames.config
+		self.frames_in_turn = summary['frames_in_turn']
+		self.healths = summary['healths']
+
+	# adds the frames the engine wrote since the last call to frames, frames_in_turn and healths, returns how many there were
+	def follow(self):
+		new = self.frames.follow()
+		for turn, frame, phase, p1Stats, p2Stats in new:
+			self.frames_in_turn[turn] = self.frames_in_turn.get(turn, 0) + 1
+			self.healths[0].append(p1Stats[0])
+			self.healths[1].append(p2Stats[0])
+		return len(new)
 
 # handles opening multiple games (replays)
 class FileHandler:
@@ -1285,8 +1403,9 @@ def run_match(a1='', a2=''):
 	match.start()
 
 def main(args):
-	global BLIT
+	global BLIT, COLLECTIONS
 	BLIT = args['blit']				# get whether blit is enabled
+	COLLECTIONS = args['collections']		# get whether units are drawn as collections
 	save = args['save']				# get whether  save is enabled
 	writers = args['writers']		# get save modes
 	keep_trying = args['keep_trying']		# get whether to keep trying writer types
@@ -1336,7 +1455,11 @@ def main(args):
 		fh.load_files(1,False,args['file'])															# load latest replay
 		replay = fh.get_last_replay()																# get latest replay
 
-		animatedReplay = Graph(replay.frames, replay.frames_in_turn, replay.healths, writers, keep_trying, save=save)		# create our Graph object
+		start = None																				# the turn, frame pair to open at
+		if args['at']:
+			start = (args['at'][0], args['at'][1] if len(args['at']) > 1 else -1)
+
+		animatedReplay = Graph(replay.frames, replay.frames_in_turn, replay.healths, writers, keep_trying, save=save, start=start)		# create our Graph object
 
 
 if __name__ == '__main__':